@@ -0,0 +1,3 @@
+"""
+Benchmarks of `gitsubrepo`, measured against synthetic repositories (run with `python -m benchmarks --help`).
+"""
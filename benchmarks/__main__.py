@@ -0,0 +1,96 @@
+import json
+import sys
+import tempfile
+from argparse import ArgumentParser
+from typing import List, Optional
+
+import benchmarks
+from benchmarks.suite import BENCHMARKS, run_suite, compare
+
+
+def main(arguments: List[str]=None) -> int:
+    """
+    Runs the benchmarks, or compares the reports of two runs (e.g. of different versions).
+    :param arguments: the CLI arguments (defaults to those the program was called with)
+    :return: the exit code
+    """
+    parser = ArgumentParser(prog="python -m benchmarks", description=benchmarks.__doc__)
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks, writing a JSON report")
+    run_parser.add_argument("--subrepos", default="1,10,100",
+                            help="comma separated numbers of subrepos in the parent repository (default: %(default)s)")
+    run_parser.add_argument("--upstreams", type=int, default=10,
+                            help="number of upstream repositories the subrepos are cloned from (default: %(default)s)")
+    run_parser.add_argument("--commits", type=int, default=1000,
+                            help="number of commits in the history of each upstream (default: %(default)s)")
+    run_parser.add_argument("--files", type=int, default=1000,
+                            help="number of files in the tree of each upstream (default: %(default)s)")
+    run_parser.add_argument("--file-size", type=int, default=1024,
+                            help="size of each file in bytes (default: %(default)s)")
+    run_parser.add_argument("--repetitions", type=int, default=5,
+                            help="number of times each benchmark is timed (default: %(default)s)")
+    run_parser.add_argument("--engine", choices=("native", "subrepo"), default="native",
+                            help="how subrepos are cloned and pulled (default: %(default)s)")
+    run_parser.add_argument("--benchmark", action="append", choices=[benchmark.name for benchmark in BENCHMARKS],
+                            help="benchmark to run (may be repeated; default: all)")
+    run_parser.add_argument("--label", help="label for the report (default: `git describe` of the source)")
+    run_parser.add_argument("--output", help="file to write the report to (default: stdout)")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two reports")
+    compare_parser.add_argument("baseline", help="report to compare against")
+    compare_parser.add_argument("report", help="report to compare")
+    compare_parser.add_argument("--fail-on-spawn-increase", action="store_true",
+                                help="exit with a non-zero code if any benchmark spawns more processes")
+
+    arguments = parser.parse_args(arguments)
+    if arguments.command == "run":
+        with tempfile.TemporaryDirectory() as directory:
+            report = run_suite(
+                directory, subrepo_counts=[int(value) for value in arguments.subrepos.split(",")],
+                upstreams=arguments.upstreams, commits=arguments.commits, files=arguments.files,
+                file_size=arguments.file_size, repetitions=arguments.repetitions,
+                native=arguments.engine == "native", names=arguments.benchmark, label=arguments.label,
+                progress=lambda message: print(message, file=sys.stderr))
+        if arguments.output is not None:
+            with open(arguments.output, "w") as file:
+                json.dump(report, file, indent=2)
+        else:
+            json.dump(report, sys.stdout, indent=2)
+        return 0
+
+    with open(arguments.baseline, "r") as file:
+        baseline = json.load(file)
+    with open(arguments.report, "r") as file:
+        report = json.load(file)
+    comparisons = compare(baseline, report)
+    print(f"{baseline['label']} -> {report['label']}")
+    print(f"{'benchmark':<20} {'subrepos':>8} {'latency':>9} {'spawns':>7} {'peak memory':>12} {'received':>12} "
+          f"{'connections':>11}")
+    for comparison in comparisons:
+        latency_ratio = f"{comparison['latency_ratio']:.2f}x" if comparison["latency_ratio"] is not None else "n/a"
+        spawn_count_change, peak_memory_change, received_bytes_change, upstream_connections_change = (
+            _format_change(comparison[name]) for name in ("spawn_count_change", "peak_memory_change",
+                                                          "received_bytes_change", "upstream_connections_change"))
+        print(f"{comparison['benchmark']:<20} {comparison['subrepos']:>8} {latency_ratio:>9} "
+              f"{spawn_count_change:>7} {peak_memory_change:>12} {received_bytes_change:>12} "
+              f"{upstream_connections_change:>11}")
+    if arguments.fail_on_spawn_increase and any(
+            comparison["spawn_count_change"] is not None and comparison["spawn_count_change"] > 0
+            for comparison in comparisons):
+        return 1
+    return 0
+
+
+def _format_change(change: Optional[int]) -> str:
+    """
+    Formats a change in a measurement for the comparison table.
+    :param change: the change or `None` if it was not measured in both reports
+    :return: the formatted change
+    """
+    return f"{change:+}" if change is not None else "n/a"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import os
+import subprocess
+from typing import Dict, List, NamedTuple
+
+from gitsubrepo import clone
+
+UPSTREAM_BRANCH = "master"
+
+_AUTHOR = "Benchmark <benchmark@example.com>"
+_FILES_PER_DIRECTORY = 100
+_INITIAL_TIMESTAMP = 1500000000
+
+
+class Fixture(NamedTuple):
+    """
+    Parent repository with subrepos cloned from local upstream repositories.
+    """
+    parent: str
+    subrepo_directories: List[str]
+    upstreams: List[str]
+    initial_commit: str
+
+
+def get_engine_options(native: bool) -> Dict:
+    """
+    Gets the keyword arguments that choose how `clone` and `pull` make subrepos (which versions before the choice was
+    added do not take).
+    :param native: whether to use git plumbing rather than `git subrepo`
+    :return: the keyword arguments
+    """
+    return {"native": True} if native else {}
+
+
+def create_upstream(directory: str, *, commits: int, files: int, file_size: int) -> str:
+    """
+    Creates a bare upstream repository with a tree of the given number of files and a linear history of the given
+    depth, using a single `git fast-import`.
+    :param directory: the directory to create the repository in
+    :param commits: the number of commits in the history
+    :param files: the number of files in the tree (spread across subdirectories)
+    :param file_size: the size of each file, in bytes
+    :return: the directory of the repository
+    """
+    subprocess.run(["git", "init", "--quiet", "--bare", directory], check=True)
+    # Allows subrepos to be cloned and pulled with a partial clone filter
+    subprocess.run(["git", "config", "uploadpack.allowFilter", "true"], cwd=directory, check=True)
+    stream = [_get_commit(0, [(_get_file_path(index), _get_file_contents(index, 0, file_size))
+                              for index in range(files)])]
+    for number in range(1, commits):
+        index = number % files
+        stream.append(_get_commit(number, [(_get_file_path(index), _get_file_contents(index, number, file_size))]))
+    _fast_import(directory, stream)
+    return directory
+
+
+def add_upstream_commit(upstream: str, number: int, *, file_size: int=64):
+    """
+    Adds a commit, changing one file, to the given upstream repository.
+    :param upstream: the directory of the upstream repository
+    :param number: the number of the commit (making its contents unique)
+    :param file_size: the size of the file changed, in bytes
+    """
+    _fast_import(upstream, [_get_commit(number, [(_get_file_path(0), _get_file_contents(0, number, file_size))],
+                                        incremental=True)])
+
+
+def create_fixture(directory: str, *, subrepos: int, upstreams: int, commits: int, files: int, file_size: int,
+                   native: bool) -> Fixture:
+    """
+    Creates a parent repository containing the given number of subrepos, cloned (round-robin) from the given number of
+    upstream repositories.
+    :param directory: the directory to create the fixture in (must not exist)
+    :param subrepos: the number of subrepos
+    :param upstreams: the number of upstream repositories
+    :param commits: the number of commits in the history of each upstream
+    :param files: the number of files in the tree of each upstream
+    :param file_size: the size of each file, in bytes
+    :param native: whether to clone the subrepos using git plumbing rather than `git subrepo`
+    :return: the created fixture
+    """
+    os.makedirs(directory)
+    upstream_directories = [
+        create_upstream(os.path.join(directory, f"upstream-{index}.git"), commits=commits, files=files,
+                        file_size=file_size)
+        for index in range(min(upstreams, subrepos))]
+
+    parent = os.path.join(directory, "parent")
+    initial_commit = create_parent(parent)
+
+    subrepo_directories = []
+    for index in range(subrepos):
+        # Spread across directories, as subrepos usually are
+        subrepo_directory = os.path.join(parent, f"group-{index // _FILES_PER_DIRECTORY}", f"subrepo-{index}")
+        clone(upstream_directories[index % len(upstream_directories)], subrepo_directory, branch=UPSTREAM_BRANCH,
+              **get_engine_options(native))
+        subrepo_directories.append(subrepo_directory)
+    return Fixture(parent, subrepo_directories, upstream_directories, initial_commit)
+
+
+def create_parent(directory: str) -> str:
+    """
+    Creates a parent repository with an empty initial commit. Everything fetched into the repository is kept in packs
+    (rather than unpacked), which are never repacked, so that the amount fetched can be measured by their size.
+    :param directory: the directory to create the repository in
+    :return: the initial commit
+    """
+    subprocess.run(["git", "init", "--quiet", directory], check=True)
+    subprocess.run(["git", "config", "transfer.unpackLimit", "1"], cwd=directory, check=True)
+    subprocess.run(["git", "config", "gc.auto", "0"], cwd=directory, check=True)
+    subprocess.run(["git", "commit", "--quiet", "--allow-empty", "-m", "Initial commit"], cwd=directory, check=True)
+    return subprocess.run(["git", "rev-parse", "HEAD"], cwd=directory, check=True, stdout=subprocess.PIPE,
+                          universal_newlines=True).stdout.strip()
+
+
+def _get_commit(number: int, changes: List, *, incremental: bool=False) -> bytes:
+    """
+    Gets the `git fast-import` commands to make a commit.
+    :param number: the number of the commit (used for its message and timestamp)
+    :param changes: the paths and contents of the files that the commit sets
+    :param incremental: whether the commit is the first of an import onto a branch that already exists (later commits
+    in an import follow on from the previous commit on their branch)
+    :return: the commands
+    """
+    message = f"Commit {number}".encode()
+    timestamp = _INITIAL_TIMESTAMP + number
+    commands = [f"commit refs/heads/{UPSTREAM_BRANCH}".encode(),
+                f"committer {_AUTHOR} {timestamp} +0000".encode(),
+                f"data {len(message)}".encode(), message]
+    if incremental:
+        commands.append(f"from refs/heads/{UPSTREAM_BRANCH}^0".encode())
+    for path, contents in changes:
+        commands += [f"M 100644 inline {path}".encode(), f"data {len(contents)}".encode(), contents]
+    return b"\n".join(commands) + b"\n\n"
+
+
+def _get_file_path(index: int) -> str:
+    """
+    Gets the path of a file in an upstream repository.
+    :param index: the index of the file
+    :return: the path of the file
+    """
+    return f"directory-{index // _FILES_PER_DIRECTORY}/file-{index}.txt"
+
+
+def _get_file_contents(index: int, version: int, size: int) -> bytes:
+    """
+    Gets unique contents for a file in an upstream repository.
+    :param index: the index of the file
+    :param version: the version of the file
+    :param size: the size of the contents, in bytes
+    :return: the contents
+    """
+    line = f"file {index} version {version}\n".encode()
+    return (line * (size // len(line) + 1))[:size]
+
+
+def _fast_import(directory: str, stream: List[bytes]):
+    """
+    Imports the given `git fast-import` commands into the given repository.
+    :param directory: the directory of the repository
+    :param stream: the commands
+    """
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=directory, input=b"".join(stream), check=True)
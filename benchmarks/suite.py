@@ -0,0 +1,370 @@
+import gc
+import glob
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import nullcontext
+from itertools import count
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import gitsubrepo
+from benchmarks.repositories import Fixture, add_upstream_commit, create_fixture, create_parent, get_engine_options, \
+    UPSTREAM_BRANCH
+from gitsubrepo import clone, pull, status
+
+try:
+    from gitsubrepo._remote import clear_remote_references_cache
+except ImportError:
+    # Versions before `check_for_updates` do not cache references
+    clear_remote_references_cache = None
+
+REPORT_FORMAT_VERSION = 4
+
+_TRACE2_EVENT_ENVIRONMENT_VARIABLE = "GIT_TRACE2_EVENT"
+_UPLOAD_PACK_COMMAND = "upload-pack"
+
+_commit_numbers = count(1000000)
+
+
+class Benchmark(NamedTuple):
+    """
+    Operation to measure against a fixture.
+    """
+    name: str
+    # Prepares a repetition (e.g. adding commits to pull), returning the operation to measure
+    prepare: Callable[[Fixture, bool], Callable[[], Any]]
+    # Features that the operation uses beyond `clone`, `pull` and `status` of the first version (see `is_available`),
+    # without which it is not supported by the version measured
+    requires: Tuple[str, ...] = ()
+
+
+def is_available(feature: str) -> bool:
+    """
+    Gets whether the version of `gitsubrepo` measured has the given feature.
+    :param feature: the name of an export of `gitsubrepo` (e.g. `"pull_many"`) or of a keyword argument of one (e.g.
+    `"clone.depth"`)
+    :return: whether the feature is available
+    """
+    name, _, keyword = feature.partition(".")
+    function = getattr(gitsubrepo, name, None)
+    if function is None:
+        return False
+    # Keyword arguments of versions whose decorators hide their signature are taken as unavailable
+    return keyword == "" or keyword in inspect.signature(function).parameters
+
+
+def _prepare_clone(fixture: Fixture, native: bool) -> Callable[[], Any]:
+    directory = os.path.join(fixture.parent, "cloned", f"subrepo-{next(_commit_numbers)}")
+    return lambda: clone(fixture.upstreams[0], directory, branch=UPSTREAM_BRANCH, **get_engine_options(native))
+
+
+def _prepare_clone_fresh(**fetch_limits) -> Callable[[Fixture, bool], Callable[[], Any]]:
+    def prepare(fixture: Fixture, native: bool) -> Callable[[], Any]:
+        # Into a parent repository that has none of the upstream's objects, so that all that are needed are fetched
+        parent = os.path.join(os.path.dirname(fixture.parent), f"fresh-parent-{next(_commit_numbers)}")
+        create_parent(parent)
+        directory = os.path.join(parent, "subrepo")
+        return lambda: clone(fixture.upstreams[0], directory, branch=UPSTREAM_BRANCH, **get_engine_options(native),
+                             **fetch_limits)
+
+    return prepare
+
+
+def _prepare_clone_commit(fixture: Fixture, native: bool) -> Callable[[], Any]:
+    # A commit behind the branch, which has to be fetched with the branch (from the upstream, once)
+    commit = subprocess.run(["git", "rev-list", "--max-parents=0", UPSTREAM_BRANCH], cwd=fixture.upstreams[0],
+                            check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
+    directory = os.path.join(fixture.parent, "cloned", f"subrepo-{next(_commit_numbers)}")
+    return lambda: clone(fixture.upstreams[0], directory, branch=UPSTREAM_BRANCH, commit=commit,
+                         **get_engine_options(native))
+
+
+def _prepare_status_all_indexed(fixture: Fixture, native: bool) -> Callable[[], Any]:
+    def status_all_indexed():
+        gitsubrepo.set_status_index_enabled(True)
+        try:
+            return gitsubrepo.status_all(fixture.parent)
+        finally:
+            gitsubrepo.set_status_index_enabled(False)
+
+    # Measures reuse of the index, rather than its creation
+    status_all_indexed()
+    return status_all_indexed
+
+
+def _prepare_status_at_revision(fixture: Fixture, native: bool) -> Callable[[], Any]:
+    def status_at_revision():
+        with gitsubrepo.ObjectReader(fixture.parent) as object_reader:
+            return [status(directory, revision="HEAD", object_reader=object_reader)
+                    for directory in fixture.subrepo_directories]
+
+    return status_at_revision
+
+
+def _prepare_check_for_updates(fixture: Fixture, native: bool) -> Callable[[], Any]:
+    clear_remote_references_cache()
+    return lambda: gitsubrepo.check_for_updates(fixture.subrepo_directories)
+
+
+def _prepare_pull(fixture: Fixture, native: bool) -> Callable[[], Any]:
+    add_upstream_commit(fixture.upstreams[0], next(_commit_numbers))
+    return lambda: pull(fixture.subrepo_directories[0], **get_engine_options(native))
+
+
+def _prepare_pull_many(fixture: Fixture, native: bool) -> Callable[[], Any]:
+    for upstream in fixture.upstreams:
+        add_upstream_commit(upstream, next(_commit_numbers))
+    return lambda: gitsubrepo.pull_many(fixture.subrepo_directories, **get_engine_options(native))
+
+
+# Operations that do not change the fixture are first
+BENCHMARKS = (
+    Benchmark("status", lambda fixture, native: lambda: status(fixture.subrepo_directories[0])),
+    Benchmark("status_all", lambda fixture, native: lambda: gitsubrepo.status_all(fixture.parent), ("status_all",)),
+    Benchmark("status_all_indexed", _prepare_status_all_indexed, ("status_all", "set_status_index_enabled")),
+    Benchmark("status_at_revision", _prepare_status_at_revision, ("status.revision", "ObjectReader")),
+    Benchmark("is_modified_many",
+              lambda fixture, native: lambda: gitsubrepo.is_modified_many(fixture.subrepo_directories),
+              ("is_modified_many",)),
+    Benchmark("changed_subrepos",
+              lambda fixture, native: lambda: gitsubrepo.changed_subrepos(fixture.parent, fixture.initial_commit),
+              ("changed_subrepos",)),
+    Benchmark("check_for_updates", _prepare_check_for_updates, ("check_for_updates",)),
+    Benchmark("clone", _prepare_clone),
+    Benchmark("clone_commit", _prepare_clone_commit),
+    Benchmark("clone_fresh", _prepare_clone_fresh()),
+    Benchmark("clone_fresh_shallow", _prepare_clone_fresh(depth=1), ("clone.depth",)),
+    Benchmark("clone_fresh_partial", _prepare_clone_fresh(filter="blob:none"), ("clone.filter",)),
+    Benchmark("pull", _prepare_pull),
+    Benchmark("pull_many", _prepare_pull_many, ("pull_many",)),
+)
+
+
+def run_suite(directory: str, *, subrepo_counts: List[int], upstreams: int=10, commits: int=1000, files: int=1000,
+              file_size: int=1024, repetitions: int=5, native: bool=True, names: List[str]=None,
+              label: str=None, progress: Callable[[str], None]=None) -> Dict:
+    """
+    Runs the benchmarks against fixtures with each of the given numbers of subrepos.
+    :param directory: the directory to create the fixtures in (must exist)
+    :param subrepo_counts: the numbers of subrepos in the parent repository of each fixture
+    :param upstreams: the number of upstream repositories that the subrepos are cloned from
+    :param commits: the number of commits in the history of each upstream
+    :param files: the number of files in the tree of each upstream
+    :param file_size: the size of each file, in bytes
+    :param repetitions: the number of times each benchmark is timed
+    :param native: whether to clone and pull using git plumbing rather than `git subrepo` (if the version measured
+    can)
+    :param names: the names of the benchmarks to run (all if not given)
+    :param label: label for the report, identifying the version measured (`git describe` of the source if not given)
+    :param progress: called with a description of each step
+    :return: the report, in which benchmarks that the version measured does not support are given with the features
+    they require (as `unsupported`) in place of measurements
+    """
+    progress = progress if progress is not None else lambda message: None
+    native = native and is_available("clone.native")
+    benchmarks = [benchmark for benchmark in BENCHMARKS if names is None or benchmark.name in names]
+    results = []
+    for subrepo_count in subrepo_counts:
+        progress(f"Creating fixture with {subrepo_count} subrepo(s)")
+        fixture = create_fixture(
+            os.path.join(directory, f"fixture-{subrepo_count}"), subrepos=subrepo_count, upstreams=upstreams,
+            commits=commits, files=files, file_size=file_size, native=native)
+        for benchmark in benchmarks:
+            unsupported = [feature for feature in benchmark.requires if not is_available(feature)]
+            if len(unsupported) > 0:
+                progress(f"Skipping {benchmark.name} (requires {', '.join(unsupported)})")
+                results.append(dict(benchmark=benchmark.name, subrepos=subrepo_count, unsupported=unsupported))
+                continue
+            progress(f"Running {benchmark.name} with {subrepo_count} subrepo(s)")
+            result = measure(benchmark, fixture, native=native, repetitions=repetitions)
+            results.append(dict(benchmark=benchmark.name, subrepos=subrepo_count, **result))
+
+    return {
+        "format": REPORT_FORMAT_VERSION,
+        "label": label if label is not None else _get_source_version(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": _get_tool_version("get_git_version"),
+            "git_subrepo": _get_tool_version("get_git_subrepo_version") if not native else None},
+        "parameters": dict(upstreams=upstreams, commits=commits, files=files, file_size=file_size,
+                           repetitions=repetitions, native=native),
+        "results": results
+    }
+
+
+def measure(benchmark: Benchmark, fixture: Fixture, *, native: bool, repetitions: int) -> Dict:
+    """
+    Measures the given benchmark: its latency over the given number of repetitions, then the processes it spawns, the
+    peak memory it allocates (in Python), the bytes it fetches and the number of times it connects to the upstreams
+    in one further repetition (as tracing memory and processes slows it down). The processes spawned are not counted
+    (`None`) if the version measured cannot observe them.
+    :param benchmark: the benchmark
+    :param fixture: the fixture to run the benchmark against
+    :param native: whether to clone and pull using git plumbing rather than `git subrepo`
+    :param repetitions: the number of times to time the benchmark
+    :return: the measurements
+    """
+    durations = []
+    for _ in range(repetitions):
+        operation = benchmark.prepare(fixture, native)
+        gc.collect()
+        started = time.perf_counter()
+        operation()
+        durations.append(time.perf_counter() - started)
+
+    operation = benchmark.prepare(fixture, native)
+    gc.collect()
+    pack_size = _get_pack_size(fixture)
+    with tempfile.TemporaryDirectory() as trace_directory:
+        # The processes that `git` starts (e.g. `git upload-pack` for each fetch from a local upstream) are traced
+        trace_path = os.path.join(trace_directory, "trace.json")
+        previous_trace_path = os.environ.get(_TRACE2_EVENT_ENVIRONMENT_VARIABLE)
+        os.environ[_TRACE2_EVENT_ENVIRONMENT_VARIABLE] = trace_path
+        tracemalloc.start()
+        try:
+            with gitsubrepo.ProcessStatistics() if is_available("ProcessStatistics") else nullcontext() \
+                    as process_statistics:
+                operation()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            if previous_trace_path is not None:
+                os.environ[_TRACE2_EVENT_ENVIRONMENT_VARIABLE] = previous_trace_path
+            else:
+                del os.environ[_TRACE2_EVENT_ENVIRONMENT_VARIABLE]
+        upstream_connections = _count_upstream_connections(trace_path, fixture)
+    received_bytes = _get_pack_size(fixture) - pack_size
+
+    return {
+        "latency": {"min": min(durations), "median": statistics.median(durations), "max": max(durations),
+                    "repetitions": repetitions},
+        "spawn_count": process_statistics.total_spawn_count if process_statistics is not None else None,
+        "spawn_counts": process_statistics.spawn_counts if process_statistics is not None else None,
+        "peak_memory": peak_memory,
+        "received_bytes": received_bytes,
+        "upstream_connections": upstream_connections
+    }
+
+
+def compare(baseline: Dict, report: Dict) -> List[Dict]:
+    """
+    Compares the results of two reports.
+    :param baseline: the report to compare against
+    :param report: the report to compare
+    :return: for each result in both reports, its benchmark, number of subrepos, ratio of median latencies and changes
+    in spawn count, peak memory, bytes received and upstream connections (each `None` if not measured in both reports,
+    e.g. as a version did not support the benchmark or, before formats 2 and 3 respectively, bytes received and
+    upstream connections were not measured)
+    """
+    baseline_results = {(result["benchmark"], result["subrepos"]): result for result in baseline["results"]}
+    comparisons = []
+    for result in report["results"]:
+        baseline_result = baseline_results.get((result["benchmark"], result["subrepos"]))
+        if baseline_result is None:
+            continue
+        latency, baseline_latency = result.get("latency"), baseline_result.get("latency")
+        comparisons.append({
+            "benchmark": result["benchmark"],
+            "subrepos": result["subrepos"],
+            "latency_ratio": _get_ratio(latency["median"], baseline_latency["median"])
+            if latency is not None and baseline_latency is not None else None,
+            "spawn_count_change": _get_change(result, baseline_result, "spawn_count"),
+            "peak_memory_change": _get_change(result, baseline_result, "peak_memory"),
+            "received_bytes_change": _get_change(result, baseline_result, "received_bytes"),
+            "upstream_connections_change": _get_change(result, baseline_result, "upstream_connections")
+        })
+    return comparisons
+
+
+def _get_change(result: Dict, baseline_result: Dict, name: str) -> Optional[int]:
+    """
+    Gets the change in a measurement from a baseline result.
+    :param result: the result
+    :param baseline_result: the baseline result
+    :param name: the name of the measurement
+    :return: the change or `None` if the measurement was not made in both results
+    """
+    value, baseline = result.get(name), baseline_result.get(name)
+    return value - baseline if value is not None and baseline is not None else None
+
+
+def _get_pack_size(fixture: Fixture) -> int:
+    """
+    Gets the total size of the packs in the fixture's parent repositories, which hold all that has been fetched into
+    them (see `create_parent`), approximating the number of bytes received.
+    :param fixture: the fixture
+    :return: the size in bytes
+    """
+    return sum(os.path.getsize(path) for path in glob.glob(
+        os.path.join(os.path.dirname(fixture.parent), "*", ".git", "objects", "pack", "*.pack")))
+
+
+def _count_upstream_connections(trace_path: str, fixture: Fixture) -> int:
+    """
+    Counts the connections made to the fixture's upstreams (each fetch or listing of references runs `git upload-pack`
+    in the upstream), according to a `GIT_TRACE2_EVENT` trace.
+    :param trace_path: the path of the trace (which does not exist if `git` was not ran)
+    :param fixture: the fixture
+    :return: the number of connections
+    """
+    if not os.path.exists(trace_path):
+        return 0
+    upstreams = {os.path.realpath(upstream) for upstream in fixture.upstreams}
+    connections = 0
+    with open(trace_path, "r") as file:
+        for line in file:
+            event = json.loads(line)
+            if event.get("event") != "start":
+                continue
+            arguments = event["argv"]
+            if os.path.basename(arguments[0]) == f"git-{_UPLOAD_PACK_COMMAND}":
+                arguments = arguments[1:]
+            elif arguments[1:2] == [_UPLOAD_PACK_COMMAND]:
+                arguments = arguments[2:]
+            else:
+                continue
+            repository = [argument for argument in arguments if not argument.startswith("-")][-1]
+            if os.path.realpath(os.path.join(event.get("cwd", ""), repository)) in upstreams:
+                connections += 1
+    return connections
+
+
+def _get_ratio(value: float, baseline: float) -> Optional[float]:
+    """
+    Gets the ratio of a value to its baseline.
+    :param value: the value
+    :param baseline: the baseline
+    :return: the ratio or `None` if the baseline is zero
+    """
+    return value / baseline if baseline > 0 else None
+
+
+def _get_tool_version(getter_name: str) -> Optional[str]:
+    """
+    Gets the version of a tool used by `gitsubrepo`.
+    :param getter_name: the name of the export of `gitsubrepo` that gets the version (e.g. `"get_git_version"`)
+    :return: the version or `None` if the version measured cannot get it
+    """
+    if not is_available(getter_name):
+        return None
+    return ".".join(str(part) for part in getattr(gitsubrepo, getter_name)())
+
+
+def _get_source_version() -> str:
+    """
+    Gets the version of the source that is being measured, according to `git describe`.
+    :return: the version or `"unknown"` if it could not be determined
+    """
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(gitsubrepo.__file__),
+                              check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
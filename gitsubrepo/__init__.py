@@ -1 +1,49 @@
-from gitsubrepo.subrepo import clone, pull, status
+from importlib import import_module
+
+# Set by type checkers (`typing` is not imported, as it is slow to import)
+TYPE_CHECKING = False
+
+# Exports are imported from their modules when first used, so that importing the package (e.g. to run the CLI) is quick
+_EXPORTS = {
+    "gitsubrepo._cache": ["set_default_cache_directory", "set_cache_max_size"],
+    "gitsubrepo._instrumentation": ["add_process_hook", "remove_process_hook", "get_command_name", "ProcessRecord",
+                                    "ProcessRecorder", "ProcessStatistics", "Operation", "LATENCY_BUCKETS",
+                                    "add_lock_wait_hook", "remove_lock_wait_hook", "LockWaitRecord"],
+    "gitsubrepo._native": ["set_default_native"],
+    "gitsubrepo._object_reader": ["ObjectReader"],
+    "gitsubrepo._repository_lock": ["lock_repository", "set_repository_lock_timeout"],
+    "gitsubrepo._status_index": ["set_status_index_enabled"],
+    "gitsubrepo._toolchain": ["get_git_version", "get_git_subrepo_version"],
+    "gitsubrepo.subrepo": ["clone", "pull", "pull_many", "check_for_updates", "status", "status_all", "is_modified",
+                           "is_modified_many", "get_modified_paths", "changed_subrepos", "SubrepoStatus",
+                           "SubrepoChange"]
+}
+_EXPORT_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_EXPORT_MODULES)
+
+if TYPE_CHECKING:
+    from gitsubrepo._cache import set_default_cache_directory, set_cache_max_size
+    from gitsubrepo._instrumentation import add_process_hook, remove_process_hook, get_command_name, ProcessRecord, \
+        ProcessRecorder, ProcessStatistics, Operation, LATENCY_BUCKETS, add_lock_wait_hook, remove_lock_wait_hook, \
+        LockWaitRecord
+    from gitsubrepo._native import set_default_native
+    from gitsubrepo._object_reader import ObjectReader
+    from gitsubrepo._repository_lock import lock_repository, set_repository_lock_timeout
+    from gitsubrepo._status_index import set_status_index_enabled
+    from gitsubrepo._toolchain import get_git_version, get_git_subrepo_version
+    from gitsubrepo.subrepo import clone, pull, pull_many, check_for_updates, status, status_all, \
+        is_modified, is_modified_many, get_modified_paths, changed_subrepos, SubrepoStatus, SubrepoChange
+
+
+def __getattr__(name: str):
+    module = _EXPORT_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,221 @@
+"""
+Command line interface to `gitsubrepo`.
+
+Only the standard library modules needed to parse the arguments are imported up front: the library itself is imported
+by the command that is run, so that `--help` (and getting the status of a subrepo) start quickly.
+"""
+# Annotations are not evaluated, so `typing` (which is slow to import) is only imported by type checkers
+from __future__ import annotations
+
+import json
+import os
+import sys
+from argparse import ArgumentParser, Namespace
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, Optional
+
+_ENGINES = {"native": True, "subrepo": False}
+
+
+def main(arguments: List[str]=None) -> int:
+    """
+    Runs the `gitsubrepo` command.
+    :param arguments: the CLI arguments (defaults to those the program was called with)
+    :return: the exit code
+    """
+    parser = ArgumentParser(prog="gitsubrepo", description="Gets the status of, and pulls, git subrepos.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    status_parser = subparsers.add_parser("status", help="show the status of subrepos")
+    status_parser.add_argument("directories", nargs="*", default=[os.curdir], metavar="directory",
+                               help="directory containing a subrepo (default: current directory)")
+    status_parser.add_argument("--all", action="store_true",
+                               help="show every subrepo within the given directories, rather than those in them")
+    _add_json_argument(status_parser)
+    status_parser.set_defaults(run=_status)
+
+    pull_parser = subparsers.add_parser("pull", help="pull subrepos, fetching their upstreams in parallel")
+    pull_parser.add_argument("directories", nargs="*", default=[os.curdir], metavar="directory",
+                             help="directory containing a subrepo (default: current directory)")
+    pull_parser.add_argument("--all", action="store_true",
+                             help="pull every subrepo within the given directories, rather than those in them")
+    _add_jobs_argument(pull_parser, "upstreams to fetch")
+    pull_parser.add_argument("--engine", choices=_ENGINES,
+                             help="how subrepos are pulled (default: native if set as the default, else subrepo)")
+    pull_parser.add_argument("--depth", type=int, help="number of commits of each upstream's history to fetch")
+    pull_parser.add_argument("--filter", help="partial clone filter to fetch each upstream with (e.g. blob:none)")
+    _add_timeout_argument(pull_parser, "each fetch and pull")
+    _add_json_argument(pull_parser)
+    pull_parser.set_defaults(run=_pull)
+
+    outdated_parser = subparsers.add_parser("outdated", help="show subrepos that are behind their upstreams")
+    outdated_parser.add_argument(
+        "directories", nargs="*", metavar="directory",
+        help="directory containing a subrepo (default: every subrepo in the current directory)")
+    _add_jobs_argument(outdated_parser, "remotes to query")
+    _add_timeout_argument(outdated_parser, "the references of each remote")
+    outdated_parser.add_argument("--exit-code", action="store_true",
+                                 help="exit with 1 if any subrepo is behind its upstream")
+    _add_json_argument(outdated_parser)
+    outdated_parser.set_defaults(run=_outdated)
+
+    arguments = parser.parse_args(arguments)
+    return arguments.run(arguments)
+
+
+def _add_json_argument(parser: ArgumentParser):
+    parser.add_argument("--json", action="store_true",
+                        help="write a JSON object per line, as each subrepo is done with, rather than text")
+
+
+def _add_jobs_argument(parser: ArgumentParser, what: str):
+    parser.add_argument("-j", "--jobs", type=int, help=f"maximum number of {what} at the same time")
+
+
+def _add_timeout_argument(parser: ArgumentParser, what: str):
+    parser.add_argument("--timeout", type=float, help=f"number of seconds to wait for {what} before giving up")
+
+
+def _status(arguments: Namespace) -> int:
+    """
+    Writes the status of the subrepos in (or, with `--all`, within) the given directories.
+    :param arguments: the parsed CLI arguments
+    :return: the exit code
+    """
+    from gitsubrepo.subrepo import status, status_all
+
+    failed = False
+    for directory in arguments.directories:
+        try:
+            statuses = status_all(directory) if arguments.all else {directory: status(directory)}
+        except Exception as e:
+            _write_error(directory, e, arguments.json)
+            failed = True
+            continue
+        for subrepo_directory, subrepo_status in statuses.items():
+            if arguments.json:
+                _write_json(subrepo_directory, remote=subrepo_status.remote, branch=subrepo_status.branch,
+                            commit=subrepo_status.full_commit or subrepo_status.commit, parent=subrepo_status.parent,
+                            method=subrepo_status.method, cmdver=subrepo_status.cmdver)
+            else:
+                _write_text(subrepo_directory, subrepo_status.commit, subrepo_status.branch, subrepo_status.remote)
+    return 1 if failed else 0
+
+
+def _pull(arguments: Namespace) -> int:
+    """
+    Pulls the subrepos in (or, with `--all`, within) the given directories, writing each result as it is pulled.
+    :param arguments: the parsed CLI arguments
+    :return: the exit code
+    """
+    from gitsubrepo.subrepo import pull_many
+
+    directories = _get_directories(arguments.directories, arguments.all, arguments.json)
+    if directories is None:
+        return 1
+
+    def write_result(directory: str, result):
+        if isinstance(result, Exception):
+            _write_error(directory, result, arguments.json)
+        elif arguments.json:
+            _write_json(directory, commit=result)
+        else:
+            _write_text(directory, result)
+
+    results = pull_many(
+        directories, max_workers=arguments.jobs,
+        native=_ENGINES[arguments.engine] if arguments.engine is not None else None, depth=arguments.depth,
+        filter=arguments.filter, timeout=arguments.timeout, result_callback=write_result)
+    return 1 if any(isinstance(result, Exception) for result in results.values()) else 0
+
+
+def _outdated(arguments: Namespace) -> int:
+    """
+    Writes the subrepos in the given directories (or all in the current directory) that are behind their upstreams, as
+    the references of each remote are got.
+    :param arguments: the parsed CLI arguments
+    :return: the exit code
+    """
+    from gitsubrepo.subrepo import check_for_updates, status
+
+    all_subrepos = len(arguments.directories) == 0
+    directories = _get_directories(arguments.directories or [os.curdir], all_subrepos, arguments.json)
+    if directories is None:
+        return 1
+
+    def write_result(directory: str, result):
+        if isinstance(result, Exception):
+            _write_error(directory, result, arguments.json)
+        elif result is not None:
+            pulled_commit = status(directory).commit
+            if arguments.json:
+                _write_json(directory, commit=pulled_commit, upstream_commit=result)
+            else:
+                _write_text(directory, pulled_commit, result)
+
+    results = check_for_updates(directories, max_workers=arguments.jobs, timeout=arguments.timeout,
+                                result_callback=write_result)
+    if any(isinstance(result, Exception) for result in results.values()):
+        return 1
+    return 1 if arguments.exit_code and any(result is not None for result in results.values()) else 0
+
+
+def _get_directories(directories: List[str], all_subrepos: bool, as_json: bool) -> Optional[List[str]]:
+    """
+    Gets the directories of the subrepos to work on.
+    :param directories: the directories given
+    :param all_subrepos: whether to find every subrepo within the given directories
+    :param as_json: whether errors are written as JSON
+    :return: the directories of the subrepos, or `None` if they could not be found (having written the error)
+    """
+    if not all_subrepos:
+        return directories
+    from gitsubrepo.subrepo import status_all
+
+    subrepo_directories = []
+    for directory in directories:
+        try:
+            subrepo_directories.extend(status_all(directory).keys())
+        except Exception as e:
+            _write_error(directory, e, as_json)
+            return None
+    return subrepo_directories
+
+
+def _write_error(directory: str, exception: Exception, as_json: bool):
+    """
+    Writes the exception raised for a subrepo (to stdout as JSON, else to stderr).
+    :param directory: the directory containing the subrepo
+    :param exception: the exception
+    :param as_json: whether to write JSON
+    """
+    message = str(exception) or type(exception).__name__
+    if as_json:
+        _write_json(directory, error=message, error_type=type(exception).__name__)
+    else:
+        print(f"{directory}: error: {message}", file=sys.stderr, flush=True)
+
+
+def _write_json(directory: str, **values: Optional[str]):
+    """
+    Writes a JSON object, on its own line, about a subrepo.
+    :param directory: the directory containing the subrepo
+    :param values: the values to include
+    """
+    print(json.dumps(dict(directory=directory, **values)), flush=True)
+
+
+def _write_text(directory: str, *values: str):
+    """
+    Writes a tab separated line about a subrepo.
+    :param directory: the directory containing the subrepo
+    :param values: the values to include
+    """
+    print("\t".join((directory, *values)), flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
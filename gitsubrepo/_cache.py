@@ -0,0 +1,148 @@
+import hashlib
+import os
+import shutil
+from typing import Optional
+
+from gitsubrepo._common import Command, Steps
+from gitsubrepo._git import GIT_COMMAND
+from gitsubrepo._lock import FileLock
+
+_MIRROR_SUFFIX = ".git"
+_LOCK_SUFFIX = ".lock"
+_EVICTION_LOCK_NAME = "eviction.lock"
+_TEMPORARY_SUFFIX = ".tmp"
+
+_default_cache_directory: Optional[str] = None
+_cache_max_size: Optional[int] = None
+
+
+def set_default_cache_directory(directory: Optional[str]):
+    """
+    Sets the directory in which to keep mirrors of the repositories that are cloned, when not given to `clone`.
+    :param directory: the cache directory (`None` to not use a cache by default)
+    """
+    global _default_cache_directory
+    _default_cache_directory = directory
+
+
+def get_default_cache_directory() -> Optional[str]:
+    """
+    Gets the directory in which to keep mirrors of the repositories that are cloned, when not given to `clone`.
+    :return: the cache directory or `None` if a cache is not used by default
+    """
+    return _default_cache_directory
+
+
+def set_cache_max_size(max_size: Optional[int]):
+    """
+    Sets the size that cache directories are kept within, by removing the least recently used mirrors.
+    :param max_size: the maximum size in bytes (`None` for no limit)
+    """
+    global _cache_max_size
+    _cache_max_size = max_size
+
+
+def get_cache_max_size() -> Optional[int]:
+    """
+    Gets the size that cache directories are kept within.
+    :return: the maximum size in bytes or `None` if there is no limit
+    """
+    return _cache_max_size
+
+
+class Mirror:
+    """
+    Bare mirror of a remote repository, kept in a cache directory.
+    """
+    def __init__(self, cache_directory: str, location: str):
+        """
+        Constructor.
+        :param cache_directory: the directory containing the mirrors
+        :param location: the location of the remote repository
+        """
+        key = hashlib.sha256(location.encode()).hexdigest()
+        self.location = location
+        self.path = os.path.join(cache_directory, f"{key}{_MIRROR_SUFFIX}")
+        self.lock = FileLock(os.path.join(cache_directory, f"{key}{_LOCK_SUFFIX}"))
+
+    def refresh_steps(self) -> Steps[str]:
+        """
+        Steps to create the mirror, or to update it with a single fetch if it already exists (the mirror's lock must be
+        held exclusively).
+        :return: the path of the mirror
+        """
+        if os.path.isdir(self.path):
+            yield Command([GIT_COMMAND, "fetch", "--prune", "--quiet", "origin"], self.path)
+        else:
+            temporary_path = f"{self.path}.{os.getpid()}{_TEMPORARY_SUFFIX}"
+            shutil.rmtree(temporary_path, ignore_errors=True)
+            try:
+                yield Command([GIT_COMMAND, "clone", "--mirror", "--quiet", self.location, temporary_path])
+                os.rename(temporary_path, self.path)
+            finally:
+                shutil.rmtree(temporary_path, ignore_errors=True)
+        # The modification time records when the mirror was last used
+        os.utime(self.path)
+        return self.path
+
+
+def evict(cache_directory: str, max_size: Optional[int]):
+    """
+    Removes the least recently used mirrors in the given cache directory, until it is within the given size. Mirrors
+    that are in use are skipped.
+    :param cache_directory: the cache directory
+    :param max_size: the maximum size in bytes (`None` for no limit)
+    """
+    if max_size is None:
+        return
+    eviction_lock = FileLock(os.path.join(cache_directory, _EVICTION_LOCK_NAME))
+    if not eviction_lock.acquire(blocking=False):
+        # Another process is already evicting
+        return
+    try:
+        mirror_paths = [os.path.join(cache_directory, name) for name in os.listdir(cache_directory)
+                        if name.endswith(_MIRROR_SUFFIX)]
+        sizes = {mirror_path: _get_size(mirror_path) for mirror_path in mirror_paths}
+        total_size = sum(sizes.values())
+        for mirror_path in sorted(mirror_paths, key=lambda path: os.stat(path).st_mtime):
+            if total_size <= max_size:
+                break
+            mirror_lock = FileLock(f"{mirror_path[:-len(_MIRROR_SUFFIX)]}{_LOCK_SUFFIX}")
+            if not mirror_lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(mirror_path)
+                total_size -= sizes[mirror_path]
+            finally:
+                mirror_lock.release()
+    finally:
+        eviction_lock.release()
+
+
+def get_cache_location(location: str, execution_directory: str) -> str:
+    """
+    Gets the location of a remote repository, as it should be referred to from a cache directory.
+    :param location: the location of the remote repository
+    :param execution_directory: the directory that the location is relative to (if it is a relative local path)
+    :return: the location, made absolute if it is a local path
+    """
+    local_location = os.path.join(execution_directory, location)
+    if "://" not in location and os.path.exists(local_location):
+        return os.path.realpath(local_location)
+    return location
+
+
+def _get_size(directory: str) -> int:
+    """
+    Gets the total size of the files in the given directory.
+    :param directory: the directory
+    :return: the size in bytes
+    """
+    size = 0
+    for path, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            try:
+                size += os.lstat(os.path.join(path, file_name)).st_size
+            except OSError:
+                pass
+    return size
@@ -1,27 +1,316 @@
+import codecs
+import os
+import random
+import re
+import signal
 import subprocess
-from typing import List, Dict
+import time
+from collections import deque
+from threading import Lock, Thread
+from typing import List, Dict, NamedTuple, Optional, Generator, TypeVar, Callable, BinaryIO, Union, Deque
 
-from gitsubrepo.exceptions import RunException
+from gitsubrepo._instrumentation import record_process
+from gitsubrepo.exceptions import RunException, RunTimeoutException, GitLockException
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+# Called with the name of the stream (`STDOUT` or `STDERR`) and each line written to it (without the line ending)
+OutputCallback = Callable[[str, str], None]
 
 _DATA_ENCODING = "utf-8"
 _SUCCESS_RETURN_CODE = 0
+_READ_SIZE = 64 * 1024
+_MAXIMUM_LINE_LENGTH = 64 * 1024
+_MAXIMUM_BUFFERED_LINES = 1000
+_TERMINATE_GRACE_PERIOD = 5.0
+
+# e.g. "fatal: Unable to create '/repository/.git/index.lock': File exists." or "error: could not lock config file
+# .git/config: File exists"
+_GIT_LOCK_ERROR_PATTERN = re.compile(
+    "Unable to create '([^']*\\.lock)': File exists|could not lock config file (.*): File exists")
+# Seconds to wait (at most, with jitter) before each retry of a command that failed because a git lock file existed
+_GIT_LOCK_RETRY_DELAYS = (0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 3.2)
+
+_T = TypeVar("_T")
+
+
+class OutputCollector:
+    """
+    Collects what a process writes to stdout and stderr, decoding it incrementally into lines.
+
+    All of stdout is kept (unless told otherwise), whilst only the last lines of stderr are kept.
+    """
+    def __init__(self, output_callback: OutputCallback=None, capture_stdout: bool=True):
+        """
+        Constructor.
+        :param output_callback: called with each line written (serialised across streams)
+        :param capture_stdout: whether to keep all of stdout (else only the last lines are kept)
+        """
+        self._output_callback = output_callback
+        self._decoders = {stream: codecs.getincrementaldecoder(_DATA_ENCODING)(errors="replace")
+                          for stream in (STDOUT, STDERR)}
+        self._partial_lines = {STDOUT: "", STDERR: ""}
+        self._lines: Dict[str, Union[List[str], Deque[str]]] = {
+            STDOUT: [] if capture_stdout else deque(maxlen=_MAXIMUM_BUFFERED_LINES),
+            STDERR: deque(maxlen=_MAXIMUM_BUFFERED_LINES)}
+        # Number of bytes written to each stream
+        self.sizes = {STDOUT: 0, STDERR: 0}
+        self._lock = Lock()
+
+    @property
+    def stdout(self) -> str:
+        """
+        What has been written to stdout (with trailing whitespace removed).
+        """
+        return self._get_output(STDOUT)
+
+    @property
+    def stderr(self) -> str:
+        """
+        What has been written to stderr (with trailing whitespace removed).
+        """
+        return self._get_output(STDERR)
+
+    def feed(self, stream: str, data: bytes):
+        """
+        Feeds data written by the process to the given stream.
+        :param stream: the stream written to (`STDOUT` or `STDERR`)
+        :param data: the data written
+        """
+        self.sizes[stream] += len(data)
+        *lines, partial_line = (self._partial_lines[stream] + self._decoders[stream].decode(data)).split("\n")
+        # Lines too long to buffer are passed on in parts (which are kept without adding line endings between them, as
+        # output without line endings, e.g. of `git ls-files -z`, would otherwise be changed)
+        split_line = None
+        if len(partial_line) >= _MAXIMUM_LINE_LENGTH:
+            split_line, partial_line = partial_line, ""
+        self._partial_lines[stream] = partial_line
+        for line in lines:
+            self._add_line(stream, line, "\n")
+        if split_line is not None:
+            self._add_line(stream, split_line, "")
+
+    def close(self, stream: str):
+        """
+        Indicates that the process has closed the given stream.
+        :param stream: the stream closed (`STDOUT` or `STDERR`)
+        """
+        partial_line = self._partial_lines[stream] + self._decoders[stream].decode(b"", final=True)
+        self._partial_lines[stream] = ""
+        if partial_line:
+            self._add_line(stream, partial_line, "")
 
+    def _add_line(self, stream: str, line: str, line_ending: str):
+        with self._lock:
+            self._lines[stream].append(line + line_ending)
+            if self._output_callback is not None:
+                self._output_callback(stream, line)
 
-def run(arguments: List[str], execution_directory: str=None, execution_environment: Dict=None) -> str:
+    def _get_output(self, stream: str) -> str:
+        with self._lock:
+            return ("".join(self._lines[stream]) + self._partial_lines[stream]).rstrip()
+
+
+def run(arguments: List[str], execution_directory: str=None, execution_environment: Dict=None, *,
+        capture_stdout: bool=True, timeout: float=None, output_callback: OutputCallback=None) -> str:
     """
     Runs the given arguments from the given directory (if given, else resorts to the (undefined) current directory).
+
+    Output is read as it is written, line by line.
     :param arguments: the CLI arguments to run
     :param execution_directory: the directory to execute the arguments in
     :param execution_environment: the environment to execute in
+    :param capture_stdout: whether all of stdout is required (else only the last lines are kept, for error reporting)
+    :param timeout: the number of seconds to wait for the execution before terminating it (and any processes it has
+    started), then killing it if it does not exit
+    :param output_callback: called with each line written to stdout or stderr
     :return: what is written to stdout following execution
     :exception RunException: called if the execution has a non-zero return code
+    :exception RunTimeoutException: called if the execution did not complete within the timeout
     """
+    collector = OutputCollector(output_callback, capture_stdout)
+    started = time.monotonic()
     process = subprocess.Popen(
-        arguments, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.PIPE, cwd=execution_directory,
-        env=execution_environment)
-    out, error = process.communicate()
-    stdout = out.decode(_DATA_ENCODING).rstrip()
-    if process.returncode == _SUCCESS_RETURN_CODE:
-        return stdout
-    else:
-        raise RunException(stdout, error.decode(_DATA_ENCODING).rstrip(), arguments, execution_directory)
+        arguments, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=execution_directory,
+        env=execution_environment, start_new_session=timeout is not None)
+    readers = [Thread(target=_read_stream, args=(pipe, stream, collector), daemon=True)
+               for pipe, stream in ((process.stdout, STDOUT), (process.stderr, STDERR))]
+    for reader in readers:
+        reader.start()
+
+    try:
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            _terminate(process, process_group=True)
+            _join(readers)
+            raise RunTimeoutException(collector.stdout, collector.stderr, arguments, execution_directory, timeout)
+        except BaseException:
+            _terminate(process, process_group=timeout is not None)
+            raise
+        _join(readers)
+    finally:
+        record_process(arguments, execution_directory, started, process.returncode, collector.sizes[STDOUT],
+                       collector.sizes[STDERR])
+    return get_run_result(arguments, execution_directory, process.returncode, collector)
+
+
+def get_run_result(arguments: List[str], execution_directory: Optional[str], return_code: int,
+                   collector: OutputCollector) -> str:
+    """
+    Gets the result of a completed run.
+    :param arguments: the CLI arguments that were ran
+    :param execution_directory: the directory the arguments were executed in
+    :param return_code: the return code of the execution
+    :param collector: what was written during execution
+    :return: what was written to stdout
+    :exception GitLockException: called if the execution failed because one of git's lock files existed
+    :exception RunException: called if the execution had a non-zero return code
+    """
+    if return_code == _SUCCESS_RETURN_CODE:
+        return collector.stdout
+    stderr = collector.stderr
+    lock_error = _GIT_LOCK_ERROR_PATTERN.search(stderr)
+    if lock_error is not None:
+        lock_path = lock_error.group(1) if lock_error.group(1) is not None else f"{lock_error.group(2)}.lock"
+        raise GitLockException(collector.stdout, stderr, arguments, execution_directory, lock_path)
+    raise RunException(collector.stdout, stderr, arguments, execution_directory)
+
+
+class Command(NamedTuple):
+    """
+    A command to run (see `run`).
+    """
+    arguments: List[str]
+    execution_directory: Optional[str] = None
+    execution_environment: Optional[Dict] = None
+    capture_stdout: bool = True
+    # Whether to retry the command if it fails because one of git's lock files exists (only safe for commands that
+    # fail without changing anything when they cannot take a lock)
+    retry_if_locked: bool = False
+
+
+class Delay(NamedTuple):
+    """
+    A pause between commands (e.g. before polling a lock again), which runners of asynchronous steps wait for without
+    blocking.
+    """
+    seconds: float
+
+
+# Generator that yields the commands that it needs ran (or the delays it needs), receiving what each command writes to
+# stdout in return (or a `RunException` thrown into it if the command fails)
+Steps = Generator[Union[Command, Delay], Optional[str], _T]
+
+
+def run_steps(steps: Steps[_T], *, timeout: float=None, output_callback: OutputCallback=None) -> _T:
+    """
+    Runs the commands yielded by the given steps, one at a time (sleeping for the delays yielded).
+    :param steps: the steps to run
+    :param timeout: the number of seconds to wait for all of the steps to complete (see `run`)
+    :param output_callback: called with each line written by the commands (see `run`)
+    :return: the value returned by the steps
+    :exception RunException: raised if a command fails and the steps do not handle the failure
+    :exception RunTimeoutException: raised if the steps did not complete within the timeout (including whilst waiting
+    for a delay)
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    try:
+        step = next(steps)
+        retries = 0
+        while True:
+            if isinstance(step, Delay):
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise RunTimeoutException("", "", [], None, timeout)
+                time.sleep(min(step.seconds, remaining) if remaining is not None else step.seconds)
+                step = steps.send(None)
+                continue
+            try:
+                stdout = run(step.arguments, step.execution_directory, step.execution_environment,
+                             capture_stdout=step.capture_stdout, output_callback=output_callback,
+                             timeout=max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+            except RunException as e:
+                delay = get_retry_delay(step, e, retries, deadline)
+                if delay is not None:
+                    time.sleep(delay)
+                    retries += 1
+                    continue
+                step = steps.throw(e)
+            else:
+                step = steps.send(stdout)
+            retries = 0
+    except StopIteration as e:
+        return e.value
+    finally:
+        steps.close()
+
+
+def get_retry_delay(command: Command, exception: RunException, retries: int, deadline: Optional[float]) \
+        -> Optional[float]:
+    """
+    Gets how long to wait before retrying a command that failed, with the delay growing (exponentially, with jitter)
+    for each retry.
+    :param command: the command that failed
+    :param exception: the exception that the command failed with
+    :param retries: the number of times the command has already been retried
+    :param deadline: when the steps that the command is part of must complete by (according to `time.monotonic`)
+    :return: the number of seconds to wait before retrying or `None` if the command is not to be retried
+    """
+    if not command.retry_if_locked or not isinstance(exception, GitLockException) \
+            or retries >= len(_GIT_LOCK_RETRY_DELAYS):
+        return None
+    delay = random.uniform(_GIT_LOCK_RETRY_DELAYS[retries] / 2, _GIT_LOCK_RETRY_DELAYS[retries])
+    if deadline is not None and time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+def _read_stream(pipe: BinaryIO, stream: str, collector: OutputCollector):
+    """
+    Reads the given pipe until it is closed, feeding what is read to the given collector.
+    :param pipe: the pipe to read from
+    :param stream: the name of the stream that the pipe is connected to
+    :param collector: the collector to feed
+    """
+    with pipe:
+        for data in iter(lambda: pipe.read1(_READ_SIZE), b""):
+            collector.feed(stream, data)
+    collector.close(stream)
+
+
+def _join(readers: List[Thread]):
+    """
+    Waits for the given readers to finish reading (giving up on readers whose pipe is held open by an orphaned process).
+    :param readers: the readers
+    """
+    for reader in readers:
+        reader.join(_TERMINATE_GRACE_PERIOD)
+
+
+def _terminate(process: subprocess.Popen, process_group: bool):
+    """
+    Terminates the given process, killing it if it does not exit soon after.
+    :param process: the process to terminate
+    :param process_group: whether the process leads its own process group, which should also be terminated
+    """
+    for terminate_signal in (signal.SIGTERM, getattr(signal, "SIGKILL", signal.SIGTERM)):
+        try:
+            if process_group and hasattr(os, "killpg"):
+                os.killpg(process.pid, terminate_signal)
+            else:
+                process.send_signal(terminate_signal)
+        except ProcessLookupError:
+            pass
+        try:
+            process.wait(_TERMINATE_GRACE_PERIOD)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+    if process_group and hasattr(os, "killpg"):
+        # Processes started by the process may outlive it
+        try:
+            os.killpg(process.pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except (ProcessLookupError, PermissionError):
+            pass
@@ -0,0 +1,133 @@
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+from gitsubrepo._common import Command, Steps
+from gitsubrepo._git import GIT_COMMAND
+from gitsubrepo.exceptions import RunException
+
+_GIT_FETCH_COMMAND = "fetch"
+# e.g. "fatal: Server does not support shallow clients" or "dumb http transport does not support shallow capabilities"
+_SHALLOW_UNSUPPORTED_ERROR_PATTERN = re.compile("does not support shallow", flags=re.IGNORECASE)
+# Remotes that do not support filters at all are ignored by `git` (with a warning), rather than failing
+_FILTER_UNSUPPORTED_ERROR_PATTERN = re.compile("filter '.*' not supported|did not send all necessary objects",
+                                               flags=re.IGNORECASE)
+# Shallow fetches into the same repository at the same time fail, bar the first to finish
+_SHALLOW_FILE_CHANGED_ERROR_PATTERN = re.compile("shallow file has changed since we read it")
+_SHALLOW_FILE_CHANGED_RETRIES = 10
+
+
+class FetchOptions(NamedTuple):
+    """
+    Limits on what is fetched from the upstream of a subrepo.
+    """
+    # Number of commits of history to fetch (all if `None`)
+    depth: Optional[int] = None
+    # Partial clone filter (e.g. `blob:none`), with the objects that are filtered out fetched when needed
+    filter: Optional[str] = None
+
+    def get_arguments(self) -> List[str]:
+        """
+        Gets the arguments to pass to `git fetch`.
+        :return: the arguments
+        """
+        return ([f"--depth={self.depth}"] if self.depth is not None else []) \
+            + ([f"--filter={self.filter}"] if self.filter is not None else [])
+
+
+def get_fetch_options(depth: Optional[int], filter: Optional[str]) -> FetchOptions:
+    """
+    Gets the limits on what is fetched from the upstream of a subrepo.
+    :param depth: the number of commits of history to fetch (all if `None`)
+    :param filter: the partial clone filter (none if `None`)
+    :return: the limits
+    :exception ValueError: raised if the depth is not positive
+    """
+    if depth is not None and depth < 1:
+        raise ValueError(f"Depth must be positive: {depth}")
+    return FetchOptions(depth, filter)
+
+
+def fetch_steps(location: str, refspecs: List[str], git_root: str, fetch_options: FetchOptions, *,
+                git_options: List[str]=(), arguments: List[str]=(), capture_stdout: bool=True) -> Steps[str]:
+    """
+    Steps to fetch from the given remote into the given repository, limited by the given options (which are dropped if
+    the remote rejects them, fetching everything instead). Shallow fetches that lose a race to update the repository's
+    shallow commits are retried.
+    :param location: the location of the remote repository
+    :param refspecs: the references to fetch
+    :param git_root: the root of the repository to fetch into
+    :param fetch_options: the limits on what is fetched
+    :param git_options: options to pass to `git`
+    :param arguments: other arguments to pass to `git fetch`
+    :param capture_stdout: whether all of stdout is required (see `Command`)
+    :return: what `git fetch` wrote to stdout
+    """
+    retries = 0
+    while True:
+        fetch_location = _get_filtered_location(location, git_root) if fetch_options.filter is not None else location
+        try:
+            return (yield Command([GIT_COMMAND, *git_options, _GIT_FETCH_COMMAND, *arguments,
+                                   *fetch_options.get_arguments(), fetch_location, *refspecs],
+                                  git_root, capture_stdout=capture_stdout, retry_if_locked=True))
+        except RunException as e:
+            if fetch_options.depth is not None and _SHALLOW_UNSUPPORTED_ERROR_PATTERN.search(e.stderr):
+                fetch_options = fetch_options._replace(depth=None)
+            elif fetch_options.filter is not None and _FILTER_UNSUPPORTED_ERROR_PATTERN.search(e.stderr):
+                fetch_options = fetch_options._replace(filter=None)
+            elif retries < _SHALLOW_FILE_CHANGED_RETRIES and _SHALLOW_FILE_CHANGED_ERROR_PATTERN.search(e.stderr):
+                retries += 1
+            else:
+                raise e
+
+
+def deepen_steps(location: str, refspecs: List[str], reference: str, commit: str, git_root: str,
+                 fetch_options: FetchOptions, *, git_options: List[str]=(), arguments: List[str]=()) -> Steps[None]:
+    """
+    Steps to deepen the history fetched (by `fetch_steps`) into the given reference until it reaches the given commit,
+    fetching twice as many more commits each time (so the whole history is fetched at worst).
+    :param location: the location of the remote repository
+    :param refspecs: the references that were fetched
+    :param reference: the reference whose history has to reach the commit
+    :param commit: the commit to reach
+    :param git_root: the root of the repository fetched into
+    :param fetch_options: the limits on what was fetched
+    :param git_options: options to pass to `git`
+    :param arguments: other arguments to pass to `git fetch`
+    """
+    if fetch_options.depth is None:
+        return
+    deepen = fetch_options.depth
+    commit_count = None
+    while True:
+        try:
+            yield Command([GIT_COMMAND, "merge-base", "--is-ancestor", commit, reference], git_root)
+            return
+        except RunException:
+            pass
+        if (yield Command([GIT_COMMAND, "rev-parse", "--is-shallow-repository"], git_root)) != "true":
+            return
+        previous_commit_count = commit_count
+        commit_count = yield Command([GIT_COMMAND, "rev-list", "--count", reference], git_root)
+        if commit_count == previous_commit_count:
+            # Reached the start of the history
+            return
+        yield from fetch_steps(location, refspecs, git_root, fetch_options._replace(depth=None),
+                               git_options=git_options, arguments=[*arguments, f"--deepen={deepen}"])
+        deepen *= 2
+
+
+def _get_filtered_location(location: str, git_root: str) -> str:
+    """
+    Gets the location to make a filtered fetch from. `git` records the location as a remote that the objects filtered
+    out are later fetched from, which cannot be named after a path, so local paths are given as `file://` URLs.
+    :param location: the location of the remote repository
+    :param git_root: the root of the repository being fetched into (that relative paths are relative to)
+    :return: the location to fetch from
+    """
+    if "://" in location:
+        return location
+    # Imported when needed, as `pathlib` is slow to import (see `gitsubrepo.__main__`)
+    from pathlib import Path
+    path = os.path.join(git_root, location)
+    return Path(os.path.abspath(path)).as_uri() if os.path.exists(path) else location
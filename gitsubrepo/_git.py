@@ -1,32 +1,115 @@
 import os
-from typing import Callable
+import re
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from typing import Callable, Optional, Tuple
 
 from gitsubrepo._common import run
+from gitsubrepo._toolchain import get_git_version
 from gitsubrepo.exceptions import NotAGitRepositoryException, RunException
 
 GIT_COMMAND = "git"
+GIT_DIRECTORY_NAME = ".git"
+NOT_A_GIT_REPOSITORY_ERROR_PATTERN = re.compile("not a git repository", flags=re.IGNORECASE)
+
+_GIT_FILE_PREFIX = "gitdir:"
+_GIT_DIR_ENVIRONMENT_VARIABLE = "GIT_DIR"
+_GIT_WORK_TREE_ENVIRONMENT_VARIABLE = "GIT_WORK_TREE"
+_GIT_CEILING_DIRECTORIES_ENVIRONMENT_VARIABLE = "GIT_CEILING_DIRECTORIES"
+_GIT_DISCOVERY_ACROSS_FILESYSTEM_ENVIRONMENT_VARIABLE = "GIT_DISCOVERY_ACROSS_FILESYSTEM"
+_DISCOVERY_ENVIRONMENT_VARIABLES = (
+    _GIT_DIR_ENVIRONMENT_VARIABLE, _GIT_WORK_TREE_ENVIRONMENT_VARIABLE, _GIT_CEILING_DIRECTORIES_ENVIRONMENT_VARIABLE,
+    _GIT_DISCOVERY_ACROSS_FILESYSTEM_ENVIRONMENT_VARIABLE)
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+_GIT_ROOT_CACHE_SIZE = 1024
+_git_root_cache: "OrderedDict[Tuple[Optional[str], ...], str]" = OrderedDict()
+_git_root_cache_lock = Lock()
 
 
 def requires_git(func: Callable) -> Callable:
     """
     Decorator to ensure `git` is accessible before calling a function.
+
+    `git` is only probed the first time it is required (and again if the `git` binary or `PATH` changes).
     :param func: the function to wrap
     :return: the wrapped function
     """
+    @wraps(func)
     def decorated(*args, **kwargs):
-        try:
-            run([GIT_COMMAND, "--version"])
-        except RunException as e:
-            raise RuntimeError("`git` does not appear to be working") from e
+        get_git_version()
         return func(*args, **kwargs)
 
     return decorated
 
 
-@requires_git
-def get_git_root_directory(directory: str):
+def get_git_root_directory(directory: str) -> str:
     """
     Gets the path of the git project root directory from the given directory.
+
+    The root is found by looking for `.git` in the directory and its parents (in the same way as `git`), with the result
+    cached (and checked to still be the nearest directory with `.git` whenever it is reused). `git rev-parse
+    --show-toplevel` is only used for layouts that `git` may treat specially (e.g. when `GIT_DIR` is set, for bare
+    repositories or when a repository owned by another user is found).
+    :param directory: the directory within a git repository
+    :return: the root directory of the git repository
+    :exception NotAGitRepositoryException: raised if the given directory is not within a git repository
+    """
+    real_directory = os.path.realpath(directory)
+    key = (real_directory, ) + tuple(os.environ.get(variable) for variable in _DISCOVERY_ENVIRONMENT_VARIABLES)
+    with _git_root_cache_lock:
+        git_root = _git_root_cache.get(key)
+        if git_root is not None:
+            _git_root_cache.move_to_end(key)
+    if git_root is not None and _is_cached_git_root_valid(real_directory, git_root):
+        return git_root
+
+    git_root = _find_git_root_directory(real_directory)
+    if git_root is None:
+        git_root = _get_git_root_directory_using_git(directory)
+
+    with _git_root_cache_lock:
+        _git_root_cache[key] = git_root
+        _git_root_cache.move_to_end(key)
+        while len(_git_root_cache) > _GIT_ROOT_CACHE_SIZE:
+            _git_root_cache.popitem(last=False)
+    return git_root
+
+
+def clear_git_root_cache():
+    """
+    Forgets the cached git root directories.
+    """
+    with _git_root_cache_lock:
+        _git_root_cache.clear()
+
+
+def _is_cached_git_root_valid(real_directory: str, git_root: str) -> bool:
+    """
+    Gets whether the cached git root directory of the given directory is still its root, i.e. it still has `.git` and no
+    directory between the two has gained `.git` (e.g. a repository created inside the repository).
+    :param real_directory: the directory (with symlinks resolved)
+    :param git_root: the cached root directory of the directory
+    :return: whether the cached root directory is still valid
+    """
+    if not os.path.exists(os.path.join(git_root, GIT_DIRECTORY_NAME)):
+        return False
+    if not real_directory.startswith(git_root.rstrip(os.sep) + os.sep):
+        # Not found by searching up from the directory (e.g. `GIT_WORK_TREE` is set)
+        return True
+    current_directory = real_directory
+    while current_directory != git_root:
+        if os.path.lexists(os.path.join(current_directory, GIT_DIRECTORY_NAME)):
+            return False
+        current_directory = os.path.dirname(current_directory)
+    return True
+
+
+@requires_git
+def _get_git_root_directory_using_git(directory: str) -> str:
+    """
+    Gets the path of the git project root directory from the given directory using `git rev-parse`.
     :param directory: the directory within a git repository
     :return: the root directory of the git repository
     :exception NotAGitRepositoryException: raised if the given directory is not within a git repository
@@ -34,11 +117,121 @@ def get_git_root_directory(directory: str):
     try:
         return run([GIT_COMMAND, "rev-parse", "--show-toplevel"], directory)
     except RunException as e:
-        if " Not a git repository" in e.stderr:
+        if NOT_A_GIT_REPOSITORY_ERROR_PATTERN.search(e.stderr):
             raise NotAGitRepositoryException(directory) from e
+        raise e
+
+
+def _find_git_root_directory(real_directory: str) -> Optional[str]:
+    """
+    Finds the git project root directory by searching up from the given directory for `.git`.
+    :param real_directory: the directory within a git repository (with symlinks resolved)
+    :return: the root directory of the git repository or `None` if `git` is required to determine it
+    :exception NotAGitRepositoryException: raised if the given directory is not within a git repository
+    """
+    if os.environ.get(_GIT_DIR_ENVIRONMENT_VARIABLE) or os.environ.get(_GIT_WORK_TREE_ENVIRONMENT_VARIABLE) \
+            or not os.path.isdir(real_directory):
+        return None
+    ceiling_directory = _get_ceiling_directory(real_directory)
+    across_filesystem = os.environ.get(_GIT_DISCOVERY_ACROSS_FILESYSTEM_ENVIRONMENT_VARIABLE, "").lower() \
+        in _TRUE_VALUES
+    device = os.stat(real_directory).st_dev
+
+    current_directory = real_directory
+    while True:
+        dot_git = os.path.join(current_directory, GIT_DIRECTORY_NAME)
+        if os.path.isfile(dot_git):
+            git_directory = _read_git_file(dot_git)
+            if git_directory is None or not _is_git_directory(git_directory):
+                return None
+            return current_directory if _is_owned(current_directory) else None
+        elif _is_git_directory(dot_git):
+            return current_directory if _is_owned(current_directory) else None
+        elif _is_git_directory(current_directory):
+            # Bare repository or inside a `.git` directory
+            return None
+
+        parent_directory = os.path.dirname(current_directory)
+        if parent_directory == current_directory or parent_directory == ceiling_directory:
+            raise NotAGitRepositoryException(real_directory)
+        if not across_filesystem and os.stat(parent_directory).st_dev != device:
+            return None
+        current_directory = parent_directory
+
+
+def _get_ceiling_directory(real_directory: str) -> Optional[str]:
+    """
+    Gets the (deepest) `GIT_CEILING_DIRECTORIES` entry that the given directory is below.
+    :param real_directory: the directory (with symlinks resolved)
+    :return: the ceiling directory or `None` if there is not one
+    """
+    ceiling_directories = os.environ.get(_GIT_CEILING_DIRECTORIES_ENVIRONMENT_VARIABLE, "").split(os.pathsep)
+    candidates = [os.path.realpath(ceiling) for ceiling in ceiling_directories if os.path.isabs(ceiling)]
+    candidates = [ceiling for ceiling in candidates
+                  if real_directory.startswith(ceiling.rstrip(os.sep) + os.sep) and real_directory != ceiling]
+    return max(candidates, key=len) if candidates else None
+
+
+def _read_git_file(git_file: str) -> Optional[str]:
+    """
+    Reads the location of the git directory from a `.git` file (as used by worktrees and submodules).
+    :param git_file: the location of the `.git` file
+    :return: the location of the git directory or `None` if the file is not a valid `.git` file
+    """
+    try:
+        with open(git_file, "r") as file:
+            contents = file.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not contents.startswith(_GIT_FILE_PREFIX):
+        return None
+    return os.path.join(os.path.dirname(git_file), contents[len(_GIT_FILE_PREFIX):].strip())
+
+
+def _is_git_directory(directory: str) -> bool:
+    """
+    Gets whether the given directory is a git directory (i.e. what is usually in `.git`).
+    :param directory: the directory to check
+    :return: whether the directory is a git directory
+    """
+    if not os.path.isfile(os.path.join(directory, "HEAD")):
+        return False
+    if os.path.isfile(os.path.join(directory, "commondir")):
+        return True
+    return os.path.isdir(os.path.join(directory, "objects")) and os.path.isdir(os.path.join(directory, "refs"))
+
+
+def _is_owned(directory: str) -> bool:
+    """
+    Gets whether the given directory is owned by the current user (`git` refuses to use other user's repositories unless
+    they are configured as safe, which is left to `git` to check).
+    :param directory: the directory to check
+    :return: whether the directory is owned by the current user
+    """
+    if not hasattr(os, "getuid"):
+        return False
+    return os.stat(directory).st_uid == os.getuid()
+
+
+def get_git_directory(git_root: str) -> str:
+    """
+    Gets the path of the git directory (i.e. what is usually `.git`) of the repository with the given root.
+
+    Linked worktrees and submodules have their own git directory, given in their `.git` file.
+    :param git_root: the root of the git repository
+    :return: the git directory of the repository
+    """
+    dot_git = os.path.join(git_root, GIT_DIRECTORY_NAME)
+    if os.path.isfile(dot_git):
+        git_directory = _read_git_file(dot_git)
+        if git_directory is not None:
+            return os.path.normpath(git_directory)
+    elif os.path.isdir(dot_git):
+        return dot_git
+    return os.path.join(git_root, run([GIT_COMMAND, "rev-parse", "--git-dir"], git_root))
 
 
-def get_directory_relative_to_git_root(directory: str):
+def get_directory_relative_to_git_root(directory: str) -> str:
     """
     Gets the path to the given directory relative to the git repository root in which it is a subdirectory.
     :param directory: the directory within a git repository
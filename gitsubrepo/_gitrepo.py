@@ -0,0 +1,189 @@
+import os
+from typing import Dict, NamedTuple, Optional
+
+from gitsubrepo.exceptions import NotAGitSubrepoException
+
+GITREPO_FILE_NAME = ".gitrepo"
+
+_SUBREPO_SECTION = "subrepo"
+_COMMENT_CHARACTERS = (";", "#")
+_ESCAPES = {"n": "\n", "t": "\t", "b": "\b", "\"": "\"", "\\": "\\"}
+_DATA_ENCODING = "utf-8"
+_FIELD_NAMES = ("remote", "branch", "commit", "parent", "method", "cmdver")
+# Written at the top of each new `.gitrepo` file by `git subrepo`
+_GITREPO_HEADER = """; DO NOT EDIT (unless you know what you are doing)
+;
+; This subdirectory is a git "subrepo", and this file is maintained by the
+; git-subrepo command. See https://github.com/ingydotnet/git-subrepo#readme
+;
+"""
+
+
+class GitRepoFile(NamedTuple):
+    """
+    Contents of the `.gitrepo` file that `git subrepo` maintains in the root of each subrepo.
+    """
+    remote: str
+    branch: str
+    commit: str
+    parent: Optional[str]
+    method: Optional[str]
+    cmdver: Optional[str]
+
+
+def get_gitrepo_path(directory: str) -> str:
+    """
+    Gets the path of the `.gitrepo` file belonging to the subrepo in the given directory.
+    :param directory: the directory containing the subrepo
+    :return: the path of the subrepo's `.gitrepo` file
+    """
+    return os.path.join(directory, GITREPO_FILE_NAME)
+
+
+def read_gitrepo(directory: str) -> GitRepoFile:
+    """
+    Reads the `.gitrepo` file of the subrepo in the given directory, without calling out to `git`.
+    :param directory: the directory containing the subrepo
+    :return: the parsed `.gitrepo` file
+    :exception NotAGitSubrepoException: raised if the directory does not contain a (valid) `.gitrepo` file
+    """
+    try:
+        with open(get_gitrepo_path(directory), "rb") as file:
+            contents = file.read()
+    except (FileNotFoundError, NotADirectoryError, IsADirectoryError) as e:
+        raise NotAGitSubrepoException(directory) from e
+    return parse_gitrepo(contents.decode(_DATA_ENCODING), directory)
+
+
+def parse_gitrepo(contents: str, directory: str=None) -> GitRepoFile:
+    """
+    Parses the contents of a `.gitrepo` file.
+    :param contents: the contents of the `.gitrepo` file (git config syntax)
+    :param directory: the directory the contents belong to (used in error messages)
+    :return: the parsed `.gitrepo` file
+    :exception NotAGitSubrepoException: raised if the contents do not describe a subrepo
+    """
+    values = _parse_git_config(contents).get(_SUBREPO_SECTION, {})
+    if not all(values.get(key) for key in ("remote", "branch", "commit")):
+        raise NotAGitSubrepoException(directory)
+    return GitRepoFile(remote=values["remote"], branch=values["branch"], commit=values["commit"],
+                       parent=values.get("parent"), method=values.get("method"), cmdver=values.get("cmdver"))
+
+
+def format_gitrepo(gitrepo: GitRepoFile) -> str:
+    """
+    Formats the contents of a new `.gitrepo` file, exactly as `git subrepo` would write it.
+    :param gitrepo: what the file is to contain (fields that are `None` are omitted)
+    :return: the contents of the `.gitrepo` file
+    """
+    return update_gitrepo(_GITREPO_HEADER, **gitrepo._asdict())
+
+
+def update_gitrepo(contents: str, **values: Optional[str]) -> str:
+    """
+    Sets values in the contents of a `.gitrepo` file, in the same way that `git config --file` would (as used by
+    `git subrepo`), leaving the rest of the contents untouched.
+    :param contents: the contents of the `.gitrepo` file
+    :param values: the values to set, keyed by field name (`None` values are not set)
+    :return: the updated contents
+    """
+    lines = contents.splitlines(keepends=True)
+    for key in (key for key in _FIELD_NAMES if values.get(key) is not None):
+        line = f"\t{key} = {_format_git_config_value(values[key])}\n"
+        in_section = False
+        section_end: Optional[int] = None
+        key_index: Optional[int] = None
+        for index, existing_line in enumerate(lines):
+            stripped = existing_line.strip()
+            if stripped.startswith("["):
+                in_section = _get_section_name(stripped) == _SUBREPO_SECTION
+                if in_section:
+                    section_end = index + 1
+            elif in_section and stripped and stripped[0] not in _COMMENT_CHARACTERS:
+                section_end = index + 1
+                if stripped.partition("=")[0].strip().lower() == key:
+                    key_index = index
+
+        if key_index is not None:
+            lines[key_index] = line
+        else:
+            if section_end is None:
+                if lines and not lines[-1].endswith("\n"):
+                    lines[-1] += "\n"
+                lines.append(f"[{_SUBREPO_SECTION}]\n")
+                section_end = len(lines)
+            lines.insert(section_end, line)
+    return "".join(lines)
+
+
+def _format_git_config_value(value: str) -> str:
+    """
+    Formats a value as `git config` writes it, quoting and escaping where necessary.
+    :param value: the value
+    :return: the value as written in a config file
+    """
+    quote = "\"" if value.startswith(" ") or value.endswith(" ") or any(
+        character in value for character in _COMMENT_CHARACTERS) else ""
+    escaped = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n").replace("\t", "\\t")
+    return f"{quote}{escaped}{quote}"
+
+
+def _parse_git_config(contents: str) -> Dict[str, Dict[str, str]]:
+    """
+    Parses the subset of the git config file syntax used by `git config --file` (as used by `git subrepo`).
+    :param contents: the git config file contents
+    :return: mapping between (lower case) section names and the (lower case) keys and values within them
+    """
+    sections: Dict[str, Dict[str, str]] = {}
+    section: Optional[Dict[str, str]] = None
+    for line in contents.splitlines():
+        line = line.strip()
+        if not line or line[0] in _COMMENT_CHARACTERS:
+            continue
+        if line[0] == "[":
+            section = sections.setdefault(_get_section_name(line), {})
+            continue
+        if section is None:
+            continue
+        key, separator, raw_value = line.partition("=")
+        section[key.strip().lower()] = _parse_git_config_value(raw_value) if separator else "true"
+    return sections
+
+
+def _get_section_name(line: str) -> str:
+    """
+    Gets the name of the section that the given git config section header starts.
+    :param line: the section header (e.g. `[subrepo]`)
+    :return: the (lower case) section name
+    """
+    return line[1:line.index("]")].split(" ", 1)[0].strip().lower()
+
+
+def _parse_git_config_value(raw_value: str) -> str:
+    """
+    Parses a git config value, handling quoting, escape sequences and trailing comments.
+    :param raw_value: the value as written in the config file
+    :return: the parsed value
+    """
+    value = []
+    quoted = False
+    pending_whitespace = ""
+    characters = iter(raw_value.strip())
+    for character in characters:
+        if character == "\\":
+            escaped = next(characters, "")
+            value.append(pending_whitespace + _ESCAPES.get(escaped, escaped))
+            pending_whitespace = ""
+        elif character == "\"":
+            quoted = not quoted
+        elif quoted:
+            value.append(pending_whitespace + character)
+            pending_whitespace = ""
+        elif character in _COMMENT_CHARACTERS:
+            break
+        elif character.isspace():
+            pending_whitespace += character
+        else:
+            value.append(pending_whitespace + character)
+            pending_whitespace = ""
+    return "".join(value)
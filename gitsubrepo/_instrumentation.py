@@ -0,0 +1,325 @@
+import itertools
+import os
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar, copy_context
+from functools import wraps, partial
+from threading import Lock
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Upper bounds (in seconds) of the buckets of latency histograms, with a final bucket for longer latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Subcommands that are followed by their own subcommand (e.g. `git subrepo clone`)
+_SUBCOMMANDS_WITH_SUBCOMMANDS = ("subrepo", )
+# `inspect.CO_COROUTINE`, the code flag of `async def` functions (`inspect` is slow to import)
+_CO_COROUTINE = 0x80
+
+
+class Operation(NamedTuple):
+    """
+    Call to a public function of this library (e.g. `clone`), which the processes it spawns are grouped under.
+    """
+    name: str
+    id: int
+
+
+class ProcessRecord(NamedTuple):
+    """
+    Record of a process that was spawned and has exited.
+    """
+    arguments: List[str]
+    execution_directory: Optional[str]
+    duration: float
+    return_code: Optional[int]
+    stdout_size: int
+    stderr_size: int
+    operation: Optional[Operation]
+
+
+class LockWaitRecord(NamedTuple):
+    """
+    Record of a wait for the lock on a repository (see `lock_repository`).
+    """
+    git_root: str
+    duration: float
+    acquired: bool
+    operation: Optional[Operation]
+
+
+# Called with the record of each process spawned (from the thread that waited for the process)
+ProcessHook = Callable[[ProcessRecord], None]
+# Called with the record of each wait for the lock on a repository (from the thread that waited)
+LockWaitHook = Callable[[LockWaitRecord], None]
+
+_process_hooks: Tuple[ProcessHook, ...] = ()
+_lock_wait_hooks: Tuple[LockWaitHook, ...] = ()
+_hooks_lock = Lock()
+_current_operation: ContextVar[Optional[Operation]] = ContextVar("gitsubrepo_operation", default=None)
+_operation_ids = itertools.count(1)
+
+
+def add_process_hook(hook: ProcessHook):
+    """
+    Registers a hook to be called with the record of every process spawned (which must not raise).
+    :param hook: the hook
+    """
+    global _process_hooks
+    with _hooks_lock:
+        _process_hooks = _process_hooks + (hook, )
+
+
+def remove_process_hook(hook: ProcessHook):
+    """
+    Unregisters a hook registered with `add_process_hook`.
+    :param hook: the hook
+    """
+    global _process_hooks
+    with _hooks_lock:
+        hooks = list(_process_hooks)
+        hooks.remove(hook)
+        _process_hooks = tuple(hooks)
+
+
+def record_process(arguments: List[str], execution_directory: Optional[str], started: float,
+                   return_code: Optional[int], stdout_size: int, stderr_size: int,
+                   operation: Optional[Operation]=None):
+    """
+    Passes the record of a process that has exited to the registered hooks.
+    :param arguments: the CLI arguments that were ran
+    :param execution_directory: the directory the arguments were executed in
+    :param started: when the process was started (according to `time.monotonic`)
+    :param return_code: the return code of the process
+    :param stdout_size: the number of bytes written to stdout
+    :param stderr_size: the number of bytes written to stderr
+    :param operation: the operation the process was spawned by (defaults to the current operation)
+    """
+    hooks = _process_hooks
+    if len(hooks) == 0:
+        return
+    record = ProcessRecord(
+        arguments=list(arguments), execution_directory=execution_directory, duration=time.monotonic() - started,
+        return_code=return_code, stdout_size=stdout_size, stderr_size=stderr_size,
+        operation=operation if operation is not None else get_current_operation())
+    for hook in hooks:
+        hook(record)
+
+
+def add_lock_wait_hook(hook: LockWaitHook):
+    """
+    Registers a hook to be called with the record of every wait for the lock on a repository (which must not raise).
+    :param hook: the hook
+    """
+    global _lock_wait_hooks
+    with _hooks_lock:
+        _lock_wait_hooks = _lock_wait_hooks + (hook, )
+
+
+def remove_lock_wait_hook(hook: LockWaitHook):
+    """
+    Unregisters a hook registered with `add_lock_wait_hook`.
+    :param hook: the hook
+    """
+    global _lock_wait_hooks
+    with _hooks_lock:
+        hooks = list(_lock_wait_hooks)
+        hooks.remove(hook)
+        _lock_wait_hooks = tuple(hooks)
+
+
+def record_lock_wait(git_root: str, started: float, acquired: bool):
+    """
+    Passes the record of a wait for the lock on a repository to the registered hooks.
+    :param git_root: the root of the repository
+    :param started: when the wait started (according to `time.monotonic`)
+    :param acquired: whether the lock was acquired (else the wait timed out or was interrupted)
+    """
+    hooks = _lock_wait_hooks
+    if len(hooks) == 0:
+        return
+    record = LockWaitRecord(git_root=git_root, duration=time.monotonic() - started, acquired=acquired,
+                            operation=get_current_operation())
+    for hook in hooks:
+        hook(record)
+
+
+def get_current_operation() -> Optional[Operation]:
+    """
+    Gets the operation that processes spawned now would be grouped under.
+    :return: the current operation or `None` if not within an operation
+    """
+    return _current_operation.get()
+
+
+def operation(func: Callable) -> Callable:
+    """
+    Decorator to group the processes spawned by a (sync or async) function under an operation named after it. Calls
+    made within an operation stay grouped under that operation.
+    :param func: the function to wrap
+    :return: the wrapped function
+    """
+    if getattr(func, "__code__", None) is not None and func.__code__.co_flags & _CO_COROUTINE:
+        @wraps(func)
+        async def decorated(*args, **kwargs):
+            if _current_operation.get() is not None:
+                return await func(*args, **kwargs)
+            token = _current_operation.set(Operation(func.__name__, next(_operation_ids)))
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _current_operation.reset(token)
+    else:
+        @wraps(func)
+        def decorated(*args, **kwargs):
+            if _current_operation.get() is not None:
+                return func(*args, **kwargs)
+            token = _current_operation.set(Operation(func.__name__, next(_operation_ids)))
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _current_operation.reset(token)
+
+    return decorated
+
+
+def in_current_context(func: Callable) -> Callable:
+    """
+    Binds the given function to the current context, so that processes it spawns in another thread (e.g. in a
+    `ThreadPoolExecutor`) are grouped under the current operation.
+    :param func: the function to bind
+    :return: the bound function
+    """
+    return partial(copy_context().run, func)
+
+
+def get_command_name(arguments: List[str]) -> str:
+    """
+    Gets the name of the command ran by the given arguments, which processes are aggregated by (e.g. `git ls-files`).
+    :param arguments: the CLI arguments
+    :return: the name of the command
+    """
+    names = [os.path.basename(arguments[0])] if len(arguments) > 0 else []
+    arguments = iter(arguments[1:])
+    for argument in arguments:
+        if argument == "-c":
+            # Configuration given to `git`, rather than the subcommand
+            next(arguments, None)
+        elif not argument.startswith("-"):
+            names.append(argument)
+            if argument not in _SUBCOMMANDS_WITH_SUBCOMMANDS:
+                break
+    return " ".join(names)
+
+
+class _RegisteredHook(ABC):
+    """
+    Process hook that registers itself whilst used as a context manager.
+    """
+    def __enter__(self):
+        add_process_hook(self)
+        return self
+
+    def __exit__(self, *args):
+        remove_process_hook(self)
+
+    @abstractmethod
+    def __call__(self, record: ProcessRecord):
+        """
+        Called with the record of each process spawned whilst registered.
+        :param record: the record of the process
+        """
+
+
+class ProcessRecorder(_RegisteredHook):
+    """
+    Records every process spawned whilst it is registered (e.g. `with ProcessRecorder() as recorder:`).
+    """
+    def __init__(self):
+        self._records: List[ProcessRecord] = []
+        self._lock = Lock()
+
+    @property
+    def records(self) -> List[ProcessRecord]:
+        """
+        The records of the processes spawned, in the order that they exited.
+        """
+        with self._lock:
+            return list(self._records)
+
+    def get_records_by_operation(self) -> Dict[Optional[Operation], List[ProcessRecord]]:
+        """
+        Gets the records of the processes spawned, grouped by the operation that spawned them.
+        :return: mapping between each operation (or `None` for processes spawned outside of an operation) and the
+        records of the processes it spawned
+        """
+        records_by_operation: Dict[Optional[Operation], List[ProcessRecord]] = {}
+        for record in self.records:
+            records_by_operation.setdefault(record.operation, []).append(record)
+        return records_by_operation
+
+    def __call__(self, record: ProcessRecord):
+        with self._lock:
+            self._records.append(record)
+
+
+class ProcessStatistics(_RegisteredHook):
+    """
+    Aggregates the number of processes spawned, and a histogram of their latencies, per command whilst it is registered
+    (e.g. `with ProcessStatistics() as statistics:`).
+    """
+    def __init__(self):
+        self._spawn_counts: Dict[str, int] = {}
+        self._latency_histograms: Dict[str, List[int]] = {}
+        self._total_durations: Dict[str, float] = {}
+        self._lock = Lock()
+
+    @property
+    def spawn_counts(self) -> Dict[str, int]:
+        """
+        Mapping between the name of each command (see `get_command_name`) and the number of times it was spawned.
+        """
+        with self._lock:
+            return dict(self._spawn_counts)
+
+    @property
+    def total_spawn_count(self) -> int:
+        """
+        The number of processes spawned.
+        """
+        with self._lock:
+            return sum(self._spawn_counts.values())
+
+    @property
+    def latency_histograms(self) -> Dict[str, List[int]]:
+        """
+        Mapping between the name of each command and the number of its processes that took up to each of the
+        `LATENCY_BUCKETS` (with a final count of those that took longer).
+        """
+        with self._lock:
+            return {command: list(histogram) for command, histogram in self._latency_histograms.items()}
+
+    @property
+    def total_durations(self) -> Dict[str, float]:
+        """
+        Mapping between the name of each command and the total number of seconds that its processes took.
+        """
+        with self._lock:
+            return dict(self._total_durations)
+
+    def reset(self):
+        """
+        Forgets all aggregated processes.
+        """
+        with self._lock:
+            self._spawn_counts.clear()
+            self._latency_histograms.clear()
+            self._total_durations.clear()
+
+    def __call__(self, record: ProcessRecord):
+        command = get_command_name(record.arguments)
+        with self._lock:
+            self._spawn_counts[command] = self._spawn_counts.get(command, 0) + 1
+            histogram = self._latency_histograms.setdefault(command, [0] * (len(LATENCY_BUCKETS) + 1))
+            histogram[bisect_left(LATENCY_BUCKETS, record.duration)] += 1
+            self._total_durations[command] = self._total_durations.get(command, 0.0) + record.duration
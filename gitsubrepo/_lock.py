@@ -0,0 +1,98 @@
+import os
+import time
+from typing import Callable, Optional
+
+from gitsubrepo._common import Delay, Steps
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Whether locks are shared between processes (`FileLock` is a no-op if not)
+LOCKING_SUPPORTED = fcntl is not None
+
+_MINIMUM_POLL_INTERVAL = 0.005
+_MAXIMUM_POLL_INTERVAL = 0.1
+
+
+def poll_steps(condition: Callable[[], bool], *, timeout: float=None) -> Steps[bool]:
+    """
+    Steps to wait for the given condition to hold, polling it with a growing delay between polls (so that runners of
+    asynchronous steps are not blocked whilst waiting).
+    :param condition: the condition to poll
+    :param timeout: the number of seconds to wait for the condition (waits indefinitely if not set)
+    :return: whether the condition held within the timeout
+    """
+    started = time.monotonic()
+    poll_interval = _MINIMUM_POLL_INTERVAL
+    while not condition():
+        remaining = timeout - (time.monotonic() - started) if timeout is not None else None
+        if remaining is not None and remaining <= 0:
+            return False
+        yield Delay(min(poll_interval, remaining) if remaining is not None else poll_interval)
+        poll_interval = min(poll_interval * 2, _MAXIMUM_POLL_INTERVAL)
+    return True
+
+
+class FileLock:
+    """
+    Advisory lock, shared between processes, on a lock file (a no-op on platforms without `fcntl`).
+    """
+    def __init__(self, path: str):
+        """
+        Constructor.
+        :param path: the path of the lock file (created if it does not exist)
+        """
+        self.path = path
+        self._file_descriptor: Optional[int] = None
+
+    @property
+    def locked(self) -> bool:
+        """
+        Whether the lock is held.
+        """
+        return self._file_descriptor is not None
+
+    def acquire(self, *, shared: bool=False, blocking: bool=True) -> bool:
+        """
+        Acquires the lock (or changes the mode of the lock if it is already held).
+        :param shared: whether to acquire a shared lock, rather than an exclusive lock
+        :param blocking: whether to wait for the lock if it is held elsewhere
+        :return: whether the lock was acquired (always `True` if blocking)
+        """
+        opened = self._file_descriptor is None
+        if opened:
+            self._file_descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        if fcntl is None:
+            return True
+        operation = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(self._file_descriptor, operation)
+        except BlockingIOError:
+            if opened:
+                self.release()
+            return False
+        return True
+
+    def acquire_steps(self, *, shared: bool=False) -> Steps[None]:
+        """
+        Steps to acquire the lock (see `acquire`), polling for it whilst it is held elsewhere rather than blocking.
+        :param shared: whether to acquire a shared lock, rather than an exclusive lock
+        """
+        yield from poll_steps(lambda: self.acquire(shared=shared, blocking=False))
+
+    def release(self):
+        """
+        Releases the lock, if held.
+        """
+        if self._file_descriptor is not None:
+            os.close(self._file_descriptor)
+            self._file_descriptor = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
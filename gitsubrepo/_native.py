@@ -0,0 +1,317 @@
+import os
+from typing import List, Dict, NamedTuple, Optional
+
+from gitsubrepo._common import Command, Steps
+from gitsubrepo._fetch import FetchOptions, fetch_steps, deepen_steps
+from gitsubrepo._git import GIT_COMMAND
+from gitsubrepo._gitrepo import GitRepoFile, GITREPO_FILE_NAME, format_gitrepo, update_gitrepo, get_gitrepo_path, \
+    read_gitrepo
+from gitsubrepo._toolchain import get_git_subrepo_version
+from gitsubrepo.exceptions import UnstagedChangeException, RunException
+
+_SUBREPO_REFERENCE_PREFIX = "refs/subrepo/"
+_SUBREPO_BRANCH_PREFIX = "subrepo/"
+_FETCH_REFERENCE_NAME = "fetch"
+_COMMIT_REFERENCE_NAME = "commit"
+_MERGE_METHOD = "merge"
+_REBASE_METHOD = "rebase"
+_NO_COMMIT = "none"
+_DATA_ENCODING = "utf-8"
+
+# Recorded as the version of `git subrepo` (in `.gitrepo` and commit messages) if it is not installed
+_GIT_SUBREPO_VERSION = "0.4.6"
+# `git subrepo` records where it was installed from, which is only known when it is installed from a git checkout
+_UNKNOWN_COMMAND_INFORMATION = "???"
+
+_COMMIT_MESSAGE_TEMPLATE = """git subrepo {command}{merge} {arguments}
+
+subrepo:
+  subdir:   "{subdir}"
+  merged:   "{merged}"
+upstream:
+  origin:   "{remote}"
+  branch:   "{branch}"
+  commit:   "{commit}"
+git-subrepo:
+  version:  "{version}"
+  origin:   "{unknown}"
+  commit:   "{unknown}\""""
+
+# Characters that `git subrepo` encodes when making reference names from subrepo directories (in the order it does so)
+_REFERENCE_ENCODINGS: Dict[str, str] = {
+    **{chr(code): f"%{code:02x}" for code in range(1, 32)}, "\x7f": "%7f", " ": "%20", "~": "%7e", "^": "%5e",
+    ":": "%3a", "?": "%3f", "*": "%2a", "[": "%5b"}
+_INVALID_REFERENCE_CHARACTERS = frozenset(chr(code) for code in range(0, 32)) | frozenset("\x7f ~^:?*[\\")
+
+_default_native = False
+
+
+class _Upstream(NamedTuple):
+    """
+    Commit that the upstream of a subrepo is on.
+    """
+    commit: str
+    short_commit: str
+    is_merge: bool
+
+
+def set_default_native(native: bool):
+    """
+    Sets whether `clone` and `pull` build subrepos directly from git plumbing, rather than calling `git subrepo`, when
+    not told which to do.
+    :param native: whether to use git plumbing by default
+    """
+    global _default_native
+    _default_native = native
+
+
+def get_default_native() -> bool:
+    """
+    Gets whether `clone` and `pull` build subrepos directly from git plumbing, rather than calling `git subrepo`, when
+    not told which to do.
+    :return: whether git plumbing is used by default
+    """
+    return _default_native
+
+
+def clone_steps(location: str, subdir: str, reference: str, git_root: str, *, git_options: List[str]=(),
+                execution_environment: Dict=None, fetch_options: FetchOptions=FetchOptions()) -> Steps[str]:
+    """
+    Steps to clone the repository at the given location into the given directory using git plumbing, making the same
+    commit (and `.gitrepo` file) as `git subrepo clone --branch <reference> <location> <subdir>`.
+    :param location: the location of the repository to clone
+    :param subdir: the directory to clone into, relative to the root of the parent repository
+    :param reference: the branch, tag or commit to clone
+    :param git_root: the root of the parent repository
+    :param git_options: options to pass to `git` when fetching
+    :param execution_environment: the environment to make the commit in
+    :param fetch_options: limits on what is fetched from the repository
+    :return: the commit cloned
+    :exception UnstagedChangeException: raised if the parent repository has changes
+    :exception RunException: raised if the repository or reference cannot be fetched
+    """
+    # `git subrepo` removes a trailing slash from its first argument
+    location = location[:-1] if location.endswith("/") else location
+    subref = _get_subref(subdir)
+    yield from _assert_clean_steps(git_root, UnstagedChangeException(git_root))
+    head = yield from _get_head_steps(git_root)
+    upstream = yield from _fetch_steps(location, reference, subref, git_root, git_options, fetch_options)
+
+    os.makedirs(os.path.join(git_root, subdir), exist_ok=True)
+    yield Command([GIT_COMMAND, "read-tree", f"--prefix={subdir}", "-u", upstream.commit], git_root,
+                  retry_if_locked=True)
+    gitrepo = GitRepoFile(remote=location, branch=reference, commit=upstream.commit, parent=head or _NO_COMMIT,
+                          method=_MERGE_METHOD, cmdver=_get_git_subrepo_version())
+    yield from _write_gitrepo_steps(format_gitrepo(gitrepo), subdir, git_root)
+
+    message = _get_commit_message("clone", [f"--branch={reference}", location, subdir], subdir, location, reference,
+                                  upstream)
+    yield from _commit_steps(message, head, git_root, execution_environment)
+    yield Command([GIT_COMMAND, "update-ref", _get_subrepo_reference(subref, _COMMIT_REFERENCE_NAME),
+                   upstream.commit], git_root, retry_if_locked=True)
+    return upstream.commit
+
+
+def pull_steps(directory: str, subdir: str, git_root: str, *, fetch_options: FetchOptions=FetchOptions(),
+               prefetched_reference: str=None) -> Steps[Optional[str]]:
+    """
+    Steps to pull the subrepo in the given directory using git plumbing, making the same commit (and `.gitrepo` file) as
+    `git subrepo pull <subdir>`.
+
+    Only pulls that fast-forward a subrepo without local changes are made this way. Merging (or rebasing) local changes
+    is left to `git subrepo`. If the history fetched is limited, it is deepened until it reaches the commit last pulled.
+    :param directory: the directory containing the subrepo
+    :param subdir: the directory containing the subrepo, relative to the root of the parent repository
+    :param git_root: the root of the parent repository
+    :param fetch_options: limits on what is fetched from the subrepo's remote
+    :param prefetched_reference: reference in the parent repository that the subrepo's upstream has already been
+    fetched into (with its history reaching the commit last pulled), which is used rather than fetching it again
+    :return: the commit pulled, or `None` if the pull has to be done by `git subrepo` (the upstream is left fetched)
+    :exception UnstagedChangeException: raised if the parent repository has changes
+    """
+    gitrepo = read_gitrepo(directory)
+    with open(get_gitrepo_path(directory), "rb") as file:
+        contents = file.read().decode(_DATA_ENCODING)
+    subref = _get_subref(subdir)
+    yield from _assert_clean_steps(git_root, UnstagedChangeException())
+    head = yield from _get_head_steps(git_root)
+    if prefetched_reference is not None:
+        upstream = yield from _fetch_steps(git_root, prefetched_reference, subref, git_root, [], FetchOptions())
+    else:
+        upstream = yield from _fetch_steps(gitrepo.remote, gitrepo.branch, subref, git_root, [], fetch_options,
+                                           ancestor=gitrepo.commit)
+    if upstream.commit == gitrepo.commit:
+        return upstream.commit
+
+    try:
+        yield Command([GIT_COMMAND, "merge-base", "--is-ancestor", gitrepo.commit, upstream.commit], git_root)
+        yield Command([GIT_COMMAND, "diff-tree", "--quiet", gitrepo.commit, f"{head}:{subdir}", "--", ".",
+                       f":(exclude){GITREPO_FILE_NAME}"], git_root)
+    except RunException:
+        # Not a fast-forward of what was last pulled, or the subrepo has been changed locally
+        return None
+
+    yield Command([GIT_COMMAND, "rm", "-r", "-q", "--", subdir], git_root, retry_if_locked=True)
+    yield Command([GIT_COMMAND, "read-tree", f"--prefix={subdir}", "-u", upstream.commit], git_root,
+                  retry_if_locked=True)
+    method = _REBASE_METHOD if gitrepo.method == _REBASE_METHOD else _MERGE_METHOD
+    yield from _write_gitrepo_steps(
+        update_gitrepo(contents, commit=upstream.commit, parent=head, method=method,
+                       cmdver=_get_git_subrepo_version()), subdir, git_root)
+
+    message = _get_commit_message("pull", [subdir], subdir, gitrepo.remote, gitrepo.branch, upstream)
+    yield from _commit_steps(message, head, git_root)
+    yield Command([GIT_COMMAND, "update-ref", _get_subrepo_reference(subref, _COMMIT_REFERENCE_NAME),
+                   upstream.commit], git_root, retry_if_locked=True)
+    return upstream.commit
+
+
+def _assert_clean_steps(git_root: str, exception: Exception) -> Steps[None]:
+    """
+    Steps to check that the parent repository has no changes to tracked files (as `git subrepo` requires).
+    :param git_root: the root of the parent repository
+    :param exception: the exception to raise if there are changes
+    """
+    changes = yield Command([GIT_COMMAND, "status", "--porcelain", "--untracked-files=no", "--ignore-submodules"],
+                            git_root)
+    if changes:
+        raise exception
+
+
+def _get_head_steps(git_root: str) -> Steps[Optional[str]]:
+    """
+    Steps to get the commit that the parent repository is on.
+    :param git_root: the root of the parent repository
+    :return: the commit or `None` if the repository has no commits
+    """
+    try:
+        return (yield Command([GIT_COMMAND, "rev-parse", "--verify", "--quiet", "HEAD^{commit}"], git_root))
+    except RunException:
+        return None
+
+
+def _fetch_steps(location: str, reference: str, subref: str, git_root: str, git_options: List[str],
+                 fetch_options: FetchOptions, *, ancestor: str=None) -> Steps[_Upstream]:
+    """
+    Steps to fetch the given reference from the given remote into the subrepo's fetch reference (as `git subrepo` does).
+    :param location: the location of the remote repository
+    :param reference: the branch, tag or commit to fetch
+    :param subref: the name that `git subrepo` uses for the subrepo in reference names
+    :param git_root: the root of the parent repository
+    :param git_options: options to pass to `git`
+    :param fetch_options: limits on what is fetched
+    :param ancestor: commit that the history fetched has to reach, if limited
+    :return: the commit fetched
+    """
+    fetch_reference = _get_subrepo_reference(subref, _FETCH_REFERENCE_NAME)
+    refspecs = [f"+{reference}:{fetch_reference}"]
+    yield from fetch_steps(location, refspecs, git_root, fetch_options, git_options=git_options,
+                           arguments=["--no-tags"], capture_stdout=False)
+    if ancestor is not None:
+        yield from deepen_steps(location, refspecs, fetch_reference, ancestor, git_root, fetch_options,
+                                git_options=git_options, arguments=["--no-tags", "--quiet"])
+    commit, short_commit, *parents = (yield Command(
+        [GIT_COMMAND, "log", "-1", "--format=%H %h %P", fetch_reference], git_root)).split()
+    # Tags are fetched as they are, whereas `git subrepo` keeps the commit that they point to
+    yield Command([GIT_COMMAND, "update-ref", fetch_reference, commit], git_root, retry_if_locked=True)
+    return _Upstream(commit, short_commit, len(parents) > 1)
+
+
+def _write_gitrepo_steps(contents: str, subdir: str, git_root: str) -> Steps[None]:
+    """
+    Steps to write and stage the `.gitrepo` file of a subrepo.
+    :param contents: the contents of the `.gitrepo` file
+    :param subdir: the directory containing the subrepo, relative to the root of the parent repository
+    :param git_root: the root of the parent repository
+    """
+    with open(get_gitrepo_path(os.path.join(git_root, subdir)), "wb") as file:
+        file.write(contents.encode(_DATA_ENCODING))
+    yield Command([GIT_COMMAND, "add", "-f", "--", f"{subdir}/{GITREPO_FILE_NAME}"], git_root, retry_if_locked=True)
+
+
+def _commit_steps(message: str, head: Optional[str], git_root: str, execution_environment: Dict=None) -> Steps[str]:
+    """
+    Steps to commit the index of the parent repository onto the branch it is on (without running commit hooks).
+    :param message: the commit message
+    :param head: the commit that the parent repository is on (`None` if it has no commits)
+    :param git_root: the root of the parent repository
+    :param execution_environment: the environment to make the commit in
+    :return: the commit made
+    """
+    tree = yield Command([GIT_COMMAND, "write-tree"], git_root, retry_if_locked=True)
+    commit = yield Command([GIT_COMMAND, "commit-tree", *(["-p", head] if head else []), "-m", message, tree],
+                           git_root, execution_environment)
+    reflog_message = f"commit{'' if head else ' (initial)'}: {message.splitlines()[0]}"
+    yield Command([GIT_COMMAND, "update-ref", "-m", reflog_message, "HEAD", commit, head or ""], git_root,
+                  retry_if_locked=True)
+    return commit
+
+
+def _get_commit_message(command: str, arguments: List[str], subdir: str, remote: str, branch: str,
+                        upstream: _Upstream) -> str:
+    """
+    Gets the message of the commit that `git subrepo` would make.
+    :param command: the `git subrepo` command
+    :param arguments: the arguments given to the command
+    :param subdir: the directory containing the subrepo, relative to the root of the parent repository
+    :param remote: the location of the subrepo's remote
+    :param branch: the branch (or tag or commit) of the remote that the subrepo tracks
+    :param upstream: the commit that was merged
+    :return: the commit message
+    """
+    return _COMMIT_MESSAGE_TEMPLATE.format(
+        command=command, merge=" (merge)" if upstream.is_merge else "", arguments=" ".join(arguments), subdir=subdir,
+        merged=upstream.short_commit, remote=remote, branch=branch, commit=upstream.short_commit,
+        version=_get_git_subrepo_version(), unknown=_UNKNOWN_COMMAND_INFORMATION)
+
+
+def _get_git_subrepo_version() -> str:
+    """
+    Gets the version of `git subrepo` to record.
+    :return: the version of `git subrepo` installed, or the version whose behaviour is copied if it is not installed
+    """
+    try:
+        return ".".join(str(part) for part in get_git_subrepo_version())
+    except RuntimeError:
+        return _GIT_SUBREPO_VERSION
+
+
+def _get_subrepo_reference(subref: str, name: str) -> str:
+    """
+    Gets the name of one of the references that `git subrepo` keeps for a subrepo.
+    :param subref: the name that `git subrepo` uses for the subrepo in reference names
+    :param name: the name of the reference (e.g. "fetch")
+    :return: the full reference name
+    """
+    return f"{_SUBREPO_REFERENCE_PREFIX}{subref}/{name}"
+
+
+def _get_subref(subdir: str) -> str:
+    """
+    Gets the name that `git subrepo` uses for the subrepo in the given directory in reference names, which is the
+    directory itself unless it has to be encoded to make valid reference names.
+    :param subdir: the directory containing the subrepo, relative to the root of the parent repository
+    :return: the name used in reference names
+    """
+    if _is_valid_reference_name(f"{_SUBREPO_BRANCH_PREFIX}{subdir}"):
+        return subdir
+    subref = f"/{subdir.replace('%', '%25')}/".replace("/.", "/%2e").replace(".lock/", "%2elock/")[1:-1]
+    subref = subref.replace("..", "%2e%2e").replace("%2e.", "%2e%2e").replace(".%2e", "%2e%2e")
+    for character, encoding in _REFERENCE_ENCODINGS.items():
+        subref = subref.replace(character, encoding)
+    subref = "/".join(component for component in subref.split("/") if component)
+    if subref.endswith("."):
+        subref = f"{subref[:-1]}%2e"
+    return subref.replace("@{", "%40{").replace("\\", "%5c")
+
+
+def _is_valid_reference_name(name: str) -> bool:
+    """
+    Gets whether the given name is a valid reference name (following the rules of `git check-ref-format`).
+    :param name: the reference name
+    :return: whether the name is valid
+    """
+    return name != "@" and ".." not in name and "@{" not in name and not name.endswith(".") \
+        and not any(character in _INVALID_REFERENCE_CHARACTERS for character in name) \
+        and not any(component == "" or component.startswith(".") or component.endswith(".lock")
+                    for component in name.split("/"))
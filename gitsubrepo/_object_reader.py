@@ -0,0 +1,145 @@
+import os
+import subprocess
+import tempfile
+import time
+from threading import Lock
+from typing import Optional, BinaryIO
+
+from gitsubrepo._common import _terminate
+from gitsubrepo._git import GIT_COMMAND, NOT_A_GIT_REPOSITORY_ERROR_PATTERN, get_git_root_directory, requires_git
+from gitsubrepo._instrumentation import Operation, get_current_operation, record_process
+from gitsubrepo.exceptions import NotAGitRepositoryException, RunException
+
+_GIT_CAT_FILE_BATCH_ARGUMENTS = [GIT_COMMAND, "cat-file", "--batch"]
+_MISSING_SUFFIXES = (b" missing", b" ambiguous")
+_DATA_ENCODING = "utf-8"
+_EXIT_TIMEOUT = 5.0
+
+
+class ObjectReader:
+    """
+    Reads objects (e.g. `HEAD:path/.gitrepo`) from a git repository through a single `git cat-file --batch` process,
+    which is started when first needed and reused until the reader is closed. Use as a context manager to close it.
+
+    Safe to share between threads (reads are made one at a time).
+    """
+    @requires_git
+    def __init__(self, directory: str):
+        """
+        Constructor.
+        :param directory: a directory within the git repository
+        :exception NotAGitRepositoryException: raised if the directory is not within a git repository
+        """
+        self.git_root = get_git_root_directory(directory)
+        self._process: Optional[subprocess.Popen] = None
+        # Not a pipe, which could fill (and block the process) with warnings if not read
+        self._stderr: Optional[BinaryIO] = None
+        # For the record of the process (see `gitsubrepo._instrumentation`), made when it exits
+        self._started = 0.0
+        self._operation: Optional[Operation] = None
+        self._stdout_size = 0
+        self._lock = Lock()
+
+    def __enter__(self) -> "ObjectReader":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read(self, name: str) -> Optional[bytes]:
+        """
+        Reads the contents of the object with the given name.
+        :param name: the name of the object, in any form understood by `git rev-parse` (e.g. `<revision>:<path>`)
+        :return: the contents of the object or `None` if there is no such object
+        :exception RunException: raised if `git cat-file` exits unexpectedly
+        """
+        if "\n" in name:
+            raise ValueError(f"Object name cannot contain a new line: {name!r}")
+        with self._lock:
+            process = self._get_process()
+            try:
+                process.stdin.write(f"{name}\n".encode(_DATA_ENCODING))
+                process.stdin.flush()
+                header = process.stdout.readline()
+            except BrokenPipeError:
+                header = b""
+            self._stdout_size += len(header)
+            if not header.endswith(b"\n"):
+                self._raise_exited()
+            header = header.rstrip(b"\n")
+            if header.endswith(_MISSING_SUFFIXES):
+                return None
+            size = int(header.rsplit(b" ", 1)[1])
+            contents = process.stdout.read(size + 1)
+            self._stdout_size += len(contents)
+            if len(contents) != size + 1:
+                self._raise_exited()
+            return contents[:-1]
+
+    def close(self):
+        """
+        Stops the `git cat-file` process, if it is running.
+        """
+        with self._lock:
+            if self._process is None:
+                return
+            process, self._process = self._process, None
+            _close_stdin(process)
+            try:
+                process.wait(_EXIT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                _terminate(process, process_group=False)
+            self._exited(process)
+
+    def _get_process(self) -> subprocess.Popen:
+        """
+        Gets the `git cat-file` process, starting it if it is not running (must hold the lock).
+        :return: the running process
+        """
+        if self._process is None:
+            self._started = time.monotonic()
+            self._operation = get_current_operation()
+            self._stdout_size = 0
+            self._stderr = tempfile.TemporaryFile()
+            self._process = subprocess.Popen(
+                _GIT_CAT_FILE_BATCH_ARGUMENTS, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._stderr,
+                cwd=self.git_root)
+        return self._process
+
+    def _raise_exited(self):
+        """
+        Raises the error for the `git cat-file` process having exited (must hold the lock).
+        :exception NotAGitRepositoryException: raised if the process exited because it was not in a git repository
+        :exception RunException: raised otherwise
+        """
+        process, self._process = self._process, None
+        _close_stdin(process)
+        process.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode(_DATA_ENCODING, errors="replace").rstrip()
+        self._exited(process)
+        if NOT_A_GIT_REPOSITORY_ERROR_PATTERN.search(stderr):
+            raise NotAGitRepositoryException(self.git_root)
+        raise RunException("", stderr, _GIT_CAT_FILE_BATCH_ARGUMENTS, self.git_root)
+
+    def _exited(self, process: subprocess.Popen):
+        """
+        Releases what was used by the `git cat-file` process, which has exited, and records it (must hold the lock).
+        :param process: the process
+        """
+        process.stdout.close()
+        stderr_size = self._stderr.seek(0, os.SEEK_END)
+        self._stderr.close()
+        record_process(_GIT_CAT_FILE_BATCH_ARGUMENTS, self.git_root, self._started, process.returncode,
+                       self._stdout_size, stderr_size, self._operation)
+
+
+def _close_stdin(process: subprocess.Popen):
+    """
+    Closes the stdin of the given process, which is how `git cat-file --batch` is told to exit.
+    :param process: the process
+    """
+    try:
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
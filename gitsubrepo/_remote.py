@@ -0,0 +1,83 @@
+import os
+import time
+from threading import Lock
+from typing import Dict, Tuple
+
+from gitsubrepo._cache import get_cache_location
+from gitsubrepo._common import Command, Steps, run_steps
+from gitsubrepo._git import GIT_COMMAND
+
+# Number of seconds for which the references of a remote are reused
+DEFAULT_REMOTE_REFERENCES_MAX_AGE = 60.0
+
+_GIT_LS_REMOTE_COMMAND = "ls-remote"
+_PEELED_SUFFIX = "^{}"
+
+_remote_references_cache: Dict[str, Tuple[float, Dict[str, str]]] = {}
+_remote_references_cache_lock = Lock()
+
+
+def get_remote_references(location: str, execution_directory: str=None, *,
+                          max_age: float=DEFAULT_REMOTE_REFERENCES_MAX_AGE, timeout: float=None) -> Dict[str, str]:
+    """
+    Gets the references of the remote repository at the given location (see `get_remote_references_steps`).
+    :param location: the location of the remote repository
+    :param execution_directory: the directory that the location is relative to (if it is a relative local path)
+    :param max_age: the number of seconds for which previously got references are reused
+    :param timeout: the number of seconds to wait for `git ls-remote` before it is killed
+    :return: mapping between the full name of each reference and the commit it points to
+    """
+    return run_steps(get_remote_references_steps(location, execution_directory, max_age=max_age), timeout=timeout)
+
+
+def get_remote_references_steps(location: str, execution_directory: str=None, *,
+                                max_age: float=DEFAULT_REMOTE_REFERENCES_MAX_AGE) -> Steps[Dict[str, str]]:
+    """
+    Steps to get the references of the remote repository at the given location, with a single `git ls-remote` that is
+    reused (across threads) until it is older than the given age.
+
+    Annotated tags map to the commit they point to, rather than to the tag object.
+    :param location: the location of the remote repository
+    :param execution_directory: the directory that the location is relative to (if it is a relative local path)
+    :param max_age: the number of seconds for which previously got references are reused
+    :return: mapping between the full name of each reference and the commit it points to
+    """
+    key = get_cache_location(location, execution_directory if execution_directory is not None else os.getcwd())
+    with _remote_references_cache_lock:
+        cached = _remote_references_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] <= max_age:
+        return cached[1]
+
+    output = yield Command([GIT_COMMAND, _GIT_LS_REMOTE_COMMAND, location], execution_directory)
+    references = _parse_ls_remote(output)
+    with _remote_references_cache_lock:
+        _remote_references_cache[key] = (time.monotonic(), references)
+    return references
+
+
+def clear_remote_references_cache():
+    """
+    Clears the references of remote repositories that have been got, forcing them to be got again.
+    """
+    with _remote_references_cache_lock:
+        _remote_references_cache.clear()
+
+
+def _parse_ls_remote(output: str) -> Dict[str, str]:
+    """
+    Parses the output of `git ls-remote`.
+    :param output: the output
+    :return: mapping between the full name of each reference and the commit it points to
+    """
+    references: Dict[str, str] = {}
+    peeled_references: Dict[str, str] = {}
+    for line in output.splitlines():
+        if "\t" not in line:
+            continue
+        commit, name = line.split("\t", 1)
+        if name.endswith(_PEELED_SUFFIX):
+            peeled_references[name[:-len(_PEELED_SUFFIX)]] = commit
+        else:
+            references[name] = commit
+    references.update(peeled_references)
+    return references
@@ -0,0 +1,201 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, FrozenSet, Iterator, List, Optional
+
+from gitsubrepo._common import Steps, run_steps
+from gitsubrepo._git import get_git_directory, get_git_root_directory
+from gitsubrepo._instrumentation import record_lock_wait
+from gitsubrepo._lock import FileLock, LOCKING_SUPPORTED, poll_steps
+from gitsubrepo.exceptions import RepositoryLockTimeoutException
+
+REPOSITORY_LOCK_DIRECTORY_NAME = os.path.join("gitsubrepo", "locks")
+
+_QUEUE_LOCK_NAME = "queue.lock"
+_TICKET_PREFIX = "ticket-"
+_TICKET_NUMBER_LENGTH = 20
+
+_repository_lock_timeout: Optional[float] = None
+# Roots of the repositories whose locks are held in the current context (which can be locked again within it)
+_held_repository_locks: ContextVar[FrozenSet[str]] = ContextVar("gitsubrepo_repository_locks", default=frozenset())
+
+
+def set_repository_lock_timeout(timeout: Optional[float]):
+    """
+    Sets how long to wait for the lock on a repository (see `lock_repository`) before giving up, when not told.
+    :param timeout: the timeout in seconds (`None` to wait indefinitely)
+    """
+    global _repository_lock_timeout
+    _repository_lock_timeout = timeout
+
+
+def get_repository_lock_timeout() -> Optional[float]:
+    """
+    Gets how long to wait for the lock on a repository before giving up, when not told.
+    :return: the timeout in seconds or `None` if waiting indefinitely
+    """
+    return _repository_lock_timeout
+
+
+@contextmanager
+def lock_repository(directory: str, *, timeout: float=None) -> Iterator[None]:
+    """
+    Holds the advisory lock on the repository containing the given directory, which `clone` and `pull` hold whilst
+    they change the repository (so that callers in other threads and processes that hold it do not conflict with them).
+
+    The lock is granted in the order it was asked for. It can be taken again within the context it is held in, without
+    waiting (e.g. by calling `pull` whilst holding it).
+    :param directory: a directory within the repository
+    :param timeout: the number of seconds to wait for the lock (uses the timeout set with `set_repository_lock_timeout`
+    if not set)
+    :exception RepositoryLockTimeoutException: raised if the lock was not acquired within the timeout
+    """
+    release = run_steps(acquire_repository_lock_steps(directory, timeout=timeout))
+    try:
+        yield
+    finally:
+        release()
+
+
+def acquire_repository_lock_steps(directory: str, *, timeout: float=None) -> Steps[Callable[[], None]]:
+    """
+    Steps to acquire the advisory lock on the repository containing the given directory (see `lock_repository`),
+    polling for it whilst it is held elsewhere rather than blocking.
+    :param directory: a directory within the repository
+    :param timeout: the number of seconds to wait for the lock (uses the timeout set with `set_repository_lock_timeout`
+    if not set)
+    :return: function to call (in the same context) to release the lock
+    :exception RepositoryLockTimeoutException: raised if the lock was not acquired within the timeout
+    """
+    git_root = get_git_root_directory(directory)
+    held_repository_locks = _held_repository_locks.get()
+    if git_root in held_repository_locks:
+        return lambda: None
+
+    repository_lock = RepositoryLock(git_root)
+    yield from repository_lock.acquire_steps(timeout=timeout if timeout is not None else get_repository_lock_timeout())
+    token = _held_repository_locks.set(held_repository_locks | {git_root})
+
+    def release():
+        _held_repository_locks.reset(token)
+        repository_lock.release()
+
+    return release
+
+
+class RepositoryLock:
+    """
+    Exclusive advisory lock on a repository, shared between processes (and threads), that is granted in the order it
+    was asked for (a no-op on platforms without `fcntl`).
+
+    Each caller takes a numbered ticket file in the repository's git directory, which it locks for as long as it waits
+    for, and then holds, the lock. The lock is held by the caller with the lowest numbered ticket. Tickets left by
+    processes that have died are no longer locked, so are skipped (and removed).
+    """
+    def __init__(self, git_root: str):
+        """
+        Constructor.
+        :param git_root: the root of the repository
+        """
+        self.git_root = git_root
+        self.directory = os.path.join(get_git_directory(git_root), REPOSITORY_LOCK_DIRECTORY_NAME)
+        self._queue_lock = FileLock(os.path.join(self.directory, _QUEUE_LOCK_NAME))
+        self._ticket: Optional[FileLock] = None
+        self._locked = False
+
+    @property
+    def locked(self) -> bool:
+        """
+        Whether the lock is held.
+        """
+        return self._locked
+
+    def acquire(self, *, timeout: float=None):
+        """
+        Acquires the lock, waiting behind those that asked for it first.
+        :param timeout: the number of seconds to wait for the lock (waits indefinitely if not set)
+        :exception RepositoryLockTimeoutException: raised if the lock was not acquired within the timeout
+        """
+        run_steps(self.acquire_steps(timeout=timeout))
+
+    def acquire_steps(self, *, timeout: float=None) -> Steps[None]:
+        """
+        Steps to acquire the lock (see `acquire`), polling for it whilst it is held elsewhere rather than blocking.
+        """
+        if self._locked:
+            raise RuntimeError(f"Lock on {self.git_root} is already held")
+        if not LOCKING_SUPPORTED:
+            self._locked = True
+            return
+
+        started = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._queue_lock:
+            tickets = self._get_tickets()
+            number = int(tickets[-1][len(_TICKET_PREFIX):]) + 1 if len(tickets) > 0 else 0
+            ticket = FileLock(os.path.join(self.directory, f"{_TICKET_PREFIX}{number:0{_TICKET_NUMBER_LENGTH}d}"))
+            ticket.acquire(blocking=False)
+
+        acquired = False
+        try:
+            acquired = yield from poll_steps(lambda: self._is_first(ticket), timeout=timeout)
+            if not acquired:
+                raise RepositoryLockTimeoutException(self.git_root, timeout)
+        finally:
+            record_lock_wait(self.git_root, started, acquired)
+            if not acquired:
+                self._remove_ticket(ticket)
+        self._ticket = ticket
+        self._locked = True
+
+    def release(self):
+        """
+        Releases the lock, if held.
+        """
+        if self._ticket is not None:
+            self._remove_ticket(self._ticket)
+            self._ticket = None
+        self._locked = False
+
+    def __enter__(self) -> "RepositoryLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def _is_first(self, ticket: FileLock) -> bool:
+        """
+        Gets whether the given ticket is the first of those waiting for (or holding) the lock, removing the tickets of
+        processes that have died.
+        :param ticket: the ticket
+        :return: whether the ticket is first
+        """
+        name = os.path.basename(ticket.path)
+        with self._queue_lock:
+            for earlier_name in self._get_tickets():
+                if earlier_name >= name:
+                    return True
+                earlier_ticket = FileLock(os.path.join(self.directory, earlier_name))
+                if not earlier_ticket.acquire(blocking=False):
+                    return False
+                os.remove(earlier_ticket.path)
+                earlier_ticket.release()
+        return True
+
+    def _remove_ticket(self, ticket: FileLock):
+        """
+        Removes the given ticket (held by this lock), leaving the queue.
+        :param ticket: the ticket
+        """
+        with self._queue_lock:
+            os.remove(ticket.path)
+            ticket.release()
+
+    def _get_tickets(self) -> List[str]:
+        """
+        Gets the names of the tickets in the queue, in the order they were taken (the queue lock must be held).
+        :return: the names of the tickets
+        """
+        return sorted(name for name in os.listdir(self.directory) if name.startswith(_TICKET_PREFIX))
@@ -0,0 +1,242 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from gitsubrepo._git import get_git_directory
+from gitsubrepo._gitrepo import GitRepoFile, read_gitrepo, get_gitrepo_path
+
+STATUS_INDEX_DIRECTORY_NAME = "gitsubrepo"
+STATUS_INDEX_FILE_NAME = "status-index.json"
+
+_STATUS_INDEX_VERSION = 1
+_GIT_INDEX_FILE_NAME = "index"
+_GIT_INDEX_FILE_ENVIRONMENT_VARIABLE = "GIT_INDEX_FILE"
+_TEMPORARY_SUFFIX = ".tmp"
+# Files modified this recently are not indexed, as a further change within the same tick of the file system's (possibly
+# coarse, e.g. 2 seconds on FAT) timestamps may leave their signature unchanged (as `git` does for "racily clean" files)
+_RACY_INTERVAL_NS = 2 * 10 ** 9
+
+# Modification time, change time, size and inode of a file
+FileSignature = Tuple[int, int, int, int]
+
+_status_index_enabled = False
+_status_indexes: Dict[str, "StatusIndex"] = {}
+_status_indexes_lock = Lock()
+
+
+def set_status_index_enabled(enabled: bool):
+    """
+    Sets whether the contents of `.gitrepo` files, and which `.gitrepo` files are tracked, are persisted in an index
+    within each parent repository's git directory, so that getting the status of subrepos does not have to read them.
+    :param enabled: whether the status index is used
+    """
+    global _status_index_enabled
+    _status_index_enabled = enabled
+
+
+def is_status_index_enabled() -> bool:
+    """
+    Gets whether the status index is used (see `set_status_index_enabled`).
+    :return: whether the status index is used
+    """
+    return _status_index_enabled
+
+
+def get_status_index(git_root: str) -> "StatusIndex":
+    """
+    Gets the status index of the repository with the given root.
+    :param git_root: the root of the git repository
+    :return: the status index
+    """
+    git_directory = get_git_directory(git_root)
+    with _status_indexes_lock:
+        status_index = _status_indexes.get(git_directory)
+        if status_index is None:
+            status_index = StatusIndex(git_directory)
+            _status_indexes[git_directory] = status_index
+    return status_index
+
+
+class StatusIndex:
+    """
+    Index, persisted in a git directory, of the parsed `.gitrepo` files in the repository and of the paths of the
+    `.gitrepo` files that are tracked.
+
+    Each entry is only used whilst the file it was made from is unchanged, according to its modification time, change
+    time, size and inode (the same way as `git` decides whether files in its index need to be rehashed). The paths of
+    the tracked `.gitrepo` files are therefore reused until `git` next writes its index (e.g. on commit, checkout,
+    reset or pull). Files that were modified too recently for a further change to be seen are not indexed.
+
+    The index is shared between processes, with the last write winning. Updates made within `batch_updates` are written
+    once, at its end.
+    """
+    def __init__(self, git_directory: str):
+        """
+        Constructor.
+        :param git_directory: the git directory (i.e. what is usually `.git`) that the index is kept in
+        """
+        self.git_directory = git_directory
+        self.path = os.path.join(git_directory, STATUS_INDEX_DIRECTORY_NAME, STATUS_INDEX_FILE_NAME)
+        self._lock = Lock()
+        self._loaded_signature: Optional[FileSignature] = None
+        self._gitrepos: Dict[str, Tuple[FileSignature, GitRepoFile]] = {}
+        self._gitrepo_paths: Optional[Tuple[FileSignature, List[str]]] = None
+        # Whether there are updates that have not been written, and the number of `batch_updates` blocks being ran
+        self._dirty = False
+        self._batches = 0
+
+    @contextmanager
+    def batch_updates(self) -> Iterator[None]:
+        """
+        Defers writing updates to the index until the end of the block, so that the index is written at most once
+        however many entries are updated (e.g. when getting the status of every subrepo in the repository).
+        """
+        with self._lock:
+            self._batches += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batches -= 1
+                if self._batches == 0 and self._dirty:
+                    self._save()
+
+    def read_gitrepo(self, directory: str, subdir: str) -> GitRepoFile:
+        """
+        Reads the `.gitrepo` file of the subrepo in the given directory, using the index if the file is unchanged.
+        :param directory: the directory containing the subrepo
+        :param subdir: the directory containing the subrepo, relative to the root of the repository
+        :return: the parsed `.gitrepo` file
+        :exception NotAGitSubrepoException: raised if the directory does not contain a (valid) `.gitrepo` file
+        """
+        # The file is checked before it is read, so a change whilst it is being read is seen next time
+        signature = _get_signature(get_gitrepo_path(directory))
+        if signature is None:
+            return read_gitrepo(directory)
+        with self._lock:
+            self._load()
+            entry = self._gitrepos.get(subdir)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        gitrepo = read_gitrepo(directory)
+        if not _is_racy(signature):
+            with self._lock:
+                self._load()
+                self._gitrepos[subdir] = (signature, gitrepo)
+                self._update()
+        return gitrepo
+
+    def get_gitrepo_paths(self, list_gitrepo_paths: Callable[[], List[str]]) -> List[str]:
+        """
+        Gets the paths of the `.gitrepo` files that are tracked, using the index if `git`'s index is unchanged.
+        :param list_gitrepo_paths: lists the paths of the `.gitrepo` files that are tracked, relative to the root of the
+        repository
+        :return: the paths of the `.gitrepo` files that are tracked, relative to the root of the repository
+        """
+        if os.environ.get(_GIT_INDEX_FILE_ENVIRONMENT_VARIABLE):
+            return list_gitrepo_paths()
+        signature = _get_signature(os.path.join(self.git_directory, _GIT_INDEX_FILE_NAME))
+        if signature is not None:
+            with self._lock:
+                self._load()
+                gitrepo_paths = self._gitrepo_paths
+            if gitrepo_paths is not None and gitrepo_paths[0] == signature:
+                return list(gitrepo_paths[1])
+
+        paths = list_gitrepo_paths()
+        if signature is not None and not _is_racy(signature):
+            subdirs = {os.path.dirname(path) or os.curdir for path in paths}
+            with self._lock:
+                self._load()
+                self._gitrepo_paths = (signature, list(paths))
+                # Forget subrepos that are no longer tracked
+                self._gitrepos = {subdir: entry for subdir, entry in self._gitrepos.items() if subdir in subdirs}
+                self._update()
+        return paths
+
+    def _update(self):
+        """
+        Writes the index, now that it has been updated, unless within `batch_updates` (must hold the lock).
+        """
+        self._dirty = True
+        if self._batches == 0:
+            self._save()
+
+    def _load(self):
+        """
+        Loads the index from disk, if it has been written since it was last loaded and has no updates that are yet to be
+        written (which then replace what has been written elsewhere) (must hold the lock).
+        """
+        if self._dirty:
+            return
+        signature = _get_signature(self.path)
+        if signature == self._loaded_signature:
+            return
+        self._loaded_signature = signature
+        self._gitrepos = {}
+        self._gitrepo_paths = None
+        if signature is None:
+            return
+        try:
+            with open(self.path, "r") as file:
+                contents = json.load(file)
+            if contents.get("version") != _STATUS_INDEX_VERSION:
+                return
+            self._gitrepos = {subdir: (tuple(entry["signature"]), GitRepoFile(*entry["gitrepo"]))
+                              for subdir, entry in contents["gitrepos"].items()}
+            if contents.get("gitrepo_paths") is not None:
+                self._gitrepo_paths = (tuple(contents["gitrepo_paths"]["signature"]),
+                                       contents["gitrepo_paths"]["paths"])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Treated as empty, to be replaced on the next save
+            self._gitrepos = {}
+            self._gitrepo_paths = None
+
+    def _save(self):
+        """
+        Atomically writes the index to disk (must hold the lock). Failures are ignored, as the index is only a cache.
+        """
+        contents = {
+            "version": _STATUS_INDEX_VERSION,
+            "gitrepos": {subdir: {"signature": signature, "gitrepo": gitrepo}
+                         for subdir, (signature, gitrepo) in self._gitrepos.items()},
+            "gitrepo_paths": {"signature": self._gitrepo_paths[0], "paths": self._gitrepo_paths[1]}
+            if self._gitrepo_paths is not None else None
+        }
+        self._dirty = False
+        temporary_path = f"{self.path}.{os.getpid()}{_TEMPORARY_SUFFIX}"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temporary_path, "w") as file:
+                json.dump(contents, file, separators=(",", ":"))
+            os.replace(temporary_path, self.path)
+        except OSError:
+            return
+        self._loaded_signature = _get_signature(self.path)
+
+
+def _get_signature(path: str) -> Optional[FileSignature]:
+    """
+    Gets the signature of the file at the given path, which changes when the file is changed.
+    :param path: the path of the file
+    :return: the signature or `None` if the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size, stat.st_ino
+
+
+def _is_racy(signature: FileSignature) -> bool:
+    """
+    Gets whether the file with the given signature was modified so recently that it could change again without its
+    signature changing.
+    :param signature: the signature of the file
+    :return: whether the file was modified too recently to be indexed
+    """
+    return time.time_ns() - signature[0] < _RACY_INTERVAL_NS
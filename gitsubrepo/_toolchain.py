@@ -0,0 +1,183 @@
+import os
+import re
+import shutil
+from threading import Lock
+from typing import Tuple, Optional, NamedTuple, Callable, Hashable, List
+
+from gitsubrepo._common import run
+from gitsubrepo.exceptions import RunException
+
+Version = Tuple[int, ...]
+
+MINIMUM_GIT_VERSION: Version = (2, 10, 0)
+MINIMUM_GIT_SUBREPO_VERSION: Version = (0, 3, 1)
+
+_GIT_EXECUTABLE = "git"
+_GIT_SUBREPO_EXECUTABLE = "git-subrepo"
+_PATH_ENVIRONMENT_VARIABLE = "PATH"
+_GIT_EXEC_PATH_ENVIRONMENT_VARIABLE = "GIT_EXEC_PATH"
+_VERSION_PATTERN = re.compile(r"(\d+(?:\.\d+)+)")
+
+
+class _Probe(NamedTuple):
+    """
+    Result of probing a tool, valid for as long as the key it was made with remains the same.
+    """
+    key: Hashable
+    version: Optional[Version]
+    error: Optional[str]
+    cause: Optional[Exception]
+
+
+_probe_lock = Lock()
+_git_probe: Optional[_Probe] = None
+_git_subrepo_probe: Optional[_Probe] = None
+_git_exec_path: Optional[Tuple[Hashable, Optional[str]]] = None
+
+
+def parse_version(text: str) -> Version:
+    """
+    Parses the first version number (e.g. "2.10.1") in the given text.
+    :param text: text containing a version number (e.g. the output of `git --version`)
+    :return: the version, as a tuple of integers
+    :exception ValueError: raised if the text does not contain a version number
+    """
+    match = _VERSION_PATTERN.search(text)
+    if match is None:
+        raise ValueError(f"No version number in \"{text}\"")
+    return tuple(int(part) for part in match.group(1).split("."))
+
+
+def get_git_version() -> Version:
+    """
+    Gets the version of `git` in use (probed once, then cached until the `git` binary or `PATH` changes).
+    :return: the `git` version
+    :exception RuntimeError: raised if `git` is not working or is older than `MINIMUM_GIT_VERSION`
+    """
+    return _get_version(_get_git_probe)
+
+
+def get_git_subrepo_version() -> Version:
+    """
+    Gets the version of `git subrepo` in use (probed once, then cached until the `git subrepo` or `git` binaries, or
+    `PATH`, change).
+    :return: the `git subrepo` version
+    :exception RuntimeError: raised if `git subrepo` is not working or is older than `MINIMUM_GIT_SUBREPO_VERSION`
+    """
+    get_git_version()
+    return _get_version(_get_git_subrepo_probe)
+
+
+def clear_toolchain_cache():
+    """
+    Forgets the results of probing the toolchain, forcing the tools to be probed again when next required.
+    """
+    global _git_probe, _git_subrepo_probe, _git_exec_path
+    with _probe_lock:
+        _git_probe, _git_subrepo_probe, _git_exec_path = None, None, None
+
+
+def _get_version(get_probe: Callable[[], _Probe]) -> Version:
+    """
+    Gets the version from the probe given by the given getter, raising the error of the probe if it failed.
+    :param get_probe: gets the (cached) probe
+    :return: the version of the probed tool
+    :exception RuntimeError: raised if the probe failed
+    """
+    with _probe_lock:
+        probe = get_probe()
+    if probe.error is not None:
+        raise RuntimeError(probe.error) from probe.cause
+    return probe.version
+
+
+def _get_git_probe() -> _Probe:
+    """
+    Gets the probe of `git`, probing again if the cached probe is no longer valid (caller must hold `_probe_lock`).
+    :return: the probe
+    """
+    global _git_probe
+    git_path = shutil.which(_GIT_EXECUTABLE)
+    key = (os.environ.get(_PATH_ENVIRONMENT_VARIABLE), os.environ.get(_GIT_EXEC_PATH_ENVIRONMENT_VARIABLE), git_path,
+           _get_modification_time(git_path))
+    if _git_probe is None or _git_probe.key != key:
+        _git_probe = _probe(key, [_GIT_EXECUTABLE, "--version"], "git", MINIMUM_GIT_VERSION)
+    return _git_probe
+
+
+def _get_git_subrepo_probe() -> _Probe:
+    """
+    Gets the probe of `git subrepo`, probing again if the cached probe is no longer valid (caller must hold
+    `_probe_lock`).
+    :return: the probe
+    """
+    global _git_subrepo_probe
+    git_key = _get_git_probe().key
+    git_subrepo_path = shutil.which(_GIT_SUBREPO_EXECUTABLE) or _get_git_subrepo_path_in_exec_path(git_key)
+    key = (git_key, git_subrepo_path, _get_modification_time(git_subrepo_path))
+    if _git_subrepo_probe is None or _git_subrepo_probe.key != key:
+        _git_subrepo_probe = _probe(
+            key, [_GIT_EXECUTABLE, "subrepo", "--version"], "git subrepo", MINIMUM_GIT_SUBREPO_VERSION)
+    return _git_subrepo_probe
+
+
+def _get_git_subrepo_path_in_exec_path(git_key: Hashable) -> Optional[str]:
+    """
+    Gets the path of `git subrepo` if it is installed in git's exec path (caller must hold `_probe_lock`).
+    :param git_key: the key of the current `git` probe, which the exec path is cached against
+    :return: the path of `git subrepo` or `None` if it is not in the exec path
+    """
+    global _git_exec_path
+    if _git_exec_path is None or _git_exec_path[0] != git_key:
+        try:
+            exec_path = run([_GIT_EXECUTABLE, "--exec-path"])
+        except (RunException, OSError):
+            exec_path = None
+        _git_exec_path = (git_key, exec_path)
+    exec_path = _git_exec_path[1]
+    if exec_path is None:
+        return None
+    git_subrepo_path = os.path.join(exec_path, _GIT_SUBREPO_EXECUTABLE)
+    return git_subrepo_path if os.path.exists(git_subrepo_path) else None
+
+
+def _probe(key: Hashable, arguments: List[str], name: str, minimum_version: Version) -> _Probe:
+    """
+    Probes a tool by running it to get its version.
+    :param key: the key that the probe is valid for
+    :param arguments: the CLI arguments that print the tool's version
+    :param name: the name of the tool
+    :param minimum_version: the minimum version of the tool that is supported
+    :return: the probe
+    """
+    try:
+        version = parse_version(run(arguments))
+    except (RunException, OSError, ValueError) as e:
+        return _Probe(key, None, f"`{name}` does not appear to be working", e)
+    if version < minimum_version:
+        return _Probe(key, version, f"`{name}` version {_format_version(version)} is older than the minimum supported "
+                                    f"version {_format_version(minimum_version)}", None)
+    return _Probe(key, version, None, None)
+
+
+def _get_modification_time(path: Optional[str]) -> Optional[float]:
+    """
+    Gets the modification time of the file at the given path.
+    :param path: the path of the file
+    :return: the modification time of the file or `None` if it does not exist
+    """
+    if path is None:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _format_version(version: Version) -> str:
+    """
+    Formats the given version as a string.
+    :param version: the version
+    :return: the version as a string (e.g. "2.10.0")
+    """
+    return ".".join(str(part) for part in version)
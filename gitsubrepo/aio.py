@@ -0,0 +1,245 @@
+import asyncio
+import os
+import signal
+import subprocess
+import time
+from contextvars import copy_context
+from typing import Callable, List, Dict, Optional, Tuple, TypeVar, Union
+
+from gitsubrepo._common import get_run_result, get_retry_delay, Command, Delay, Steps, OutputCallback, \
+    OutputCollector, STDOUT, STDERR
+from gitsubrepo._fetch import get_fetch_options
+from gitsubrepo._instrumentation import operation, record_process, in_current_context
+from gitsubrepo._native import get_default_native
+from gitsubrepo._toolchain import get_git_subrepo_version, get_git_version
+from gitsubrepo.exceptions import RunException
+from gitsubrepo.subrepo import Commit, SubrepoStatus, _clone_steps, _pull_steps, _status_from_subrepo_command_steps, \
+    _read_status
+
+_T = TypeVar("_T")
+
+_READ_SIZE = 64 * 1024
+
+
+@operation
+async def clone(location: str, directory: str, *, branch: str=None, tag: str=None, commit: str=None,
+                author_name: str=None, author_email: str=None, cache_directory: str=None, native: bool=None,
+                depth: int=None, filter: str=None, timeout: float=None, output_callback: OutputCallback=None) -> Commit:
+    """
+    Clones the repository at the given location as a subrepo in the given directory (see `gitsubrepo.clone`).
+    :param location: the location of the repository to clone
+    :param directory: the directory that the subrepo will occupy (i.e. not the git repository root)
+    :param branch: the specific branch to clone
+    :param tag: the specific tag to clone
+    :param commit: the specific commit to clone (may also require tag/branch to be specified if not fetched)
+    :param author_name: the name of the author to assign to the clone commit (uses system specified if not set)
+    :param author_email: the email of the author to assign to the clone commit (uses system specified if not set)
+    :param cache_directory: directory in which to keep a mirror of the repository, which is updated and then cloned from
+    :param native: whether to make the clone directly from git plumbing rather than calling `git subrepo`
+    :param depth: the number of commits of the upstream's history to fetch (makes the parent repository shallow)
+    :param filter: partial clone filter to fetch the upstream with (e.g. `"blob:none"`)
+    :param timeout: the number of seconds to wait for the clone before killing it (waits indefinitely if not set)
+    :param output_callback: called with the name of the stream (`"stdout"` or `"stderr"`) and each line written to it
+    by the commands ran
+    :return: the commit reference of the checkout
+    :exception asyncio.TimeoutError: raised if the clone took longer than the timeout
+    """
+    native = await _is_native(native)
+    return await _run_steps(_clone_steps(location, directory, branch=branch, tag=tag, commit=commit,
+                                         author_name=author_name, author_email=author_email,
+                                         cache_directory=cache_directory, native=native,
+                                         fetch_options=get_fetch_options(depth, filter)),
+                            timeout, output_callback)
+
+
+@operation
+async def status(directory: str, *, native: bool=True, timeout: float=None,
+                 output_callback: OutputCallback=None) -> SubrepoStatus:
+    """
+    Gets the status of the subrepo that has been cloned into the given directory (see `gitsubrepo.status`).
+    :param directory: the directory containing the subrepo
+    :param native: whether to read the subrepo's `.gitrepo` file directly rather than calling `git subrepo status`
+    (falls back to `git subrepo status` if the file cannot be understood)
+    :param timeout: the number of seconds to wait for `git subrepo status` before killing it (waits indefinitely if not
+    set)
+    :param output_callback: called with the name of the stream (`"stdout"` or `"stderr"`) and each line written to it
+    by `git subrepo status`
+    :return: the status of the subrepo
+    :exception asyncio.TimeoutError: raised if getting the status took longer than the timeout
+    """
+    if not os.path.exists(directory):
+        raise ValueError(f"No subrepo found in \"{directory}\"")
+    if native:
+        # Reading the `.gitrepo` file may block (e.g. running `git rev-parse` to check it is in a repository)
+        subrepo_status = await asyncio.get_event_loop().run_in_executor(
+            None, in_current_context(_read_status), directory)
+        if subrepo_status is not None:
+            return subrepo_status
+    await _require_subrepo()
+    return await _run_steps(_status_from_subrepo_command_steps(directory), timeout, output_callback)
+
+
+@operation
+async def pull(directory: str, *, native: bool=None, depth: int=None, filter: str=None, timeout: float=None,
+               output_callback: OutputCallback=None) -> Commit:
+    """
+    Pulls the subrepo that has been cloned into the given directory (see `gitsubrepo.pull`).
+    :param directory: the directory containing the subrepo
+    :param native: whether to make the pull directly from git plumbing rather than calling `git subrepo`
+    :param depth: the number of commits of the upstream's history to fetch
+    :param filter: partial clone filter to fetch the upstream with
+    :param timeout: the number of seconds to wait for the pull before killing it (waits indefinitely if not set)
+    :param output_callback: called with the name of the stream (`"stdout"` or `"stderr"`) and each line written to it
+    by the commands ran
+    :return: the commit the subrepo is on
+    :exception asyncio.TimeoutError: raised if the pull took longer than the timeout
+    """
+    native = await _is_native(native)
+    return await _run_steps(_pull_steps(directory, native=native, fetch_options=get_fetch_options(depth, filter)),
+                            timeout, output_callback)
+
+
+async def _is_native(native: Optional[bool]) -> bool:
+    """
+    Decides whether to use git plumbing rather than `git subrepo`, requiring the commands used to be accessible (without
+    blocking the event loop if they have to be probed).
+    :param native: whether git plumbing was asked for (`None` to use the default set with `set_default_native`)
+    :return: whether to use git plumbing
+    :exception RuntimeError: raised if the commands are not accessible
+    """
+    native = get_default_native() if native is None else native
+    await asyncio.get_event_loop().run_in_executor(
+        None, in_current_context(get_git_version if native else get_git_subrepo_version))
+    return native
+
+
+async def _require_subrepo():
+    """
+    Requires the `git subrepo` command (and `git`) to be accessible, without blocking the event loop if they have to be
+    probed.
+    :exception RuntimeError: raised if the commands are not accessible
+    """
+    await asyncio.get_event_loop().run_in_executor(None, in_current_context(get_git_subrepo_version))
+
+
+async def _run_steps(steps: Steps[_T], timeout: Optional[float], output_callback: OutputCallback=None) -> _T:
+    """
+    Runs the commands yielded by the given steps, one at a time (see `gitsubrepo._common.run_steps`).
+
+    The steps are advanced off the event loop, as they may block between commands (e.g. reading files or releasing
+    locks), whilst the commands are ran, and the delays waited for, on it.
+    :param steps: the steps to run
+    :param timeout: the number of seconds to wait for all the steps before killing the running command
+    :param output_callback: called with each line written by the commands
+    :return: the value returned by the steps
+    :exception RunException: raised if a command fails and the steps do not handle the failure
+    :exception asyncio.TimeoutError: raised if the steps took longer than the timeout
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    loop = asyncio.get_event_loop()
+    # The steps are always advanced in the same context, as they may set context variables (e.g. the locks held)
+    context = copy_context()
+    advancing: Optional[asyncio.Future] = None
+
+    def advance_steps(method: Callable, *args) -> Tuple[Optional[Union[Command, Delay]], Optional[_T]]:
+        try:
+            return context.run(method, *args), None
+        except StopIteration as e:
+            return None, e.value
+
+    async def advance(method: Callable, *args) -> Tuple[Optional[Union[Command, Delay]], Optional[_T]]:
+        nonlocal advancing
+        advancing = loop.run_in_executor(None, advance_steps, method, *args)
+        # If cancelled, the steps are left to finish advancing before they are closed
+        return await asyncio.shield(advancing)
+
+    async def run_steps() -> _T:
+        try:
+            step, value = await advance(next, steps)
+            retries = 0
+            while step is not None:
+                if isinstance(step, Delay):
+                    await asyncio.sleep(step.seconds)
+                    step, value = await advance(steps.send, None)
+                    continue
+                try:
+                    stdout = await _run(step.arguments, step.execution_directory, step.execution_environment,
+                                        capture_stdout=step.capture_stdout, output_callback=output_callback)
+                except RunException as e:
+                    delay = get_retry_delay(step, e, retries, deadline)
+                    if delay is not None:
+                        await asyncio.sleep(delay)
+                        retries += 1
+                        continue
+                    step, value = await advance(steps.throw, e)
+                else:
+                    step, value = await advance(steps.send, stdout)
+                retries = 0
+            return value
+        finally:
+            if advancing is not None and not advancing.done():
+                await asyncio.wait([advancing])
+            await loop.run_in_executor(None, context.run, steps.close)
+
+    return await asyncio.wait_for(run_steps(), timeout)
+
+
+async def _run(arguments: List[str], execution_directory: str=None, execution_environment: Dict=None, *,
+               capture_stdout: bool=True, output_callback: OutputCallback=None) -> str:
+    """
+    Runs the given arguments from the given directory (see `gitsubrepo._common.run`), killing the process (and any
+    processes it started) if cancelled.
+    :param arguments: the CLI arguments to run
+    :param execution_directory: the directory to execute the arguments in
+    :param execution_environment: the environment to execute in
+    :param capture_stdout: whether all of stdout is required (else only the last lines are kept, for error reporting)
+    :param output_callback: called with each line written to stdout or stderr
+    :return: what is written to stdout following execution
+    :exception RunException: called if the execution has a non-zero return code
+    """
+    collector = OutputCollector(output_callback, capture_stdout)
+    started = time.monotonic()
+    process = await asyncio.create_subprocess_exec(
+        *arguments, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=execution_directory,
+        env=execution_environment, start_new_session=True)
+    try:
+        await asyncio.gather(_read_stream(process.stdout, STDOUT, collector),
+                             _read_stream(process.stderr, STDERR, collector))
+        await process.wait()
+    except asyncio.CancelledError:
+        _kill(process)
+        await asyncio.shield(process.wait())
+        raise
+    finally:
+        record_process(arguments, execution_directory, started, process.returncode, collector.sizes[STDOUT],
+                       collector.sizes[STDERR])
+    return get_run_result(arguments, execution_directory, process.returncode, collector)
+
+
+async def _read_stream(stream: asyncio.StreamReader, name: str, collector: OutputCollector):
+    """
+    Reads the given stream until it is closed, feeding what is read to the given collector.
+    :param stream: the stream to read from
+    :param name: the name of the stream
+    :param collector: the collector to feed
+    """
+    while True:
+        data = await stream.read(_READ_SIZE)
+        if not data:
+            break
+        collector.feed(name, data)
+    collector.close(name)
+
+
+def _kill(process: asyncio.subprocess.Process):
+    """
+    Kills the given process and the processes in its process group (e.g. the `git` commands started by `git subrepo`).
+    :param process: the process to kill
+    """
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
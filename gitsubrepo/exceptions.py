@@ -49,4 +49,61 @@ class RunException(GitsubrepoException):
         self.execution_directory = execution_directory
 
     def __str__(self):
-        return f"Command:\n{self.command} ({self.execution_directory})\nstdout:\n{self.stdout}\nstderr:\n{self.stderr}"
\ No newline at end of file
+        return f"Command:\n{self.command} ({self.execution_directory})\nstdout:\n{self.stdout}\nstderr:\n{self.stderr}"
+
+
+class RunTimeoutException(RunException):
+    """
+    Raised when a run did not complete within its timeout (and was killed).
+    """
+    def __init__(self, stdout: str, stderr: str, command: List[str], execution_directory: Optional[str],
+                 timeout: float):
+        """
+        Constructor.
+        :param stdout: what the executable wrote to stdout before it was killed
+        :param stderr: what the executable wrote to stderr before it was killed
+        :param command: the command that was ran
+        :param execution_directory: the directory where the command was ran (`None` indicates the current directory)
+        :param timeout: the timeout (in seconds) that was exceeded
+        """
+        super().__init__(stdout, stderr, command, execution_directory)
+        self.timeout = timeout
+
+    def __str__(self):
+        return f"Timed out after {self.timeout}s\n{super().__str__()}"
+
+
+class GitLockException(RunException):
+    """
+    Raised when a run failed because one of git's lock files (e.g. `index.lock`) already existed, which happens whilst
+    another process is changing the repository (or if such a process crashed).
+    """
+    def __init__(self, stdout: str, stderr: str, command: List[str], execution_directory: Optional[str],
+                 lock_path: Optional[str]):
+        """
+        Constructor.
+        :param stdout: what the executable wrote to stdout
+        :param stderr: what the executable wrote to stderr
+        :param command: the command that was ran
+        :param execution_directory: the directory where the command was ran (`None` indicates the current directory)
+        :param lock_path: the path of the lock file that existed (`None` if it could not be determined)
+        """
+        super().__init__(stdout, stderr, command, execution_directory)
+        self.lock_path = lock_path
+
+
+class RepositoryLockTimeoutException(GitsubrepoException):
+    """
+    Raised when the lock on a repository (see `lock_repository`) was not acquired within the timeout.
+    """
+    def __init__(self, git_root: str, timeout: float):
+        """
+        Constructor.
+        :param git_root: the root of the repository that could not be locked
+        :param timeout: the timeout (in seconds) that was exceeded
+        """
+        self.git_root = git_root
+        self.timeout = timeout
+
+    def __str__(self):
+        return f"Timed out after {self.timeout}s waiting for the lock on {self.git_root}"
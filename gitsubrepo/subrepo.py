@@ -1,11 +1,25 @@
+import hashlib
 import os
 import re
-from typing import Callable, Tuple, NewType
+from functools import wraps
+from typing import Callable, NewType, Optional, Dict, Iterable, Union, List, Tuple, NamedTuple
 
-from gitsubrepo._common import run
-from gitsubrepo._git import requires_git, GIT_COMMAND, get_git_root_directory, get_directory_relative_to_git_root
+from gitsubrepo._cache import Mirror, get_default_cache_directory, get_cache_max_size, get_cache_location, evict
+from gitsubrepo._common import run, run_steps, Steps, Command, OutputCallback
+from gitsubrepo._fetch import FetchOptions, fetch_steps, deepen_steps, get_fetch_options
+from gitsubrepo._git import requires_git, GIT_COMMAND, get_git_root_directory, get_directory_relative_to_git_root, \
+    NOT_A_GIT_REPOSITORY_ERROR_PATTERN
+from gitsubrepo._gitrepo import GitRepoFile, read_gitrepo, parse_gitrepo, get_gitrepo_path, GITREPO_FILE_NAME
+from gitsubrepo._instrumentation import operation, in_current_context
+from gitsubrepo._native import get_default_native, clone_steps as native_clone_steps, \
+    pull_steps as native_pull_steps
+from gitsubrepo._object_reader import ObjectReader
+from gitsubrepo._remote import get_remote_references, get_remote_references_steps, DEFAULT_REMOTE_REFERENCES_MAX_AGE
+from gitsubrepo._repository_lock import acquire_repository_lock_steps
+from gitsubrepo._status_index import is_status_index_enabled, get_status_index
+from gitsubrepo._toolchain import get_git_subrepo_version, get_git_version
 from gitsubrepo.exceptions import UnstagedChangeException, NotAGitRepositoryException, RunException, \
-    NotAGitReferenceException, NotAGitSubrepoException
+    NotAGitReferenceException, NotAGitSubrepoException, GitsubrepoException, GitLockException
 
 _GIT_SUBREPO_COMMAND = "subrepo"
 _GIT_SUBREPO_CLONE_COMMAND = "clone"
@@ -13,9 +27,18 @@ _GIT_SUBREPO_STATUS_COMMAND = "status"
 _GIT_SUBREPO_PULL_COMMAND = "pull"
 _GIT_SUBREPO_BRANCH_FLAG = "--branch"
 _GIT_SUBREPO_VERBOSE_FLAG = "-v"
-_GIT_LS_REMOTE_COMMAND = "ls-remote"
+_GIT_LS_FILES_COMMAND = "ls-files"
+_GIT_UPDATE_REF_COMMAND = "update-ref"
+_GIT_CAT_FILE_COMMAND = "cat-file"
+_GIT_STATUS_COMMAND = "status"
+_GIT_DIFF_TREE_COMMAND = "diff-tree"
+_UNKNOWN_REVISION_ERROR_PATTERN = re.compile("unknown revision|bad object|bad revision|not a tree object")
+_GIT_NO_WRITE_FETCH_HEAD_FLAG = "--no-write-fetch-head"
+_GIT_NO_WRITE_FETCH_HEAD_MINIMUM_VERSION = (2, 29, 0)
+_PREFETCH_REFERENCE_PREFIX = "refs/gitsubrepo/prefetch/"
 
 _DEFAULT_BRANCH = "master"
+_SHORT_COMMIT_LENGTH = 7
 
 _GIT_AUTHOR_NAME_ENVIRONMENT_VARIABLE = "GIT_AUTHOR_NAME"
 _GIT_AUTHOR_EMAIL_ENVIRONMENT_VARIABLE = "GIT_AUTHOR_EMAIL"
@@ -23,28 +46,99 @@ _GIT_AUTHOR_EMAIL_ENVIRONMENT_VARIABLE = "GIT_AUTHOR_EMAIL"
 Branch = NewType("Branch", str)
 Commit = NewType("Commit", str)
 RepositoryLocation = NewType("RepositoryLocation", str)
+# Called with the directory of each subrepo and its result, as each subrepo is done with (see `pull_many`)
+ResultCallback = Callable[[str, Union[Optional[Commit], Exception]], None]
+
+
+class SubrepoStatus(tuple):
+    """
+    Status of a subrepo.
+
+    Behaves as the `(remote, branch, commit)` tuple that `status` has always returned, with the rest of the information
+    recorded in the subrepo's `.gitrepo` file available as attributes.
+    """
+    def __new__(cls, remote: RepositoryLocation, branch: Branch, commit: Commit, *, full_commit: Optional[str]=None,
+                parent: Optional[str]=None, method: Optional[str]=None, cmdver: Optional[str]=None):
+        instance = super().__new__(cls, (remote, branch, commit))
+        instance.full_commit = full_commit
+        instance.parent = parent
+        instance.method = method
+        instance.cmdver = cmdver
+        return instance
+
+    @property
+    def remote(self) -> RepositoryLocation:
+        return self[0]
+
+    @property
+    def branch(self) -> Branch:
+        return self[1]
+
+    @property
+    def commit(self) -> Commit:
+        return self[2]
+
+    def __repr__(self):
+        return f"{type(self).__name__}(remote={self.remote!r}, branch={self.branch!r}, commit={self.commit!r}, " \
+               f"full_commit={self.full_commit!r}, parent={self.parent!r}, method={self.method!r}, " \
+               f"cmdver={self.cmdver!r})"
+
+
+class SubrepoChange(NamedTuple):
+    """
+    Change to a subrepo between two revisions of its parent repository.
+    """
+    old: Optional[SubrepoStatus]
+    new: Optional[SubrepoStatus]
+
+    @property
+    def old_commit(self) -> Optional[str]:
+        """
+        The (full) commit that the subrepo was on at the first revision (`None` if it was not a subrepo).
+        """
+        return self.old.full_commit if self.old is not None else None
+
+    @property
+    def new_commit(self) -> Optional[str]:
+        """
+        The (full) commit that the subrepo is on at the second revision (`None` if it is no longer a subrepo).
+        """
+        return self.new.full_commit if self.new is not None else None
 
 
-@requires_git
 def requires_subrepo(func: Callable) -> Callable:
     """
-    Decorator that requires the `git subrepo` command to be accessible before calling the given function.
+    Decorator that requires the `git subrepo` command (and `git`) to be accessible before calling the given function.
+
+    The commands are only probed the first time they are required (and again if their binaries or `PATH` change).
     :param func: the function to wrap
     :return: the wrapped function
     """
+    @wraps(func)
     def decorated(*args, **kwargs):
-        try:
-            run([GIT_COMMAND, _GIT_SUBREPO_COMMAND, "--version"])
-        except RunException as e:
-            raise RuntimeError("`git subrepo` does not appear to be working") from e
+        get_git_subrepo_version()
         return func(*args, **kwargs)
 
     return decorated
 
 
-@requires_subrepo
+def _is_native(native: Optional[bool]) -> bool:
+    """
+    Decides whether to use git plumbing rather than `git subrepo`, requiring `git subrepo` to be accessible if not.
+    :param native: whether git plumbing was asked for (`None` to use the default set with `set_default_native`)
+    :return: whether to use git plumbing
+    """
+    native = get_default_native() if native is None else native
+    if not native:
+        get_git_subrepo_version()
+    return native
+
+
+@operation
+@requires_git
 def clone(location: str, directory: str, *, branch: str=None, tag: str=None, commit: str=None, author_name: str=None,
-          author_email: str=None) -> Commit:
+          author_email: str=None, cache_directory: str=None, native: bool=None, depth: int=None, filter: str=None,
+          timeout: float=None, output_callback: OutputCallback=None) -> Commit:
     """
     Clones the repository at the given location as a subrepo in the given directory.
     :param location: the location of the repository to clone
@@ -54,7 +148,35 @@ def clone(location: str, directory: str, *, branch: str=None, tag: str=None, com
     :param commit: the specific commit to clone (may also require tag/branch to be specified if not fetched)
     :param author_name: the name of the author to assign to the clone commit (uses system specified if not set)
     :param author_email: the email of the author to assign to the clone commit (uses system specified if not set)
+    :param cache_directory: directory in which to keep a mirror of the repository, which is updated and then cloned from
+    (uses the directory set with `set_default_cache_directory` if not set, else does not use a mirror)
+    :param native: whether to make the clone directly from git plumbing rather than calling `git subrepo` (the result
+    is the same; uses the default set with `set_default_native` if not set)
+    :param depth: the number of commits of the repository's history to fetch (only the cloned commit is needed; a
+    commit to clone must be within this many commits of the branch/tag; makes the parent repository shallow)
+    :param filter: partial clone filter to fetch the repository with (e.g. `"blob:none"` or `"tree:0"`), so that only
+    the objects of the commit cloned are fetched
+    :param timeout: the number of seconds to wait for the clone before it is killed (see `RunTimeoutException`)
+    :param output_callback: called with the name of the stream (`"stdout"` or `"stderr"`) and each line written to it
+    by the commands ran
     :return: the commit reference of the checkout
+    :exception RepositoryLockTimeoutException: raised if the lock on the parent repository (see `lock_repository`) was
+    not acquired within the timeout set with `set_repository_lock_timeout`
+    :exception GitLockException: raised if one of git's lock files exists (e.g. another process is using `git` on the
+    parent repository without holding its lock) and retrying did not help (only the commands made without `git
+    subrepo`, i.e. the fetches and those made when native, are retried, as `git subrepo` may fail part way through)
+    """
+    return run_steps(_clone_steps(location, directory, branch=branch, tag=tag, commit=commit, author_name=author_name,
+                                  author_email=author_email, cache_directory=cache_directory,
+                                  native=_is_native(native), fetch_options=get_fetch_options(depth, filter)),
+                     timeout=timeout, output_callback=output_callback)
+
+
+def _clone_steps(location: str, directory: str, *, branch: str=None, tag: str=None, commit: str=None,
+                 author_name: str=None, author_email: str=None, cache_directory: str=None,
+                 native: bool=False, fetch_options: FetchOptions=FetchOptions()) -> Steps[Commit]:
+    """
+    Steps to clone the repository at the given location as a subrepo in the given directory (see `clone`).
     """
     if os.path.exists(directory):
         raise ValueError(f"The directory \"{directory}\" already exists")
@@ -73,59 +195,405 @@ def clone(location: str, directory: str, *, branch: str=None, tag: str=None, com
     git_root = get_git_root_directory(existing_parent_directory)
     git_relative_directory = os.path.relpath(os.path.realpath(directory), git_root)
 
-    if (branch or tag) and commit:
-        run([GIT_COMMAND, "fetch", location, branch if branch else tag], execution_directory=git_root)
-        branch, tag = None, None
-    reference = branch if branch else (tag if tag else commit)
-
-    execution_environment = os.environ.copy()
-    if author_name is not None:
-        execution_environment[_GIT_AUTHOR_NAME_ENVIRONMENT_VARIABLE] = author_name
-    if author_email is not None:
-        execution_environment[_GIT_AUTHOR_EMAIL_ENVIRONMENT_VARIABLE] = author_email
+    mirror = None
+    cache_directory = cache_directory if cache_directory is not None else get_default_cache_directory()
+    if cache_directory is not None:
+        os.makedirs(cache_directory, exist_ok=True)
+        mirror = Mirror(cache_directory, get_cache_location(location, git_root))
+        try:
+            while True:
+                yield from mirror.lock.acquire_steps()
+                yield from mirror.refresh_steps()
+                # Stops the mirror from being evicted whilst it is used (the lock is released for a moment whilst it is
+                # made shared, in which time the mirror may have been evicted, so it is then refreshed again)
+                yield from mirror.lock.acquire_steps(shared=True)
+                if os.path.isdir(mirror.path):
+                    break
+        except RunException:
+            # Clones directly from the remote instead, which reports the problem
+            mirror.lock.release()
+            mirror = None
+    # Fetches from the mirror in place of the remote (the remote is still recorded in `.gitrepo`)
+    git_options = ["-c", f"url.{mirror.path}.insteadOf={location}"] if mirror is not None else []
+    if mirror is not None:
+        # The mirror is local and complete, whereas objects filtered out would later be fetched from the remote
+        fetch_options = fetch_options._replace(filter=None)
 
+    prefetch_reference = None
     try:
-        run([GIT_COMMAND, _GIT_SUBREPO_COMMAND, _GIT_SUBREPO_CLONE_COMMAND, _GIT_SUBREPO_VERBOSE_FLAG,
-             _GIT_SUBREPO_BRANCH_FLAG, reference, location, git_relative_directory], execution_directory=git_root,
-            execution_environment=execution_environment)
-    except RunException as e:
-        if re.search("Can't clone subrepo. (Unstaged|Index has) changes", e.stderr) is not None:
-            raise UnstagedChangeException(git_root) from e
-        elif "Command failed:" in e.stderr:
+        if (branch or tag) and commit:
+            prefetch_reference = _get_prefetch_reference(git_relative_directory)
+            yield from _prefetch_steps(location, branch if branch else tag, prefetch_reference, git_root, git_options,
+                                       fetch_options, commit=commit)
+            # `git subrepo` then fetches the commit from the parent repository, rather than from the remote again
+            git_options = ["-c", f"url.{git_root}.insteadOf={location}"]
+            branch, tag = None, None
+        elif (branch or tag) and not native and fetch_options != FetchOptions():
+            # `git subrepo` fetches everything, unless it already has the commit (then fetching nothing further)
+            prefetch_reference = _get_prefetch_reference(git_relative_directory)
+            yield from _prefetch_steps(location, branch if branch else tag, prefetch_reference, git_root, git_options,
+                                       fetch_options)
+        reference = branch if branch else (tag if tag else commit)
+
+        execution_environment = os.environ.copy()
+        if author_name is not None:
+            execution_environment[_GIT_AUTHOR_NAME_ENVIRONMENT_VARIABLE] = author_name
+        if author_email is not None:
+            execution_environment[_GIT_AUTHOR_EMAIL_ENVIRONMENT_VARIABLE] = author_email
+
+        try:
+            release_repository_lock = yield from acquire_repository_lock_steps(git_root)
             try:
-                repo_info = run([GIT_COMMAND, _GIT_LS_REMOTE_COMMAND, location])
-                if not branch and not tag and commit:
-                    raise NotAGitReferenceException(
-                        f"Commit \"{commit}\" not found (specify branch/tag to fetch that first if required)")
+                if native:
+                    yield from native_clone_steps(location, git_relative_directory, reference, git_root,
+                                                  git_options=git_options, execution_environment=execution_environment,
+                                                  fetch_options=fetch_options)
                 else:
-                    references = re.findall("^.+\srefs\/.+\/(.+)", repo_info, flags=re.MULTILINE)
-                    if reference not in references:
-                        raise NotAGitReferenceException(f"{reference} not found in {references}") from e
+                    yield Command([GIT_COMMAND, *git_options, _GIT_SUBREPO_COMMAND, _GIT_SUBREPO_CLONE_COMMAND,
+                                   _GIT_SUBREPO_VERBOSE_FLAG, _GIT_SUBREPO_BRANCH_FLAG, reference, location,
+                                   git_relative_directory], git_root, execution_environment, capture_stdout=False)
+            finally:
+                release_repository_lock()
+        except RunException as e:
+            if re.search("Can't clone subrepo. (Unstaged|Index has) changes", e.stderr) is not None:
+                raise UnstagedChangeException(git_root) from e
+            elif isinstance(e, GitLockException):
+                raise e
+            elif native or "Command failed:" in e.stderr:
+                try:
+                    remote_references = yield from get_remote_references_steps(location, git_root)
+                    if not branch and not tag and commit:
+                        raise NotAGitReferenceException(
+                            f"Commit \"{commit}\" not found (specify branch/tag to fetch that first if required)")
+                    else:
+                        references = _get_reference_names(remote_references)
+                        if reference not in references:
+                            # The references may have been got before the reference was made
+                            remote_references = yield from get_remote_references_steps(location, git_root, max_age=0)
+                            references = _get_reference_names(remote_references)
+                        if reference not in references:
+                            raise NotAGitReferenceException(f"{reference} not found in {references}") from e
 
-            except RunException as debug_e:
-                if re.match("fatal: repository .* not found", debug_e.stderr):
-                    raise NotAGitRepositoryException(location) from e
-        raise e
+                except RunException as debug_e:
+                    if re.match("fatal: repository .* not found", debug_e.stderr):
+                        raise NotAGitRepositoryException(location) from e
+            raise e
+    finally:
+        if prefetch_reference is not None:
+            _delete_prefetch_reference(git_root, prefetch_reference)
+        if mirror is not None:
+            mirror.lock.release()
+            evict(cache_directory, get_cache_max_size())
 
     assert os.path.exists(directory)
     return status(directory)[2]
 
 
-@requires_subrepo
-def status(directory: str) -> Tuple[RepositoryLocation, Branch, Commit]:
+def _prefetch_steps(location: str, reference: str, prefetch_reference: str, git_root: str, git_options: List[str],
+                    fetch_options: FetchOptions, *, commit: str=None) -> Steps[None]:
+    """
+    Steps to fetch the given branch or tag from the given remote into the parent repository, ahead of it (or a commit
+    from it) being cloned.
+    :param location: the location of the remote repository
+    :param reference: the branch or tag to fetch
+    :param prefetch_reference: the reference to fetch into (which keeps the commit whilst it is cloned)
+    :param git_root: the root of the parent repository
+    :param git_options: options to pass to `git`
+    :param fetch_options: limits on what is fetched
+    :param commit: the commit that is to be cloned (if not the branch or tag)
+    :exception NotAGitRepositoryException: raised if the remote is not a repository
+    :exception NotAGitReferenceException: raised if the remote does not have the reference, or the reference does not
+    bring the commit with it
+    """
+    try:
+        yield from fetch_steps(location, [f"+{reference}:{prefetch_reference}"], git_root, fetch_options,
+                               git_options=git_options, arguments=["--no-tags", "--quiet"])
+    except RunException as e:
+        if re.search("couldn't find remote ref", e.stderr, flags=re.IGNORECASE):
+            raise NotAGitReferenceException(f"{reference} not found in {location}") from e
+        elif re.search("does not appear to be a git repository|repository .* not found", e.stderr):
+            raise NotAGitRepositoryException(location) from e
+        raise e
+    if commit is None:
+        return
+    try:
+        yield Command([GIT_COMMAND, _GIT_CAT_FILE_COMMAND, "-e", f"{commit}^{{commit}}"], git_root)
+    except RunException as e:
+        depth_hint = f", within {fetch_options.depth} commits of it" if fetch_options.depth is not None else ""
+        raise NotAGitReferenceException(
+            f"Commit \"{commit}\" not found (specify the branch/tag that it is on{depth_hint})") from e
+
+
+@operation
+def status(directory: str, *, revision: str=None, object_reader: ObjectReader=None, native: bool=True,
+           timeout: float=None, output_callback: OutputCallback=None) -> SubrepoStatus:
     """
     Gets the status of the subrepo that has been cloned into the given directory.
     :param directory: the directory containing the subrepo
-    :return: a tuple consisting of the URL the subrepo is tracking, the branch that has been checked out and the commit
-    reference
+    :param revision: revision of the parent repository to get the status of the subrepo at (read from the committed
+    `.gitrepo` file, without checking the revision out), rather than the subrepo's current status
+    :param object_reader: reader of the parent repository to read the `.gitrepo` file at the revision with (reused
+    between calls, rather than a `git` process being started for every call)
+    :param native: whether to read the subrepo's `.gitrepo` file directly rather than calling `git subrepo status`
+    (falls back to `git subrepo status` if the file cannot be understood; not used if a revision is given)
+    :param timeout: the number of seconds to wait for `git subrepo status` before it is killed (see
+    `RunTimeoutException`)
+    :param output_callback: called with the name of the stream (`"stdout"` or `"stderr"`) and each line written to it
+    by `git subrepo status`
+    :return: the status of the subrepo, which unpacks to a tuple consisting of the URL the subrepo is tracking, the
+    branch that has been checked out and the commit reference
+    :exception NotAGitReferenceException: raised if the given revision does not exist
     """
+    if revision is not None:
+        return _read_status_at_revision(directory, revision, object_reader)
     if not os.path.exists(directory):
         raise ValueError(f"No subrepo found in \"{directory}\"")
 
+    if native:
+        subrepo_status = _read_status(directory)
+        if subrepo_status is not None:
+            return subrepo_status
+    return _status_from_subrepo_command(directory, timeout=timeout, output_callback=output_callback)
+
+
+def _read_status(directory: str) -> Optional[SubrepoStatus]:
+    """
+    Reads the status of the subrepo that has been cloned into the given directory from its `.gitrepo` file.
+    :param directory: the directory containing the subrepo
+    :return: the status of the subrepo or `None` if its `.gitrepo` file exists but cannot be understood
+    """
     try:
-        result = run([GIT_COMMAND, _GIT_SUBREPO_COMMAND, _GIT_SUBREPO_STATUS_COMMAND, _GIT_SUBREPO_VERBOSE_FLAG,
-                      get_directory_relative_to_git_root(directory)],
-                     execution_directory=get_git_root_directory(directory))
+        gitrepo = _read_gitrepo(directory)
+    except NotAGitSubrepoException:
+        if os.path.exists(get_gitrepo_path(directory)):
+            return None
+        # Raises `NotAGitRepositoryException` if not in a repository, as `git subrepo status` would
+        get_git_root_directory(directory)
+        raise
+    return _to_status(gitrepo)
+
+
+def _read_status_at_revision(directory: str, revision: str, object_reader: Optional[ObjectReader]) -> SubrepoStatus:
+    """
+    Reads the status of the subrepo that was in the given directory at the given revision of the parent repository.
+    :param directory: the directory containing the subrepo at the revision (which does not have to currently exist)
+    :param revision: the revision of the parent repository
+    :param object_reader: reader of the parent repository (a reader is opened for the call if not given)
+    :return: the status of the subrepo
+    :exception NotAGitReferenceException: raised if the revision does not exist
+    :exception NotAGitSubrepoException: raised if the directory did not contain a subrepo at the revision
+    """
+    existing_directory = directory
+    while not os.path.isdir(existing_directory) and os.path.dirname(existing_directory) != existing_directory:
+        existing_directory = os.path.dirname(existing_directory)
+    git_root = get_git_root_directory(existing_directory)
+    subdir = os.path.relpath(os.path.join(os.path.realpath(existing_directory),
+                                          os.path.relpath(directory, existing_directory)), git_root)
+    path = GITREPO_FILE_NAME if subdir == os.curdir else f"{subdir}/{GITREPO_FILE_NAME}".replace(os.sep, "/")
+
+    if object_reader is not None and object_reader.git_root != git_root:
+        raise ValueError(f"Object reader is for \"{object_reader.git_root}\", not \"{git_root}\"")
+    reader = object_reader if object_reader is not None else ObjectReader(git_root)
+    try:
+        contents = reader.read(f"{revision}:{path}")
+        if contents is None:
+            if reader.read(f"{revision}^{{commit}}") is None:
+                raise NotAGitReferenceException(f"\"{revision}\" not found in {git_root}")
+            raise NotAGitSubrepoException(directory)
+    finally:
+        if object_reader is None:
+            reader.close()
+    return _to_status(parse_gitrepo(contents.decode(), directory))
+
+
+def _to_status(gitrepo: GitRepoFile) -> SubrepoStatus:
+    """
+    Converts the contents of a subrepo's `.gitrepo` file to the subrepo's status.
+    :param gitrepo: the parsed `.gitrepo` file
+    :return: the status of the subrepo
+    """
+    return SubrepoStatus(
+        gitrepo.remote, gitrepo.branch, gitrepo.commit[0:_SHORT_COMMIT_LENGTH], full_commit=gitrepo.commit,
+        parent=gitrepo.parent, method=gitrepo.method, cmdver=gitrepo.cmdver)
+
+
+def _read_gitrepo(directory: str) -> GitRepoFile:
+    """
+    Reads the `.gitrepo` file of the subrepo in the given directory, using the status index if it is enabled.
+    :param directory: the directory containing the subrepo
+    :return: the parsed `.gitrepo` file
+    :exception NotAGitSubrepoException: raised if the directory does not contain a (valid) `.gitrepo` file
+    """
+    if is_status_index_enabled():
+        try:
+            git_root = get_git_root_directory(directory)
+        except NotAGitRepositoryException:
+            return read_gitrepo(directory)
+        return get_status_index(git_root).read_gitrepo(directory, get_directory_relative_to_git_root(directory))
+    return read_gitrepo(directory)
+
+
+@operation
+@requires_git
+def status_all(repository_root: str, *, remote: str=None, branch: str=None, nested: bool=False) \
+        -> Dict[str, SubrepoStatus]:
+    """
+    Gets the status of every subrepo tracked within the given repository.
+    :param repository_root: the root of the git repository (or a directory within it, to only get the subrepos below it)
+    :param remote: only include subrepos tracking this remote
+    :param branch: only include subrepos tracking this branch
+    :param nested: whether to include subrepos that are within other subrepos
+    :return: mapping between the directories of the subrepos (joined onto the given directory) and their status
+    """
+    if not os.path.isdir(repository_root):
+        raise ValueError(f"No repository found in \"{repository_root}\"")
+    if is_status_index_enabled():
+        git_root = get_git_root_directory(repository_root)
+        status_index = get_status_index(git_root)
+        # The index is written once, rather than as the status of each subrepo is indexed
+        with status_index.batch_updates():
+            paths = status_index.get_gitrepo_paths(lambda: _list_gitrepo_paths(git_root))
+            relative_root = get_directory_relative_to_git_root(repository_root)
+            if relative_root != os.curdir:
+                paths = [path[len(relative_root) + 1:] for path in paths if path.startswith(f"{relative_root}/")]
+            return _get_statuses(repository_root, paths, remote=remote, branch=branch, nested=nested)
+    return _get_statuses(repository_root, _list_gitrepo_paths(repository_root), remote=remote, branch=branch,
+                         nested=nested)
+
+
+def _get_statuses(repository_root: str, paths: List[str], *, remote: Optional[str], branch: Optional[str],
+                  nested: bool) -> Dict[str, SubrepoStatus]:
+    """
+    Gets the status of the subrepos with the given `.gitrepo` files (see `status_all`).
+    :param repository_root: the directory that the paths are relative to
+    :param paths: the paths of the `.gitrepo` files
+    :param remote: only include subrepos tracking this remote
+    :param branch: only include subrepos tracking this branch
+    :param nested: whether to include subrepos that are within other subrepos
+    :return: mapping between the directories of the subrepos (joined onto the given directory) and their status
+    """
+    subrepo_directories = sorted({os.path.dirname(path) for path in paths})
+    if not nested:
+        subrepo_directories = [
+            subrepo_directory for subrepo_directory in subrepo_directories
+            if not any(subrepo_directory.startswith(f"{other}/") for other in subrepo_directories if other != "")]
+
+    statuses: Dict[str, SubrepoStatus] = {}
+    for subrepo_directory in subrepo_directories:
+        directory = os.path.normpath(os.path.join(repository_root, subrepo_directory))
+        if not os.path.exists(get_gitrepo_path(directory)):
+            # Tracked but deleted from the working tree
+            continue
+        subrepo_status = status(directory)
+        if (remote is None or subrepo_status.remote == remote) and (branch is None or subrepo_status.branch == branch):
+            statuses[directory] = subrepo_status
+    return statuses
+
+
+def _list_gitrepo_paths(directory: str) -> List[str]:
+    """
+    Lists the paths of the `.gitrepo` files that are tracked within the given directory.
+    :param directory: the directory within a git repository
+    :return: the paths of the `.gitrepo` files, relative to the given directory
+    :exception NotAGitRepositoryException: raised if the given directory is not within a git repository
+    """
+    try:
+        result = run([GIT_COMMAND, _GIT_LS_FILES_COMMAND, "-z", "--", f":(glob)**/{GITREPO_FILE_NAME}"],
+                     execution_directory=directory)
+    except RunException as e:
+        if NOT_A_GIT_REPOSITORY_ERROR_PATTERN.search(e.stderr):
+            raise NotAGitRepositoryException(directory) from e
+        raise e
+    return [path for path in result.split("\0") if path]
+
+
+@operation
+@requires_git
+def changed_subrepos(repository_root: str, since: str, until: str="HEAD", *, object_reader: ObjectReader=None) \
+        -> Dict[str, SubrepoChange]:
+    """
+    Gets the subrepos within the given repository that have been cloned, pulled or removed between two revisions of the
+    repository, without checking either revision out.
+
+    The trees of the revisions are compared once, with only the `.gitrepo` files that differ read.
+    :param repository_root: the root of the git repository (or a directory within it, to only get the subrepos below it)
+    :param since: the earlier revision of the repository
+    :param until: the later revision of the repository
+    :param object_reader: reader of the repository to read the `.gitrepo` files with (reused between calls, rather than
+    a `git` process being started for every call)
+    :return: mapping between the directories of the changed subrepos (joined onto the given directory) and their status
+    at each revision
+    :exception NotAGitReferenceException: raised if either revision does not exist
+    """
+    if not os.path.isdir(repository_root):
+        raise ValueError(f"No repository found in \"{repository_root}\"")
+    try:
+        result = run([GIT_COMMAND, _GIT_DIFF_TREE_COMMAND, "-r", "-z", "--no-renames", "--relative", since, until, "--",
+                      f":(glob)**/{GITREPO_FILE_NAME}"], execution_directory=repository_root)
+    except RunException as e:
+        if NOT_A_GIT_REPOSITORY_ERROR_PATTERN.search(e.stderr):
+            raise NotAGitRepositoryException(repository_root) from e
+        if _UNKNOWN_REVISION_ERROR_PATTERN.search(e.stderr):
+            raise NotAGitReferenceException(f"\"{since}\" or \"{until}\" not found in {repository_root}") from e
+        raise e
+
+    fields = result.split("\0")
+    if len(fields) < 2:
+        return {}
+    changes: Dict[str, SubrepoChange] = {}
+    reader = object_reader if object_reader is not None else ObjectReader(repository_root)
+    try:
+        for metadata, path in zip(fields[0::2], fields[1::2]):
+            # e.g. ":100644 100644 <old blob> <new blob> M"
+            _, _, old_blob, new_blob, _ = metadata.split(" ")
+            directory = os.path.normpath(os.path.join(repository_root, os.path.dirname(path)))
+            changes[directory] = SubrepoChange(_read_historical_status(reader, old_blob),
+                                               _read_historical_status(reader, new_blob))
+    finally:
+        if object_reader is None:
+            reader.close()
+    return changes
+
+
+def _read_historical_status(object_reader: ObjectReader, blob: str) -> Optional[SubrepoStatus]:
+    """
+    Reads the status of a subrepo from a `.gitrepo` file that has been committed.
+    :param object_reader: reader of the repository
+    :param blob: the object name of the `.gitrepo` file (all zeros if there was no file)
+    :return: the status of the subrepo or `None` if there was no (valid or readable) `.gitrepo` file
+    """
+    if blob.strip("0") == "":
+        return None
+    contents = object_reader.read(blob)
+    if contents is None:
+        return None
+    try:
+        return _to_status(parse_gitrepo(contents.decode()))
+    except NotAGitSubrepoException:
+        return None
+
+
+@requires_subrepo
+def _status_from_subrepo_command(directory: str, *, timeout: float=None, output_callback: OutputCallback=None) \
+        -> SubrepoStatus:
+    """
+    Gets the status of the subrepo that has been cloned into the given directory using `git subrepo status`.
+    :param directory: the directory containing the subrepo
+    :param timeout: the number of seconds to wait for `git subrepo status` before it is killed
+    :param output_callback: called with each line written by `git subrepo status`
+    :return: the status of the subrepo
+    """
+    return run_steps(_status_from_subrepo_command_steps(directory), timeout=timeout, output_callback=output_callback)
+
+
+def _status_from_subrepo_command_steps(directory: str) -> Steps[SubrepoStatus]:
+    """
+    Steps to get the status of the subrepo that has been cloned into the given directory using `git subrepo status`.
+    """
+    try:
+        result = yield Command([GIT_COMMAND, _GIT_SUBREPO_COMMAND, _GIT_SUBREPO_STATUS_COMMAND,
+                                _GIT_SUBREPO_VERBOSE_FLAG, get_directory_relative_to_git_root(directory)],
+                               get_git_root_directory(directory))
     except RunException as e:
         if "Command failed: 'git rev-parse --verify HEAD'" in e.stderr:
             raise NotAGitSubrepoException(directory) from e
@@ -137,25 +605,413 @@ def status(directory: str) -> Tuple[RepositoryLocation, Branch, Commit]:
     url = re.search("Remote URL:\s*(.*)", result).group(1)
     branch = re.search("Tracking Branch:\s*(.*)", result).group(1)
     commit = re.search("Pulled Commit:\s*(.*)", result).group(1)
-    return url, branch, commit
+    parent = re.search("Pull Parent:[ \t]*(.*)", result)
+    return SubrepoStatus(url, branch, commit, parent=(parent.group(1) or None) if parent else None)
 
 
-@requires_subrepo
-def pull(directory: str) -> Commit:
+@operation
+@requires_git
+def is_modified(directory: str) -> bool:
+    """
+    Gets whether the subrepo that has been cloned into the given directory has been changed since it was pulled (see
+    `get_modified_paths`).
+    :param directory: the directory containing the subrepo
+    :return: whether the subrepo has been changed
+    """
+    return len(get_modified_paths(directory)) > 0
+
+
+@operation
+@requires_git
+def is_modified_many(directories: Iterable[str]) -> Dict[str, Union[bool, Exception]]:
+    """
+    Gets whether the subrepos that have been cloned into the given directories have been changed since they were pulled
+    (see `get_modified_paths`).
+
+    The index and working tree of each parent repository are checked once, for all of the subrepos within it.
+    :param directories: the directories containing the subrepos
+    :return: mapping between each directory and either whether its subrepo has been changed or the exception raised
+    when checking it
+    """
+    return {directory: paths if isinstance(paths, Exception) else len(paths) > 0
+            for directory, paths in _get_modified_paths(directories).items()}
+
+
+@operation
+@requires_git
+def get_modified_paths(directory: str) -> List[str]:
+    """
+    Gets the paths of the files in the subrepo that has been cloned into the given directory that differ from those of
+    the commit it was last pulled from, whether changed in commits to the parent repository, in its index or in its
+    working tree (including untracked files).
+
+    The subrepo's tree in `HEAD` is compared to the tree of the pulled commit, so the number of `git` calls made does
+    not depend on the size of the subrepo.
+    :param directory: the directory containing the subrepo
+    :return: the paths of the changed files, relative to the directory (the subrepo's `.gitrepo` file is excluded)
+    """
+    paths = _get_modified_paths([directory])[directory]
+    if isinstance(paths, Exception):
+        raise paths
+    return paths
+
+
+def _get_modified_paths(directories: Iterable[str]) -> Dict[str, Union[List[str], Exception]]:
+    """
+    Gets the paths of the files in the subrepos that have been cloned into the given directories that have been changed
+    since they were pulled (see `get_modified_paths`).
+    :param directories: the directories containing the subrepos
+    :return: mapping between each directory and either the paths of its changed files or the exception raised when
+    getting them
+    """
+    directories = list(dict.fromkeys(directories))
+    results: Dict[str, Union[List[str], Exception]] = {}
+    # Subrepos grouped by the root of their parent repository, with their relative directory and pulled commit
+    subrepos: Dict[str, Dict[str, Tuple[str, str]]] = {}
+    for directory in directories:
+        try:
+            if not os.path.exists(directory):
+                raise ValueError(f"No subrepo found in \"{directory}\"")
+            commit = read_gitrepo(directory).commit
+            git_root = get_git_root_directory(directory)
+            subrepos.setdefault(git_root, {})[directory] = (get_directory_relative_to_git_root(directory), commit)
+        except Exception as e:
+            results[directory] = e
+
+    for git_root, subdirs in subrepos.items():
+        try:
+            uncommitted_paths = _get_uncommitted_paths(git_root, [subdir for subdir, _ in subdirs.values()])
+        except RunException as e:
+            results.update({directory: e for directory in subdirs})
+            continue
+        for directory, (subdir, commit) in subdirs.items():
+            try:
+                paths = set(_get_committed_paths(git_root, subdir, commit))
+                paths.update(path[len(subdir) + 1:] for path in uncommitted_paths if path.startswith(f"{subdir}/"))
+                paths.discard(GITREPO_FILE_NAME)
+                results[directory] = sorted(paths)
+            except Exception as e:
+                results[directory] = e
+    return {directory: results[directory] for directory in directories}
+
+
+def _get_uncommitted_paths(git_root: str, subdirs: List[str]) -> List[str]:
+    """
+    Gets the paths of the files in the given directories that differ between `HEAD` and the index or working tree.
+    :param git_root: the root of the parent repository
+    :param subdirs: the directories, relative to the root of the parent repository
+    :return: the paths of the changed files, relative to the root of the parent repository
+    """
+    result = run([GIT_COMMAND, _GIT_STATUS_COMMAND, "--porcelain", "-z", "--untracked-files=all", "--", *subdirs],
+                 execution_directory=git_root)
+    paths = []
+    entries = iter(result.split("\0"))
+    for entry in entries:
+        if not entry:
+            continue
+        paths.append(entry[3:])
+        if entry[0] in "RC":
+            # Renames and copies are followed by the path they are from
+            paths.append(next(entries, ""))
+    return paths
+
+
+def _get_committed_paths(git_root: str, subdir: str, commit: str) -> List[str]:
+    """
+    Gets the paths of the files in the given directory that differ between `HEAD` and the given commit of the subrepo.
+    :param git_root: the root of the parent repository
+    :param subdir: the directory containing the subrepo, relative to the root of the parent repository
+    :param commit: the commit of the subrepo that was pulled
+    :return: the paths of the changed files, relative to the directory
+    """
+    try:
+        run([GIT_COMMAND, _GIT_CAT_FILE_COMMAND, "-e", f"{commit}^{{commit}}"], execution_directory=git_root)
+        pulled_tree = commit
+    except RunException:
+        # The pulled commit is not fetched into clones of the parent repository, unlike the commit that pulled it
+        pulling_commit = run([GIT_COMMAND, "log", "-1", "--format=%H", "--", f"{subdir}/{GITREPO_FILE_NAME}"],
+                             execution_directory=git_root)
+        pulled_tree = f"{pulling_commit}:{subdir}"
+    result = run([GIT_COMMAND, _GIT_DIFF_TREE_COMMAND, "-r", "--name-only", "-z", pulled_tree, f"HEAD:{subdir}", "--",
+                  ".", f":(exclude){GITREPO_FILE_NAME}"], execution_directory=git_root)
+    return [path for path in result.split("\0") if path]
+
+
+@operation
+@requires_git
+def pull(directory: str, *, native: bool=None, depth: int=None, filter: str=None, timeout: float=None,
+         output_callback: OutputCallback=None) -> Commit:
     """
     Pulls the subrepo that has been cloned into the given directory.
     :param directory: the directory containing the subrepo
+    :param native: whether to make the pull directly from git plumbing rather than calling `git subrepo` (the result is
+    the same; `git subrepo` is still used to merge local changes to the subrepo; uses the default set with
+    `set_default_native` if not set)
+    :param depth: the number of commits of the upstream's history to fetch (more are fetched if the commit last pulled
+    is not within them; makes the parent repository shallow)
+    :param filter: partial clone filter to fetch the upstream with (e.g. `"blob:none"` or `"tree:0"`), so that only the
+    objects of the commit pulled are fetched
+    :param timeout: the number of seconds to wait for the pull before it is killed (see `RunTimeoutException`)
+    :param output_callback: called with the name of the stream (`"stdout"` or `"stderr"`) and each line written to it
+    by the commands ran
     :return: the commit the subrepo is on
+    :exception RepositoryLockTimeoutException: raised if the lock on the parent repository (see `lock_repository`) was
+    not acquired within the timeout set with `set_repository_lock_timeout`
+    :exception GitLockException: raised if one of git's lock files exists (e.g. another process is using `git` on the
+    parent repository without holding its lock) and retrying did not help (only the commands made without `git
+    subrepo`, i.e. the fetches and those made when native, are retried, as `git subrepo` may fail part way through)
+    """
+    return run_steps(_pull_steps(directory, native=_is_native(native), fetch_options=get_fetch_options(depth, filter)),
+                     timeout=timeout, output_callback=output_callback)
+
+
+def _pull_steps(directory: str, *, native: bool=False, fetch_options: FetchOptions=FetchOptions(),
+                prefetched_reference: str=None) -> Steps[Commit]:
+    """
+    Steps to pull the subrepo that has been cloned into the given directory (see `pull`).
+    :param prefetched_reference: reference that the upstream has already been fetched into (see `_prefetch`), which is
+    used rather than fetching it again
     """
     if not os.path.exists(directory):
         raise ValueError(f"No subrepo found in \"{directory}\"")
+    release_repository_lock = yield from acquire_repository_lock_steps(directory)
     try:
-        result = run([GIT_COMMAND, _GIT_SUBREPO_COMMAND, _GIT_SUBREPO_PULL_COMMAND, _GIT_SUBREPO_VERBOSE_FLAG,
-                      get_directory_relative_to_git_root(directory)],
-                     execution_directory=get_git_root_directory(directory))
-    except RunException as e:
-        if "Can't pull subrepo. Working tree has changes" in e.stderr:
-            raise UnstagedChangeException() from e
+        prefetch_reference = None
+        if native:
+            pulled_commit = yield from native_pull_steps(
+                directory, get_directory_relative_to_git_root(directory), get_git_root_directory(directory),
+                fetch_options=fetch_options, prefetched_reference=prefetched_reference)
+            if pulled_commit is not None:
+                return status(directory)[2]
+            # Local changes have to be merged by `git subrepo`
+            get_git_subrepo_version()
+        elif fetch_options != FetchOptions() and prefetched_reference is None:
+            # `git subrepo` fetches everything, unless it already has the commit (then fetching nothing further)
+            prefetch_reference = yield from _prefetch_steps_for_pull(directory, fetch_options)
+        try:
+            yield Command([GIT_COMMAND, _GIT_SUBREPO_COMMAND, _GIT_SUBREPO_PULL_COMMAND, _GIT_SUBREPO_VERBOSE_FLAG,
+                           get_directory_relative_to_git_root(directory)], get_git_root_directory(directory),
+                          capture_stdout=False)
+        except RunException as e:
+            if re.search("Can't pull subrepo. (Unstaged|Working tree has|Index has) changes", e.stderr) is not None:
+                raise UnstagedChangeException() from e
+            raise e
+        finally:
+            if prefetch_reference is not None:
+                _delete_prefetch_reference(directory, prefetch_reference)
+    finally:
+        release_repository_lock()
     return status(directory)[2]
 
 
+@operation
+@requires_git
+def pull_many(directories: Iterable[str], *, max_workers: int=None, native: bool=None, depth: int=None,
+              filter: str=None, timeout: float=None, output_callback: OutputCallback=None,
+              result_callback: ResultCallback=None) -> Dict[str, Union[Commit, Exception]]:
+    """
+    Pulls the subrepos that have been cloned into the given directories.
+
+    The upstreams of the subrepos are fetched concurrently, whilst the pulls (which change the index and commit) are
+    done one at a time, as each fetch completes, each holding the lock on its parent repository (see `pull`).
+    :param directories: the directories containing the subrepos
+    :param max_workers: the maximum number of upstreams to fetch at the same time (default decided by
+    `ThreadPoolExecutor`)
+    :param native: whether to make the pulls directly from git plumbing rather than calling `git subrepo` (see `pull`)
+    :param depth: the number of commits of each upstream's history to fetch (see `pull`)
+    :param filter: partial clone filter to fetch each upstream with (see `pull`)
+    :param timeout: the number of seconds to wait for each fetch, and each pull, before it is killed
+    :param output_callback: called with the name of the stream (`"stdout"` or `"stderr"`) and each line written to it
+    by the pulls
+    :param result_callback: called with each directory and its result (as returned), as soon as it has been pulled
+    :return: mapping between each directory and either the commit its subrepo is on or the exception raised when
+    pulling it
+    """
+    # Imported when needed, as `concurrent.futures` is slow to import (see `gitsubrepo.__main__`)
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    directories = list(dict.fromkeys(directories))
+    native = _is_native(native)
+    fetch_options = get_fetch_options(depth, filter)
+    # Fetches would overwrite each other's `FETCH_HEAD` (used by `git subrepo`) if they were to overlap with the pulls
+    overlap_pulls = get_git_version() >= _GIT_NO_WRITE_FETCH_HEAD_MINIMUM_VERSION
+
+    results: Dict[str, Union[Commit, Exception]] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        prefetches = [executor.submit(in_current_context(_prefetch), directory, overlap_pulls, fetch_options, timeout)
+                      for directory in directories]
+        if not overlap_pulls:
+            wait(prefetches)
+        for directory, prefetch in zip(directories, prefetches):
+            prefetch_reference = prefetch.result()
+            try:
+                results[directory] = run_steps(
+                    _pull_steps(directory, native=native, fetch_options=fetch_options,
+                                prefetched_reference=prefetch_reference),
+                    timeout=timeout, output_callback=output_callback)
+            except Exception as e:
+                results[directory] = e
+            finally:
+                if prefetch_reference is not None:
+                    _delete_prefetch_reference(directory, prefetch_reference)
+            if result_callback is not None:
+                result_callback(directory, results[directory])
+    return results
+
+
+def _prefetch(directory: str, no_write_fetch_head: bool, fetch_options: FetchOptions, timeout: Optional[float]) \
+        -> Optional[str]:
+    """
+    Fetches the upstream of the subrepo in the given directory into the parent repository (without changing its index or
+    working tree), so that a subsequent pull need not download it.
+    :param directory: the directory containing the subrepo
+    :param no_write_fetch_head: whether to stop the fetch from writing `FETCH_HEAD`
+    :param fetch_options: limits on what is fetched
+    :param timeout: the number of seconds to wait for the fetch before it is killed
+    :return: the reference that the upstream was fetched into (to keep its objects alive until the pull), or `None` if
+    the upstream could not be fetched (the pull reports the problem)
+    """
+    return run_steps(_prefetch_steps_for_pull(directory, fetch_options, no_write_fetch_head=no_write_fetch_head),
+                     timeout=timeout)
+
+
+def _prefetch_steps_for_pull(directory: str, fetch_options: FetchOptions, *, no_write_fetch_head: bool=False) \
+        -> Steps[Optional[str]]:
+    """
+    Steps to fetch the upstream of the subrepo in the given directory into the parent repository (see `_prefetch`).
+    :param directory: the directory containing the subrepo
+    :param fetch_options: limits on what is fetched
+    :param no_write_fetch_head: whether to stop the fetch from writing `FETCH_HEAD`
+    :return: the reference that the upstream was fetched into, or `None` if the upstream could not be fetched
+    """
+    try:
+        gitrepo = read_gitrepo(directory)
+        git_root = get_git_root_directory(directory)
+        reference = _get_prefetch_reference(get_directory_relative_to_git_root(directory))
+        refspecs = [f"+{gitrepo.branch}:{reference}"]
+        arguments = ["--no-tags", "--quiet"] + ([_GIT_NO_WRITE_FETCH_HEAD_FLAG] if no_write_fetch_head else [])
+        yield from fetch_steps(gitrepo.remote, refspecs, git_root, fetch_options, git_options=["-c", "gc.auto=0"],
+                               arguments=arguments)
+    except (GitsubrepoException, ValueError, OSError):
+        return None
+    try:
+        # `git subrepo` requires the history to reach the commit last pulled
+        yield from deepen_steps(gitrepo.remote, refspecs, reference, gitrepo.commit, git_root, fetch_options,
+                                git_options=["-c", "gc.auto=0"], arguments=arguments)
+    except GitsubrepoException:
+        pass
+    return reference
+
+
+def _get_prefetch_reference(relative_directory: str) -> str:
+    """
+    Gets the reference in the parent repository that the upstream of a subrepo is fetched into ahead of it being cloned
+    or pulled.
+    :param relative_directory: the directory of the subrepo, relative to the root of the parent repository
+    :return: the reference
+    """
+    return _PREFETCH_REFERENCE_PREFIX + hashlib.sha1(relative_directory.encode()).hexdigest()
+
+
+def _delete_prefetch_reference(directory: str, reference: str):
+    """
+    Deletes a reference made by `_prefetch` or `_prefetch_steps`.
+    :param directory: a directory in the parent repository (e.g. the one containing the subrepo)
+    :param reference: the reference to delete
+    """
+    try:
+        run([GIT_COMMAND, _GIT_UPDATE_REF_COMMAND, "-d", reference],
+            execution_directory=get_git_root_directory(directory))
+    except (GitsubrepoException, OSError):
+        pass
+
+
+@operation
+@requires_git
+def check_for_updates(directories: Iterable[str], *, max_age: float=DEFAULT_REMOTE_REFERENCES_MAX_AGE,
+                      max_workers: int=None, timeout: float=None, result_callback: ResultCallback=None) \
+        -> Dict[str, Union[Optional[Commit], Exception]]:
+    """
+    Checks whether the subrepos that have been cloned into the given directories are behind their upstreams, without
+    pulling them.
+
+    The references of each remote are got once (concurrently with those of the other remotes) and are reused for the
+    given number of seconds.
+    :param directories: the directories containing the subrepos
+    :param max_age: the number of seconds for which previously got references of a remote are reused
+    :param max_workers: the maximum number of remotes to get the references of at the same time (default decided by
+    `ThreadPoolExecutor`)
+    :param timeout: the number of seconds to wait for the references of each remote before giving up on them
+    :param result_callback: called with each directory and its result (as returned), as soon as it has been checked
+    :return: mapping between each directory and either the commit its upstream is on (if that is not the commit it was
+    pulled from), `None` if it is up to date, or the exception raised when checking it
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    directories = list(dict.fromkeys(directories))
+    results: Dict[str, Union[Optional[Commit], Exception]] = {}
+    statuses: Dict[str, SubrepoStatus] = {}
+    locations: Dict[str, str] = {}
+    # The remote of each location, as recorded by a subrepo, and the root of that subrepo's parent repository (which
+    # the remote is relative to if it is a relative local path)
+    remotes: Dict[str, Tuple[str, str]] = {}
+
+    def set_result(directory: str, result: Union[Optional[Commit], Exception]):
+        results[directory] = result
+        if result_callback is not None:
+            result_callback(directory, result)
+
+    for directory in directories:
+        try:
+            statuses[directory] = status(directory)
+            git_root = get_git_root_directory(directory)
+            locations[directory] = get_cache_location(statuses[directory].remote, git_root)
+            remotes.setdefault(locations[directory], (statuses[directory].remote, git_root))
+        except Exception as e:
+            set_result(directory, e)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        remote_references = {executor.submit(in_current_context(get_remote_references), remote, git_root,
+                                             max_age=max_age, timeout=timeout): location
+                             for location, (remote, git_root) in remotes.items()}
+        # Subrepos are checked as soon as the references of their remote are got
+        for future in as_completed(remote_references):
+            for directory, subrepo_status in statuses.items():
+                if locations[directory] != remote_references[future]:
+                    continue
+                try:
+                    remote_commit = _get_remote_commit(subrepo_status, future.result())
+                    pulled_commit = subrepo_status.full_commit if subrepo_status.full_commit else subrepo_status.commit
+                    set_result(directory, None if remote_commit.startswith(pulled_commit)
+                               else Commit(remote_commit[0:_SHORT_COMMIT_LENGTH]))
+                except Exception as e:
+                    set_result(directory, e)
+    return {directory: results[directory] for directory in directories}
+
+
+def _get_remote_commit(subrepo_status: SubrepoStatus, remote_references: Dict[str, str]) -> str:
+    """
+    Gets the commit that the branch tracked by the given subrepo is on in its remote.
+    :param subrepo_status: the status of the subrepo
+    :param remote_references: the references of the subrepo's remote (see `get_remote_references`)
+    :return: the commit
+    :exception NotAGitReferenceException: raised if the remote does not have the tracked branch
+    """
+    branch = subrepo_status.branch
+    for name in (f"refs/heads/{branch}", f"refs/tags/{branch}", branch):
+        if name in remote_references:
+            return remote_references[name]
+    # Subrepos cloned at a commit track that commit
+    if re.fullmatch("[0-9a-f]{4,40}", branch) and (subrepo_status.full_commit or subrepo_status.commit).startswith(
+            branch[0:_SHORT_COMMIT_LENGTH]):
+        return subrepo_status.full_commit or subrepo_status.commit
+    raise NotAGitReferenceException(f"{branch} not found in {subrepo_status.remote}")
+
+
+def _get_reference_names(remote_references: Dict[str, str]) -> List[str]:
+    """
+    Gets the names of the given references, without their `refs/<type>/` prefix (e.g. `master` for `refs/heads/master`).
+    :param remote_references: the references (see `get_remote_references`)
+    :return: the names of the references
+    """
+    return [name.split("/", 2)[2] for name in remote_references if name.startswith("refs/") and name.count("/") >= 2]
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from git import Repo
+
+from gitsubrepo import aio
+from gitsubrepo._cache import Mirror
+from gitsubrepo._common import Command, Delay
+from gitsubrepo._repository_lock import RepositoryLock
+from gitsubrepo.exceptions import NotAGitReferenceException, NotAGitRepositoryException, NotAGitSubrepoException, \
+    RunException
+from gitsubrepo.subrepo import _read_status
+from gitsubrepo.tests._resources.information import TEST_BRANCH, TEST_BRANCH_COMMIT, TEST_TAG, TEST_TAG_COMMIT
+from gitsubrepo.tests.test_subrepo import _TestWithSubrepo, TEST_DIRECTORY_NAME
+
+
+def _is_running(pid: int) -> bool:
+    """
+    Gets whether the process with the given ID is running (i.e. exists and is not a zombie).
+    :param pid: the process ID
+    :return: whether the process is running
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            return file.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return True
+
+
+class _TestWithSubrepoAndEventLoop(_TestWithSubrepo):
+    """
+    Base class for tests involving sub-repos and an event loop.
+    """
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        super().tearDown()
+
+    def run_until_complete(self, awaitable):
+        return self.loop.run_until_complete(awaitable)
+
+
+class TestClone(_TestWithSubrepoAndEventLoop):
+    """
+    Tests for `clone`.
+    """
+    def test_clone_to_relative_directory(self):
+        self.assertRaises(ValueError, self.run_until_complete,
+                          aio.clone(self.external_git_repository, TEST_DIRECTORY_NAME))
+
+    def test_clone_tag(self):
+        commit = self.run_until_complete(aio.clone(self.external_git_repository, self.subrepo_directory, tag=TEST_TAG))
+        self.assertEqual(TEST_TAG_COMMIT, commit)
+
+    def test_clone_tag_natively(self):
+        commit = self.run_until_complete(aio.clone(self.external_git_repository, self.subrepo_directory, tag=TEST_TAG,
+                                                   native=True))
+        self.assertEqual(TEST_TAG_COMMIT, commit)
+        self.assertEqual(TEST_TAG, self.run_until_complete(aio.status(self.subrepo_directory)).branch)
+
+    def test_clone_tag_with_depth(self):
+        commit = self.run_until_complete(aio.clone(self.external_git_repository, self.subrepo_directory, tag=TEST_TAG,
+                                                   native=True, depth=1))
+        self.assertEqual(TEST_TAG_COMMIT, commit)
+        self.assertEqual("true", self.git_repository_client.git.rev_parse("--is-shallow-repository"))
+
+    def test_clone_invalid_branch(self):
+        self.assertRaises(NotAGitReferenceException, self.run_until_complete,
+                          aio.clone(self.external_git_repository, self.subrepo_directory, branch="non-existent"))
+
+    def test_concurrent_clones_with_shared_cache(self):
+        cache_directory = os.path.join(self.temp_directory, "cache")
+        other_git_directory = os.path.join(self.temp_directory, "other")
+        Repo.init(other_git_directory)
+
+        async def clone_concurrently():
+            return await asyncio.wait_for(asyncio.gather(*(
+                aio.clone(self.external_git_repository, os.path.join(git_directory, TEST_DIRECTORY_NAME),
+                          branch=TEST_BRANCH, cache_directory=cache_directory)
+                for git_directory in (self.git_directory, other_git_directory))), 60)
+
+        self.assertEqual([TEST_BRANCH_COMMIT] * 2, self.run_until_complete(clone_concurrently()))
+
+    def test_concurrent_clones_into_same_repository(self):
+        async def clone_concurrently():
+            return await asyncio.wait_for(asyncio.gather(*(
+                aio.clone(self.external_git_repository, os.path.join(self.git_directory, name), branch=TEST_BRANCH)
+                for name in ("first", "second"))), 60)
+
+        self.assertEqual([TEST_BRANCH_COMMIT] * 2, self.run_until_complete(clone_concurrently()))
+        for name in ("first", "second"):
+            status = self.run_until_complete(aio.status(os.path.join(self.git_directory, name)))
+            self.assertEqual(TEST_BRANCH_COMMIT, status.commit)
+
+    def test_clone_waiting_for_repository_lock_times_out(self):
+        with RepositoryLock(os.path.realpath(self.git_directory)):
+            self.assertRaises(asyncio.TimeoutError, self.run_until_complete, aio.clone(
+                self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH, timeout=0.5))
+
+    def test_clone_waiting_for_cache_times_out(self):
+        cache_directory = os.path.join(self.temp_directory, "cache")
+        os.makedirs(cache_directory)
+        with Mirror(cache_directory, os.path.realpath(self.external_git_repository)).lock:
+            self.assertRaises(asyncio.TimeoutError, self.run_until_complete, aio.clone(
+                self.external_git_repository, self.subrepo_directory, cache_directory=cache_directory, timeout=0.5))
+
+
+class TestStatus(_TestWithSubrepoAndEventLoop):
+    """
+    Tests for `status`.
+    """
+    def test_status_of_git_directory(self):
+        self.assertRaises(NotAGitSubrepoException, self.run_until_complete, aio.status(self.git_directory))
+
+    def test_status_in_non_git_repository(self):
+        self.assertRaises(NotAGitRepositoryException, self.run_until_complete, aio.status(self.temp_directory))
+
+    def test_status_read_off_event_loop(self):
+        self.run_until_complete(aio.clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH))
+        threads = []
+
+        def read_status(directory):
+            threads.append(threading.current_thread())
+            return _read_status(directory)
+
+        with patch.object(aio, "_read_status", read_status):
+            self.run_until_complete(aio.status(self.subrepo_directory))
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.main_thread(), threads[0])
+
+    def test_status(self):
+        self.run_until_complete(aio.clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH))
+        for native in (True, False):
+            url, branch, commit = self.run_until_complete(aio.status(self.subrepo_directory, native=native))
+            self.assertEqual((self.external_git_repository, TEST_BRANCH, TEST_BRANCH_COMMIT), (url, branch, commit))
+
+
+class TestPull(_TestWithSubrepoAndEventLoop):
+    """
+    Tests for `pull`.
+    """
+    def test_pull_of_non_existent_directory(self):
+        self.assertRaises(ValueError, self.run_until_complete, aio.pull(self.subrepo_directory))
+
+    def test_pull_when_up_to_date(self):
+        self.git_repository_client.index.commit("Initial commit")
+        self.run_until_complete(aio.clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH))
+        self.assertEqual(TEST_BRANCH_COMMIT, self.run_until_complete(aio.pull(self.subrepo_directory)))
+
+
+class TestRunSteps(_TestWithSubrepoAndEventLoop):
+    """
+    Tests for `_run_steps`.
+    """
+    def test_run_steps(self):
+        def steps():
+            first = yield Command(["echo", "a"])
+            try:
+                yield Command(["false"])
+            except RunException:
+                second = yield Command(["echo", "b"])
+            return first + second
+
+        self.assertEqual("ab", self.run_until_complete(aio._run_steps(steps(), None)))
+
+    def test_delay_does_not_block_event_loop(self):
+        def steps():
+            yield Delay(0.2)
+            return time.monotonic()
+
+        async def run_with_other_task():
+            other = asyncio.ensure_future(asyncio.sleep(0.05))
+            finished_at = await aio._run_steps(steps(), None)
+            self.assertTrue(other.done())
+            return finished_at
+
+        started_at = time.monotonic()
+        self.assertGreaterEqual(self.run_until_complete(run_with_other_task()) - started_at, 0.2)
+
+    def test_steps_closed_when_timed_out(self):
+        closed = []
+
+        def steps():
+            try:
+                while True:
+                    yield Delay(0.05)
+            finally:
+                closed.append(True)
+
+        self.assertRaises(asyncio.TimeoutError, self.run_until_complete, aio._run_steps(steps(), 0.2))
+        self.assertEqual([True], closed)
+
+    def test_timeout_kills_process(self):
+        pid_file = os.path.join(self.temp_directory, "pid")
+
+        def steps():
+            yield Command(["sh", "-c", f"sleep 30 & echo $! > {pid_file}; wait"])
+
+        started_at = time.monotonic()
+        self.assertRaises(asyncio.TimeoutError, self.run_until_complete, aio._run_steps(steps(), 0.5))
+        self.assertLess(time.monotonic() - started_at, 10)
+        with open(pid_file) as file:
+            pid = int(file.read())
+        time.sleep(0.1)
+        self.assertFalse(_is_running(pid))
+
+
+if __name__ == "__main__":
+    unittest.main()
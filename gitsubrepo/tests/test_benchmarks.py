@@ -0,0 +1,90 @@
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from benchmarks.repositories import create_upstream, add_upstream_commit, UPSTREAM_BRANCH
+from benchmarks import suite
+from benchmarks.suite import BENCHMARKS, run_suite, compare, is_available
+
+
+class TestRepositories(unittest.TestCase):
+    """
+    Tests for the generation of synthetic repositories for benchmarks.
+    """
+    def setUp(self):
+        self.temp_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_directory)
+
+    def _git(self, directory: str, *arguments: str) -> str:
+        return subprocess.run(["git", *arguments], cwd=directory, check=True, stdout=subprocess.PIPE,
+                              universal_newlines=True).stdout.strip()
+
+    def test_create_upstream(self):
+        upstream = create_upstream(f"{self.temp_directory}/upstream.git", commits=20, files=150, file_size=100)
+        self.assertEqual("20", self._git(upstream, "rev-list", "--count", UPSTREAM_BRANCH))
+        self.assertEqual(150, len(self._git(upstream, "ls-tree", "-r", "--name-only", UPSTREAM_BRANCH).splitlines()))
+
+    def test_add_upstream_commit(self):
+        upstream = create_upstream(f"{self.temp_directory}/upstream.git", commits=2, files=2, file_size=10)
+        add_upstream_commit(upstream, 100)
+        self.assertEqual("3", self._git(upstream, "rev-list", "--count", UPSTREAM_BRANCH))
+
+
+class TestSuite(unittest.TestCase):
+    """
+    Tests for the benchmark suite.
+    """
+    def setUp(self):
+        self.temp_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_directory)
+
+    def test_run_suite(self):
+        report = run_suite(self.temp_directory, subrepo_counts=[2], upstreams=2, commits=3, files=3, file_size=1000,
+                           repetitions=1, label="test")
+        self.assertEqual("test", report["label"])
+        self.assertEqual([benchmark.name for benchmark in BENCHMARKS],
+                         [result["benchmark"] for result in report["results"]])
+        results = {result["benchmark"]: result for result in report["results"]}
+        self.assertEqual(0, results["status"]["spawn_count"])
+        self.assertEqual({"git ls-files": 1}, results["status_all"]["spawn_counts"])
+        self.assertGreater(results["clone"]["peak_memory"], 0)
+        self.assertGreater(results["clone_fresh"]["received_bytes"], results["clone_fresh_shallow"]["received_bytes"])
+        self.assertGreater(results["clone_fresh"]["received_bytes"], results["clone_fresh_partial"]["received_bytes"])
+        self.assertEqual(1, results["clone_commit"]["upstream_connections"])
+        self.assertEqual(2, results["check_for_updates"]["upstream_connections"])
+
+        comparisons = compare(report, report)
+        self.assertEqual(len(BENCHMARKS), len(comparisons))
+        self.assertTrue(all(comparison["spawn_count_change"] == 0 for comparison in comparisons))
+
+    def test_run_suite_without_features(self):
+        unavailable = {"pull_many", "clone.native", "ProcessStatistics"}
+        with patch.object(suite, "is_available", side_effect=lambda feature: feature not in unavailable):
+            report = run_suite(self.temp_directory, subrepo_counts=[1], upstreams=1, commits=2, files=2,
+                               file_size=10, repetitions=1, names=["status", "pull_many"], label="test")
+        self.assertFalse(report["parameters"]["native"])
+        results = {result["benchmark"]: result for result in report["results"]}
+        self.assertEqual(["pull_many"], results["pull_many"]["unsupported"])
+        self.assertNotIn("latency", results["pull_many"])
+        self.assertIsNone(results["status"]["spawn_count"])
+
+        comparisons = {comparison["benchmark"]: comparison for comparison in compare(report, report)}
+        self.assertIsNone(comparisons["pull_many"]["latency_ratio"])
+        self.assertIsNone(comparisons["status"]["spawn_count_change"])
+        self.assertEqual(0, comparisons["status"]["peak_memory_change"])
+
+    def test_is_available(self):
+        self.assertTrue(is_available("pull_many"))
+        self.assertTrue(is_available("clone.depth"))
+        self.assertFalse(is_available("clone.non_existent"))
+        self.assertFalse(is_available("non_existent"))
+
+
+if __name__ == "__main__":
+    unittest.main()
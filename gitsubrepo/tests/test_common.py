@@ -0,0 +1,177 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from gitsubrepo._common import run, OutputCollector, STDOUT, STDERR, run_steps, Command, Delay, _MAXIMUM_LINE_LENGTH
+from gitsubrepo.exceptions import RunException, RunTimeoutException, GitLockException
+
+_GIT_LOCK_ERROR = "fatal: Unable to create '/repository/.git/index.lock': File exists."
+
+
+class TestRun(unittest.TestCase):
+    """
+    Tests for `run`.
+    """
+    def test_run(self):
+        self.assertEqual("hello", run(["echo", "hello"]))
+
+    def test_run_failure(self):
+        try:
+            run(["sh", "-c", "echo out; echo error >&2; exit 1"])
+            self.fail("Expected exception")
+        except RunException as e:
+            self.assertEqual("out", e.stdout)
+            self.assertEqual("error", e.stderr)
+
+    def test_run_failure_on_git_lock(self):
+        try:
+            run(["sh", "-c", f"echo \"{_GIT_LOCK_ERROR}\" >&2; exit 128"])
+            self.fail("Expected exception")
+        except GitLockException as e:
+            self.assertEqual("/repository/.git/index.lock", e.lock_path)
+
+    def test_run_with_output_callback(self):
+        lines = []
+        run(["sh", "-c", "echo a; echo b >&2; printf c"],
+            output_callback=lambda stream, line: lines.append((stream, line)))
+        self.assertEqual([(STDOUT, "a"), (STDOUT, "c")], [line for line in lines if line[0] == STDOUT])
+        self.assertIn((STDERR, "b"), lines)
+
+    def test_run_keeps_end_of_large_stderr(self):
+        try:
+            run(["sh", "-c", "seq 1 100000 >&2; exit 1"])
+            self.fail("Expected exception")
+        except RunException as e:
+            self.assertTrue(e.stderr.endswith("100000"))
+            self.assertNotIn("\n1\n", e.stderr)
+
+    def test_run_keeps_long_nul_delimited_output_unchanged(self):
+        stdout = run([sys.executable, "-c", "import sys; sys.stdout.write('a/.gitrepo\\0' * 10000)"])
+        self.assertEqual(["a/.gitrepo"] * 10000, stdout.split("\0")[:-1])
+
+    def test_run_without_capturing_stdout(self):
+        stdout = run(["seq", "1", "100000"], capture_stdout=False)
+        self.assertTrue(stdout.endswith("\n100000"))
+        self.assertLess(len(stdout.splitlines()), 100000)
+
+    def test_run_with_timeout(self):
+        started_at = time.monotonic()
+        self.assertRaises(RunTimeoutException, run, ["sh", "-c", "echo started; sleep 30"], timeout=0.5)
+        self.assertLess(time.monotonic() - started_at, 10)
+
+    def test_run_ignoring_terminate_with_timeout(self):
+        started_at = time.monotonic()
+        self.assertRaises(RunTimeoutException, run, ["sh", "-c", "trap '' TERM; sleep 30"], timeout=0.5)
+        self.assertLess(time.monotonic() - started_at, 15)
+
+
+class TestRunSteps(unittest.TestCase):
+    """
+    Tests for `run_steps`.
+    """
+    def test_run_steps(self):
+        def steps():
+            first = yield Command(["echo", "a"])
+            try:
+                yield Command(["false"])
+            except RunException:
+                second = yield Command(["echo", "b"])
+            return first + second
+
+        self.assertEqual("ab", run_steps(steps()))
+
+    def test_run_steps_with_timeout(self):
+        def steps():
+            yield Command(["sleep", "0.4"])
+            yield Command(["sleep", "0.4"])
+
+        self.assertRaises(RunTimeoutException, run_steps, steps(), timeout=0.6)
+
+    def test_run_steps_with_delay(self):
+        def steps():
+            started_at = time.monotonic()
+            yield Delay(0.2)
+            return time.monotonic() - started_at
+
+        self.assertGreaterEqual(run_steps(steps()), 0.2)
+
+    def test_run_steps_with_timeout_during_delay(self):
+        def steps():
+            while True:
+                yield Delay(10)
+
+        started_at = time.monotonic()
+        self.assertRaises(RunTimeoutException, run_steps, steps(), timeout=0.3)
+        self.assertLess(time.monotonic() - started_at, 5)
+
+
+class TestRunStepsRetry(unittest.TestCase):
+    """
+    Tests for `run_steps` retrying commands that fail because one of git's lock files exists.
+    """
+    def setUp(self):
+        self.temp_directory = tempfile.mkdtemp()
+        # Fails as if locked until it has ran the given number of times
+        self.arguments = ["sh", "-c", f"echo >> runs; [ $(wc -l < runs) -gt \"$0\" ] || "
+                                      f"{{ echo \"{_GIT_LOCK_ERROR}\" >&2; exit 128; }}"]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_directory)
+
+    def _get_runs(self) -> int:
+        with open(os.path.join(self.temp_directory, "runs")) as file:
+            return len(file.readlines())
+
+    def test_retry_if_locked(self):
+        def steps():
+            return (yield Command(self.arguments + ["2"], self.temp_directory, retry_if_locked=True))
+
+        run_steps(steps())
+        self.assertEqual(3, self._get_runs())
+
+    def test_no_retry_if_not_retryable(self):
+        def steps():
+            yield Command(self.arguments + ["2"], self.temp_directory)
+
+        self.assertRaises(GitLockException, run_steps, steps())
+        self.assertEqual(1, self._get_runs())
+
+    def test_retries_give_up(self):
+        def steps():
+            yield Command(self.arguments + ["100"], self.temp_directory, retry_if_locked=True)
+
+        self.assertRaises(GitLockException, run_steps, steps(), timeout=0.5)
+        self.assertLess(self._get_runs(), 100)
+
+
+class TestOutputCollector(unittest.TestCase):
+    """
+    Tests for `OutputCollector`.
+    """
+    def test_decodes_characters_split_across_reads(self):
+        lines = []
+        collector = OutputCollector(lambda stream, line: lines.append(line))
+        data = "ünïcödé\n".encode("utf-8")
+        for i in range(len(data)):
+            collector.feed(STDOUT, data[i:i + 1])
+        collector.close(STDOUT)
+        self.assertEqual(["ünïcödé"], lines)
+        self.assertEqual("ünïcödé", collector.stdout)
+
+    def test_keeps_long_lines_unchanged(self):
+        lines = []
+        collector = OutputCollector(lambda stream, line: lines.append(line))
+        data = b"a/.gitrepo\0" * 10000
+        for i in range(0, len(data), 4096):
+            collector.feed(STDOUT, data[i:i + 4096])
+        collector.close(STDOUT)
+        self.assertEqual(data.decode(), collector.stdout)
+        self.assertLessEqual(max(map(len, lines)), _MAXIMUM_LINE_LENGTH + 4096)
+        self.assertEqual(data.decode(), "".join(lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
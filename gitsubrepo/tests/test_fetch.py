@@ -0,0 +1,67 @@
+import os
+import unittest
+from pathlib import Path
+
+from gitsubrepo._fetch import FetchOptions, fetch_steps, get_fetch_options
+from gitsubrepo.exceptions import RunException
+
+_LOCATION = "https://example.com/repository.git"
+_REFSPEC = "+master:refs/test/fetch"
+
+
+class TestGetFetchOptions(unittest.TestCase):
+    """
+    Tests for `get_fetch_options`.
+    """
+    def test_get_fetch_options(self):
+        self.assertEqual(["--depth=1", "--filter=blob:none"], get_fetch_options(1, "blob:none").get_arguments())
+        self.assertEqual([], get_fetch_options(None, None).get_arguments())
+
+    def test_get_fetch_options_with_invalid_depth(self):
+        self.assertRaises(ValueError, get_fetch_options, 0, None)
+
+
+class TestFetchSteps(unittest.TestCase):
+    """
+    Tests for `fetch_steps`.
+    """
+    def _reject(self, steps, stderr: str):
+        command = next(steps)
+        return steps.throw(RunException("", stderr, command.arguments, command.execution_directory))
+
+    def test_fetch(self):
+        steps = fetch_steps(_LOCATION, [_REFSPEC], "/", FetchOptions(depth=2), arguments=["--no-tags"])
+        command = next(steps)
+        self.assertEqual(["fetch", "--no-tags", "--depth=2", _LOCATION, _REFSPEC], command.arguments[1:])
+        self.assertTrue(command.retry_if_locked)
+        with self.assertRaises(StopIteration) as context:
+            steps.send("output")
+        self.assertEqual("output", context.exception.value)
+
+    def test_fetch_when_shallow_unsupported(self):
+        steps = fetch_steps(_LOCATION, [_REFSPEC], "/", FetchOptions(depth=1, filter="blob:none"))
+        command = self._reject(steps, "fatal: Server does not support shallow clients")
+        self.assertEqual(["fetch", "--filter=blob:none", _LOCATION, _REFSPEC], command.arguments[1:])
+
+    def test_fetch_when_filter_unsupported(self):
+        steps = fetch_steps(_LOCATION, [_REFSPEC], "/", FetchOptions(depth=1, filter="sparse:oid=x"))
+        command = self._reject(steps, "fatal: filter 'sparse' not supported")
+        self.assertEqual(["fetch", "--depth=1", _LOCATION, _REFSPEC], command.arguments[1:])
+
+    def test_fetch_when_shallow_file_changed(self):
+        steps = fetch_steps(_LOCATION, [_REFSPEC], "/", FetchOptions(depth=1))
+        command = self._reject(steps, "fatal: shallow file has changed since we read it")
+        self.assertEqual(["fetch", "--depth=1", _LOCATION, _REFSPEC], command.arguments[1:])
+
+    def test_fetch_failure(self):
+        steps = fetch_steps(_LOCATION, [_REFSPEC], "/", FetchOptions(depth=1))
+        self.assertRaises(RunException, self._reject, steps, "fatal: repository not found")
+
+    def test_filtered_fetch_of_local_path(self):
+        directory = os.path.dirname(os.path.realpath(__file__))
+        steps = fetch_steps(directory, [_REFSPEC], "/", FetchOptions(filter="blob:none"))
+        self.assertEqual(Path(directory).as_uri(), next(steps).arguments[-2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from git import Repo
+
+from gitsubrepo import _git
+from gitsubrepo._common import run
+from gitsubrepo._git import get_git_root_directory, get_directory_relative_to_git_root, clear_git_root_cache
+from gitsubrepo.exceptions import NotAGitRepositoryException
+
+
+class TestGetGitRootDirectory(unittest.TestCase):
+    """
+    Tests for `get_git_root_directory`.
+    """
+    def setUp(self):
+        clear_git_root_cache()
+        self.temp_directory = os.path.realpath(tempfile.mkdtemp())
+        self.git_directory = os.path.join(self.temp_directory, "git-directory")
+        self.git_repository_client = Repo.init(self.git_directory)
+        self.sub_directory = os.path.join(self.git_directory, "a", "b")
+        os.makedirs(self.sub_directory)
+
+    def tearDown(self):
+        clear_git_root_cache()
+        shutil.rmtree(self.temp_directory)
+
+    def test_in_non_git_directory(self):
+        self.assertRaises(NotAGitRepositoryException, get_git_root_directory, self.temp_directory)
+
+    def test_in_git_root(self):
+        self.assertEqual(self.git_directory, get_git_root_directory(self.git_directory))
+
+    def test_in_sub_directory(self):
+        self.assertEqual(self.git_directory, get_git_root_directory(self.sub_directory))
+        self.assertEqual(os.path.join("a", "b"), get_directory_relative_to_git_root(self.sub_directory))
+
+    def test_through_symlink(self):
+        symlink = os.path.join(self.temp_directory, "link")
+        os.symlink(self.sub_directory, symlink)
+        self.assertEqual(self.git_directory, get_git_root_directory(symlink))
+
+    def test_matches_git(self):
+        for directory in (self.git_directory, self.sub_directory):
+            self.assertEqual(run(["git", "rev-parse", "--show-toplevel"], directory), get_git_root_directory(directory))
+
+    def test_does_not_use_git(self):
+        with patch.object(_git, "run") as mock_run:
+            get_git_root_directory(self.sub_directory)
+            mock_run.assert_not_called()
+
+    def test_in_worktree(self):
+        Repo(self.git_directory).index.commit("Initial commit")
+        worktree = os.path.join(self.temp_directory, "worktree")
+        run(["git", "worktree", "add", worktree], self.git_directory)
+        self.assertTrue(os.path.isfile(os.path.join(worktree, ".git")))
+        self.assertEqual(worktree, get_git_root_directory(worktree))
+
+    def test_with_ceiling_directory(self):
+        with patch.dict(os.environ, {"GIT_CEILING_DIRECTORIES": os.path.join(self.git_directory, "a")}):
+            self.assertRaises(NotAGitRepositoryException, get_git_root_directory, self.sub_directory)
+        self.assertEqual(self.git_directory, get_git_root_directory(self.sub_directory))
+
+    def test_with_git_dir(self):
+        other_git_directory = os.path.join(self.temp_directory, "other")
+        Repo.init(other_git_directory)
+        with patch.dict(os.environ, {"GIT_DIR": os.path.join(other_git_directory, ".git")}):
+            self.assertEqual(run(["git", "rev-parse", "--show-toplevel"], self.sub_directory),
+                             get_git_root_directory(self.sub_directory))
+
+    def test_cached_root_invalidated_when_removed(self):
+        nested = os.path.join(self.temp_directory, "nested")
+        os.makedirs(nested)
+        Repo.init(nested)
+        self.assertEqual(nested, get_git_root_directory(nested))
+        shutil.rmtree(os.path.join(nested, ".git"))
+        self.assertRaises(NotAGitRepositoryException, get_git_root_directory, nested)
+
+    def test_cached_root_invalidated_by_nested_repository(self):
+        self.assertEqual(self.git_directory, get_git_root_directory(self.sub_directory))
+        nested = os.path.join(self.git_directory, "a")
+        Repo.init(nested)
+        self.assertEqual(nested, get_git_root_directory(self.sub_directory))
+        self.assertEqual(self.git_directory, get_git_root_directory(self.git_directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
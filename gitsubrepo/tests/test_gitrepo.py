@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gitsubrepo._gitrepo import parse_gitrepo, read_gitrepo, get_gitrepo_path, format_gitrepo, update_gitrepo
+from gitsubrepo.exceptions import NotAGitSubrepoException
+from gitsubrepo.tests._resources.information import TEST_COMMIT, TEST_COMMIT_2
+
+_EXAMPLE_GITREPO = f"""; DO NOT EDIT (unless you know what you are doing)
+;
+; This subdirectory is a git "subrepo", and this file is maintained by the
+; git-subrepo command. See https://github.com/ingydotnet/git-subrepo#readme
+;
+[subrepo]
+	remote = https://github.com/colin-nolan/test-repository.git
+	branch = develop
+	commit = {TEST_COMMIT}
+	parent = {TEST_COMMIT_2}
+	method = merge
+	cmdver = 0.4.6
+"""
+
+
+class TestParseGitRepo(unittest.TestCase):
+    """
+    Tests for `parse_gitrepo`.
+    """
+    def test_parse(self):
+        gitrepo = parse_gitrepo(_EXAMPLE_GITREPO)
+        self.assertEqual("https://github.com/colin-nolan/test-repository.git", gitrepo.remote)
+        self.assertEqual("develop", gitrepo.branch)
+        self.assertEqual(TEST_COMMIT, gitrepo.commit)
+        self.assertEqual(TEST_COMMIT_2, gitrepo.parent)
+        self.assertEqual("merge", gitrepo.method)
+        self.assertEqual("0.4.6", gitrepo.cmdver)
+
+    def test_parse_without_optional_keys(self):
+        gitrepo = parse_gitrepo(f"[subrepo]\n\tremote = ../remote\n\tbranch = master\n\tcommit = {TEST_COMMIT}\n")
+        self.assertEqual("../remote", gitrepo.remote)
+        self.assertIsNone(gitrepo.method)
+
+    def test_parse_quoted_values(self):
+        gitrepo = parse_gitrepo(f"[subrepo]\n\tremote = \"/some path/with # hash\" ; comment\n"
+                                f"\tbranch = a\\\\b\n\tcommit = {TEST_COMMIT}\n")
+        self.assertEqual("/some path/with # hash", gitrepo.remote)
+        self.assertEqual("a\\b", gitrepo.branch)
+
+    def test_parse_without_subrepo_section(self):
+        self.assertRaises(NotAGitSubrepoException, parse_gitrepo, "[core]\n\tbare = false\n")
+
+
+class TestFormatGitRepo(unittest.TestCase):
+    """
+    Tests for `format_gitrepo`.
+    """
+    def test_format(self):
+        self.assertEqual(_EXAMPLE_GITREPO, format_gitrepo(parse_gitrepo(_EXAMPLE_GITREPO)))
+
+    def test_format_quoted_values(self):
+        gitrepo = parse_gitrepo(f"[subrepo]\n\tremote = \"/some path/with # hash\"\n\tbranch = a\\\\b\n"
+                                f"\tcommit = {TEST_COMMIT}\n")
+        self.assertEqual(gitrepo, parse_gitrepo(format_gitrepo(gitrepo)))
+
+
+class TestUpdateGitRepo(unittest.TestCase):
+    """
+    Tests for `update_gitrepo`.
+    """
+    def test_update(self):
+        updated = update_gitrepo(_EXAMPLE_GITREPO, commit=TEST_COMMIT_2, parent=None)
+        self.assertEqual(_EXAMPLE_GITREPO.replace(f"commit = {TEST_COMMIT}", f"commit = {TEST_COMMIT_2}"), updated)
+
+    def test_update_adds_missing_values(self):
+        updated = update_gitrepo(f"[subrepo]\n\tremote = ../remote\n\tbranch = master\n", commit=TEST_COMMIT,
+                                 method="merge")
+        self.assertEqual(f"[subrepo]\n\tremote = ../remote\n\tbranch = master\n\tcommit = {TEST_COMMIT}\n"
+                         f"\tmethod = merge\n", updated)
+
+
+class TestReadGitRepo(unittest.TestCase):
+    """
+    Tests for `read_gitrepo`.
+    """
+    def setUp(self):
+        self.temp_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_directory)
+
+    def test_read(self):
+        with open(get_gitrepo_path(self.temp_directory), "w") as file:
+            file.write(_EXAMPLE_GITREPO)
+        self.assertEqual(TEST_COMMIT, read_gitrepo(self.temp_directory).commit)
+
+    def test_read_when_no_gitrepo(self):
+        self.assertRaises(NotAGitSubrepoException, read_gitrepo, os.path.join(self.temp_directory, "missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
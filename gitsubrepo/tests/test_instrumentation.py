@@ -0,0 +1,126 @@
+import asyncio
+import os
+import unittest
+
+from git import Repo
+
+from gitsubrepo import aio
+from gitsubrepo._common import run
+from gitsubrepo._instrumentation import ProcessRecorder, ProcessStatistics, get_command_name, add_process_hook, \
+    remove_process_hook, get_current_operation, LATENCY_BUCKETS
+from gitsubrepo._object_reader import ObjectReader
+from gitsubrepo.exceptions import RunException
+from gitsubrepo.subrepo import clone, status_all, pull_many
+from gitsubrepo.tests._resources.information import TEST_BRANCH, TEST_TAG
+from gitsubrepo.tests.test_subrepo import _TestWithSubrepo
+
+
+class TestGetCommandName(unittest.TestCase):
+    """
+    Tests for `get_command_name`.
+    """
+    def test_git_command(self):
+        self.assertEqual("git ls-files", get_command_name(["git", "ls-files", "-z", "--", "**/.gitrepo"]))
+
+    def test_git_command_with_options(self):
+        self.assertEqual("git fetch", get_command_name(["/usr/bin/git", "-c", "gc.auto=0", "fetch", "origin"]))
+
+    def test_git_subrepo_command(self):
+        self.assertEqual("git subrepo pull", get_command_name(["git", "subrepo", "pull", "-v", "directory"]))
+
+    def test_other_command(self):
+        self.assertEqual("sh", get_command_name(["sh", "-c", "exit 0"]))
+
+
+class TestProcessHooks(unittest.TestCase):
+    """
+    Tests for process hooks.
+    """
+    def test_hook_called(self):
+        records = []
+        add_process_hook(records.append)
+        try:
+            run(["sh", "-c", "printf 123; printf 45 >&2"])
+        finally:
+            remove_process_hook(records.append)
+        run(["true"])
+        self.assertEqual(1, len(records))
+        self.assertEqual(["sh", "-c", "printf 123; printf 45 >&2"], records[0].arguments)
+        self.assertEqual(0, records[0].return_code)
+        self.assertEqual((3, 2), (records[0].stdout_size, records[0].stderr_size))
+        self.assertGreaterEqual(records[0].duration, 0.0)
+        self.assertIsNone(records[0].operation)
+
+    def test_hook_called_on_failure(self):
+        with ProcessRecorder() as recorder:
+            self.assertRaises(RunException, run, ["sh", "-c", "exit 3"])
+        self.assertEqual([3], [record.return_code for record in recorder.records])
+
+    def test_statistics(self):
+        with ProcessStatistics() as statistics:
+            run(["true"])
+            run(["true"])
+            run(["sh", "-c", "exit 0"])
+        self.assertEqual({"true": 2, "sh": 1}, statistics.spawn_counts)
+        self.assertEqual(3, statistics.total_spawn_count)
+        self.assertEqual(len(LATENCY_BUCKETS) + 1, len(statistics.latency_histograms["true"]))
+        self.assertEqual(2, sum(statistics.latency_histograms["true"]))
+        self.assertEqual({"true", "sh"}, set(statistics.total_durations.keys()))
+        statistics.reset()
+        self.assertEqual(0, statistics.total_spawn_count)
+
+
+class TestOperations(_TestWithSubrepo):
+    """
+    Tests for the grouping of processes under the operations that spawned them.
+    """
+    def test_processes_grouped_by_operation(self):
+        with ProcessRecorder() as recorder:
+            clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+            status_all(self.git_directory)
+        operations = list(recorder.get_records_by_operation().keys())
+        self.assertEqual(["clone", "status_all"], [operation.name for operation in operations])
+        self.assertIsNone(get_current_operation())
+
+    def test_processes_in_threads_grouped_by_operation(self):
+        self.git_repository_client.index.commit("Initial commit")
+        other_subrepo_directory = os.path.join(self.git_directory, "other")
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        clone(self.external_git_repository, other_subrepo_directory, tag=TEST_TAG)
+        with ProcessStatistics() as statistics, ProcessRecorder() as recorder:
+            pull_many([self.subrepo_directory, other_subrepo_directory], max_workers=2)
+        self.assertEqual(["pull_many"], [operation.name for operation in recorder.get_records_by_operation()])
+        self.assertEqual(2, statistics.spawn_counts["git fetch"])
+
+    def test_object_reader_recorded(self):
+        Repo(self.git_directory).index.commit("Initial commit")
+        with ProcessRecorder() as recorder:
+            with ObjectReader(self.git_directory) as object_reader:
+                object_reader.read("HEAD")
+                object_reader.read("HEAD")
+                self.assertNotIn("git cat-file", _get_command_names(recorder))
+        self.assertEqual(["git cat-file"], _get_command_names(recorder))
+        self.assertGreater(recorder.records[-1].stdout_size, 0)
+
+    def test_async_processes_grouped_by_operation(self):
+        async def run_operations():
+            await aio.clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+            await asyncio.gather(aio.status(self.subrepo_directory, native=False),
+                                 aio.status(self.subrepo_directory, native=False))
+
+        loop = asyncio.new_event_loop()
+        try:
+            with ProcessRecorder() as recorder:
+                loop.run_until_complete(run_operations())
+        finally:
+            loop.close()
+        operations = recorder.get_records_by_operation()
+        self.assertEqual(["clone", "status", "status"], sorted(operation.name for operation in operations))
+
+def _get_command_names(recorder: ProcessRecorder):
+    return [get_command_name(record.arguments) for record in recorder.records
+            if get_command_name(record.arguments) != "git"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gitsubrepo._common import Delay
+from gitsubrepo._lock import FileLock, poll_steps
+
+
+class TestFileLock(unittest.TestCase):
+    """
+    Tests for `FileLock`.
+    """
+    def setUp(self):
+        self.temp_directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_directory, "test.lock")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_directory)
+
+    def test_exclusive_lock_excludes(self):
+        with FileLock(self.path):
+            other = FileLock(self.path)
+            self.assertFalse(other.acquire(blocking=False))
+            self.assertFalse(other.locked)
+            self.assertFalse(other.acquire(shared=True, blocking=False))
+
+    def test_shared_locks_are_shared(self):
+        lock, other = FileLock(self.path), FileLock(self.path)
+        self.assertTrue(lock.acquire(shared=True))
+        self.assertTrue(other.acquire(shared=True, blocking=False))
+        self.assertFalse(FileLock(self.path).acquire(blocking=False))
+        lock.release()
+        other.release()
+        self.assertTrue(FileLock(self.path).acquire(blocking=False))
+
+    def test_lock_can_be_downgraded(self):
+        lock = FileLock(self.path)
+        lock.acquire()
+        lock.acquire(shared=True)
+        self.assertTrue(FileLock(self.path).acquire(shared=True, blocking=False))
+        lock.release()
+        self.assertFalse(lock.locked)
+
+    def test_acquire_steps_poll_whilst_held(self):
+        lock = FileLock(self.path)
+        lock.acquire()
+        other = FileLock(self.path)
+        steps = other.acquire_steps()
+        self.assertIsInstance(next(steps), Delay)
+        self.assertIsInstance(steps.send(None), Delay)
+        lock.release()
+        self.assertRaises(StopIteration, steps.send, None)
+        self.assertTrue(other.locked)
+        other.release()
+
+
+class TestPollSteps(unittest.TestCase):
+    """
+    Tests for `poll_steps`.
+    """
+    def test_poll_until_condition_holds(self):
+        results = iter([False, False, True])
+        steps = poll_steps(lambda: next(results))
+        delays = [next(steps).seconds, steps.send(None).seconds]
+        self.assertLess(delays[0], delays[1])
+        with self.assertRaises(StopIteration) as context:
+            steps.send(None)
+        self.assertTrue(context.exception.value)
+
+    def test_poll_with_timeout(self):
+        steps = poll_steps(lambda: False, timeout=0)
+        with self.assertRaises(StopIteration) as context:
+            next(steps)
+        self.assertFalse(context.exception.value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+from io import StringIO
+from pathlib import Path
+from typing import List, Tuple
+
+from git import Repo
+
+from gitsubrepo.__main__ import main
+from gitsubrepo._remote import clear_remote_references_cache
+from gitsubrepo.subrepo import clone
+from gitsubrepo.tests._resources.information import TEST_BRANCH, TEST_BRANCH_COMMIT, TEST_COMMIT_2
+from gitsubrepo.tests.test_subrepo import _TestWithSubrepo
+
+
+class TestMain(_TestWithSubrepo):
+    """
+    Tests for the `gitsubrepo` command.
+    """
+    def setUp(self):
+        super().setUp()
+        clear_remote_references_cache()
+        self.git_repository_client.index.commit("Initial commit")
+        self.mutable_remote = os.path.join(self.temp_directory, "mutable-remote")
+        Repo(self.external_git_repository).clone(self.mutable_remote)
+        self.other_subrepo_directory = os.path.join(self.git_directory, "other")
+        clone(self.mutable_remote, self.subrepo_directory, branch=Repo(self.mutable_remote).active_branch.name)
+        clone(self.external_git_repository, self.other_subrepo_directory, branch=TEST_BRANCH)
+
+    def tearDown(self):
+        clear_remote_references_cache()
+        super().tearDown()
+
+    def _main(self, *arguments: str) -> Tuple[int, List[str], str]:
+        stdout, stderr = StringIO(), StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            exit_code = main(list(arguments))
+        return exit_code, stdout.getvalue().splitlines(), stderr.getvalue()
+
+    def _commit_to_remote(self) -> str:
+        Path(os.path.join(self.mutable_remote, "example-file")).touch()
+        index = Repo(self.mutable_remote).index
+        index.add(["example-file"])
+        return index.commit("New commit").hexsha
+
+    def test_help_does_not_import_library(self):
+        output = subprocess.run(
+            [sys.executable, "-c", "import sys; from gitsubrepo.__main__ import main\n"
+                                   "try:\n    main(['--help'])\nexcept SystemExit:\n    pass\n"
+                                   "print('gitsubrepo.subrepo' in sys.modules, 'typing' in sys.modules)"],
+            stdout=subprocess.PIPE, universal_newlines=True, check=True,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))).stdout
+        self.assertEqual("False False", output.splitlines()[-1])
+
+    def test_status(self):
+        exit_code, lines, _ = self._main("status", self.other_subrepo_directory)
+        self.assertEqual(0, exit_code)
+        self.assertEqual(
+            [f"{self.other_subrepo_directory}\t{TEST_BRANCH_COMMIT}\t{TEST_BRANCH}\t{self.external_git_repository}"],
+            lines)
+
+    def test_status_all_as_json(self):
+        exit_code, lines, _ = self._main("status", "--all", "--json", self.git_directory)
+        self.assertEqual(0, exit_code)
+        statuses = {line["directory"]: line for line in map(json.loads, lines)}
+        self.assertEqual({self.subrepo_directory, self.other_subrepo_directory}, set(statuses))
+        self.assertEqual(TEST_COMMIT_2, statuses[self.subrepo_directory]["commit"])
+        self.assertEqual(TEST_BRANCH, statuses[self.other_subrepo_directory]["branch"])
+
+    def test_status_of_non_subrepo(self):
+        non_existent_directory = os.path.join(self.git_directory, "non-existent")
+        exit_code, lines, stderr = self._main("status", non_existent_directory)
+        self.assertEqual(1, exit_code)
+        self.assertEqual([], lines)
+        self.assertIn(f"{non_existent_directory}: error:", stderr)
+
+    def test_pull_all(self):
+        new_commit = self._commit_to_remote()
+        exit_code, lines, _ = self._main("pull", "--all", "--jobs", "2", "--json", self.git_directory)
+        self.assertEqual(0, exit_code)
+        self.assertEqual([{"directory": self.other_subrepo_directory, "commit": TEST_BRANCH_COMMIT},
+                          {"directory": self.subrepo_directory, "commit": new_commit[0:7]}],
+                         [json.loads(line) for line in lines])
+
+    def test_pull_with_failure(self):
+        non_existent_directory = os.path.join(self.git_directory, "non-existent")
+        exit_code, lines, _ = self._main("pull", "--json", non_existent_directory, self.other_subrepo_directory)
+        self.assertEqual(1, exit_code)
+        results = [json.loads(line) for line in lines]
+        self.assertEqual("ValueError", results[0]["error_type"])
+        self.assertEqual({"directory": self.other_subrepo_directory, "commit": TEST_BRANCH_COMMIT}, results[1])
+
+    def test_outdated(self):
+        new_commit = self._commit_to_remote()
+        exit_code, lines, _ = self._main("outdated", "--exit-code", self.subrepo_directory,
+                                         self.other_subrepo_directory)
+        self.assertEqual(1, exit_code)
+        self.assertEqual([f"{self.subrepo_directory}\t{TEST_COMMIT_2[0:7]}\t{new_commit[0:7]}"], lines)
+
+    def test_outdated_when_up_to_date(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.git_directory)
+        exit_code, lines, _ = self._main("outdated", "--exit-code", "--json")
+        self.assertEqual(0, exit_code)
+        self.assertEqual([], lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
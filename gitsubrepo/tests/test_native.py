@@ -0,0 +1,183 @@
+import os
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from git import Repo
+
+from gitsubrepo._native import set_default_native, _get_subref
+from gitsubrepo.subrepo import clone, pull, status
+from gitsubrepo.tests import test_subrepo
+from gitsubrepo.tests._resources.information import TEST_BRANCH, TEST_TAG, TEST_COMMIT, TEST_COMMIT_BRANCH
+
+_FIXED_DATE_ENVIRONMENT = {"GIT_AUTHOR_DATE": "2017-01-01T00:00:00+0000",
+                           "GIT_COMMITTER_DATE": "2017-01-01T00:00:00+0000"}
+
+
+class _NativeByDefault:
+    """
+    Mixin that runs the tests of a `test_subrepo` test case with subrepos cloned and pulled using git plumbing.
+    """
+    def setUp(self):
+        set_default_native(True)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        set_default_native(False)
+
+
+class TestNativeClone(_NativeByDefault, test_subrepo.TestClone):
+    """
+    Tests for `clone` using git plumbing.
+    """
+    def test_clone_with_output_callback(self):
+        lines = []
+        clone(self.external_git_repository, self.subrepo_directory, output_callback=lambda _, line: lines.append(line))
+        # `git fetch` reports the remote without its ".git" suffix
+        self.assertTrue(any(self.external_git_repository[:-len(".git")] in line for line in lines))
+
+
+class TestNativeCloneWithCache(_NativeByDefault, test_subrepo.TestCloneWithCache):
+    """
+    Tests for `clone` using git plumbing and a mirror cache.
+    """
+
+
+class TestNativeStatus(_NativeByDefault, test_subrepo.TestStatus):
+    """
+    Tests for `status` of subrepos cloned using git plumbing.
+    """
+
+
+class TestNativeStatusAll(_NativeByDefault, test_subrepo.TestStatusAll):
+    """
+    Tests for `status_all` of subrepos cloned using git plumbing.
+    """
+
+
+class TestNativeIsModified(_NativeByDefault, test_subrepo.TestIsModified):
+    """
+    Tests for `is_modified` of subrepos cloned using git plumbing.
+    """
+
+
+class TestNativeChangedSubrepos(_NativeByDefault, test_subrepo.TestChangedSubrepos):
+    """
+    Tests for `changed_subrepos` of subrepos cloned and pulled using git plumbing.
+    """
+
+
+class TestNativePull(_NativeByDefault, test_subrepo.TestPull):
+    """
+    Tests for `pull` using git plumbing.
+    """
+
+
+class TestNativePullMany(_NativeByDefault, test_subrepo.TestPullMany):
+    """
+    Tests for `pull_many` using git plumbing.
+    """
+
+
+class TestNativeCheckForUpdates(_NativeByDefault, test_subrepo.TestCheckForUpdates):
+    """
+    Tests for `check_for_updates` of subrepos cloned using git plumbing.
+    """
+
+
+class TestNativeParity(test_subrepo._TestWithSubrepo):
+    """
+    Tests that cloning and pulling using git plumbing makes the same commits as `git subrepo`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.mutable_remote = os.path.join(self.temp_directory, "mutable-remote")
+        Repo(self.external_git_repository).clone(self.mutable_remote)
+        self.git_directories = {native: os.path.join(self.temp_directory, f"git-directory-{native}")
+                                for native in (False, True)}
+        with patch.dict(os.environ, _FIXED_DATE_ENVIRONMENT):
+            for git_directory in self.git_directories.values():
+                repository = Repo.init(git_directory)
+                Path(os.path.join(git_directory, "example-file")).touch()
+                repository.index.add(["example-file"])
+                repository.git.commit("-m", "Initial commit")
+
+    def _assert_same_commits(self, operation):
+        with patch.dict(os.environ, _FIXED_DATE_ENVIRONMENT):
+            for native, git_directory in self.git_directories.items():
+                operation(os.path.join(git_directory, test_subrepo.TEST_DIRECTORY_NAME), native)
+        heads = {native: Repo(git_directory).head.commit for native, git_directory in self.git_directories.items()}
+        self.assertEqual(heads[False].message, heads[True].message)
+        self.assertEqual(heads[False].tree.hexsha, heads[True].tree.hexsha)
+        self.assertEqual(heads[False].hexsha, heads[True].hexsha)
+        self.assertEqual(*(Path(git_directory, test_subrepo.TEST_DIRECTORY_NAME, ".gitrepo").read_bytes()
+                           for git_directory in self.git_directories.values()))
+
+    def _commit_to_remote(self):
+        Path(os.path.join(self.mutable_remote, "example-file")).touch()
+        index = Repo(self.mutable_remote).index
+        index.add(["example-file"])
+        index.commit("New commit")
+
+    def test_clone_branch(self):
+        self._assert_same_commits(lambda directory, native: clone(
+            self.external_git_repository, directory, branch=TEST_BRANCH, native=native))
+
+    def test_clone_tag(self):
+        self._assert_same_commits(lambda directory, native: clone(
+            self.external_git_repository, directory, tag=TEST_TAG, native=native))
+
+    def test_clone_commit(self):
+        self._assert_same_commits(lambda directory, native: clone(
+            self.external_git_repository, directory, commit=TEST_COMMIT, branch=TEST_COMMIT_BRANCH, native=native))
+
+    def test_pull(self):
+        branch = Repo(self.mutable_remote).active_branch.name
+        self._assert_same_commits(lambda directory, native: clone(
+            self.mutable_remote, directory, branch=branch, native=native))
+        self._commit_to_remote()
+        self._assert_same_commits(lambda directory, native: pull(directory, native=native))
+
+    def test_pull_after_clone_by_other_engine(self):
+        branch = Repo(self.mutable_remote).active_branch.name
+        self._assert_same_commits(lambda directory, native: clone(
+            self.mutable_remote, directory, branch=branch, native=not native))
+        self._commit_to_remote()
+        self._assert_same_commits(lambda directory, native: pull(directory, native=native))
+        self._commit_to_remote()
+        self._assert_same_commits(lambda directory, native: pull(directory, native=not native))
+
+    def test_pull_with_local_changes(self):
+        branch = Repo(self.mutable_remote).active_branch.name
+        self._assert_same_commits(lambda directory, native: clone(
+            self.mutable_remote, directory, branch=branch, native=native))
+        with patch.dict(os.environ, _FIXED_DATE_ENVIRONMENT):
+            for git_directory in self.git_directories.values():
+                Path(os.path.join(git_directory, test_subrepo.TEST_DIRECTORY_NAME, "local-file")).touch()
+                repository = Repo(git_directory)
+                repository.index.add([os.path.join(test_subrepo.TEST_DIRECTORY_NAME, "local-file")])
+                repository.git.commit("-m", "Local change")
+        self._commit_to_remote()
+        for git_directory in self.git_directories.values():
+            subrepo_directory = os.path.join(git_directory, test_subrepo.TEST_DIRECTORY_NAME)
+            pull(subrepo_directory, native=True)
+            self.assertTrue(os.path.exists(os.path.join(subrepo_directory, "local-file")))
+            self.assertTrue(os.path.exists(os.path.join(subrepo_directory, "example-file")))
+            self.assertEqual(Repo(self.mutable_remote).head.commit.hexsha, status(subrepo_directory).full_commit)
+
+
+class TestGetSubref(unittest.TestCase):
+    """
+    Tests for `_get_subref`.
+    """
+    def test_valid_directory(self):
+        self.assertEqual("some/directory", _get_subref("some/directory"))
+
+    def test_directory_requiring_encoding(self):
+        self.assertEqual("%2ehidden/with%20space/a%2e%2eb/c%2elock/d%2e",
+                         _get_subref(".hidden/with space/a..b/c.lock/d."))
+
+
+if __name__ == "__main__":
+    unittest.main()
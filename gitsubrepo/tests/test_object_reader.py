@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from git import Repo
+
+from gitsubrepo._object_reader import ObjectReader
+from gitsubrepo.exceptions import NotAGitRepositoryException
+
+_FILE_NAME = "example-file"
+_FILE_CONTENTS = b"example\ncontents\n\0binary"
+
+
+class TestObjectReader(unittest.TestCase):
+    """
+    Tests for `ObjectReader`.
+    """
+    def setUp(self):
+        self.temp_directory = tempfile.mkdtemp()
+        self.git_directory = os.path.join(self.temp_directory, "git-directory")
+        self.repository = Repo.init(self.git_directory)
+        Path(os.path.join(self.git_directory, _FILE_NAME)).write_bytes(_FILE_CONTENTS)
+        self.repository.index.add([_FILE_NAME])
+        self.repository.index.commit("Initial commit")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_directory)
+
+    def test_reader_outside_git_repository(self):
+        self.assertRaises(NotAGitRepositoryException, ObjectReader, self.temp_directory)
+
+    def test_read(self):
+        with ObjectReader(self.git_directory) as reader:
+            self.assertEqual(_FILE_CONTENTS, reader.read(f"HEAD:{_FILE_NAME}"))
+
+    def test_read_missing(self):
+        with ObjectReader(self.git_directory) as reader:
+            self.assertIsNone(reader.read("HEAD:missing-file"))
+            self.assertIsNone(reader.read("missing-revision"))
+            self.assertEqual(_FILE_CONTENTS, reader.read(f"HEAD:{_FILE_NAME}"))
+
+    def test_read_with_new_line(self):
+        with ObjectReader(self.git_directory) as reader:
+            self.assertRaises(ValueError, reader.read, "HEAD\nHEAD")
+
+    def test_process_reused(self):
+        with ObjectReader(self.git_directory) as reader:
+            reader.read(f"HEAD:{_FILE_NAME}")
+            process = reader._process
+            reader.read(f"HEAD~0:{_FILE_NAME}")
+            self.assertIs(process, reader._process)
+        self.assertIsNone(reader._process)
+        self.assertIsNotNone(process.returncode)
+
+    def test_read_after_close(self):
+        reader = ObjectReader(self.git_directory)
+        reader.read(f"HEAD:{_FILE_NAME}")
+        reader.close()
+        self.assertEqual(_FILE_CONTENTS, reader.read(f"HEAD:{_FILE_NAME}"))
+        reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
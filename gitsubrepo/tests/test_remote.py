@@ -0,0 +1,28 @@
+import unittest
+
+from gitsubrepo._remote import _parse_ls_remote
+
+_COMMIT = "836d7cfe667fd953927a801b90e4302005e61e59"
+_OTHER_COMMIT = "cd682d66c4f5b9bdd5a618ecf3b8af2bf6f57f1a"
+_TAG_OBJECT = "e22fcb9e22fcb9e22fcb9e22fcb9e22fcb9e22fc"
+
+
+class TestParseLsRemote(unittest.TestCase):
+    """
+    Tests for `_parse_ls_remote`.
+    """
+    def test_parse_branches(self):
+        output = f"{_OTHER_COMMIT}\tHEAD\n{_COMMIT}\trefs/heads/develop\n{_OTHER_COMMIT}\trefs/heads/feature/a"
+        self.assertEqual({"HEAD": _OTHER_COMMIT, "refs/heads/develop": _COMMIT, "refs/heads/feature/a": _OTHER_COMMIT},
+                         _parse_ls_remote(output))
+
+    def test_parse_annotated_tag(self):
+        output = f"{_TAG_OBJECT}\trefs/tags/1.0\n{_COMMIT}\trefs/tags/1.0^{{}}\n"
+        self.assertEqual({"refs/tags/1.0": _COMMIT}, _parse_ls_remote(output))
+
+    def test_parse_empty(self):
+        self.assertEqual({}, _parse_ls_remote(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+
+from git import Repo
+
+from gitsubrepo._instrumentation import add_lock_wait_hook, remove_lock_wait_hook
+from gitsubrepo._repository_lock import RepositoryLock, lock_repository, set_repository_lock_timeout, \
+    REPOSITORY_LOCK_DIRECTORY_NAME
+from gitsubrepo.exceptions import RepositoryLockTimeoutException, RunTimeoutException
+from gitsubrepo.subrepo import clone, pull, status
+from gitsubrepo.tests._resources.information import TEST_BRANCH, TEST_TAG
+from gitsubrepo.tests.test_subrepo import _TestWithSubrepo
+
+_WAIT_TIMEOUT = 10.0
+
+
+class TestRepositoryLock(_TestWithSubrepo):
+    """
+    Tests for `RepositoryLock`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.lock_directory = os.path.join(self.git_directory, ".git", REPOSITORY_LOCK_DIRECTORY_NAME)
+
+    def _get_tickets(self):
+        return [name for name in os.listdir(self.lock_directory) if name != "queue.lock"]
+
+    def _wait_for_tickets(self, count: int):
+        deadline = time.monotonic() + _WAIT_TIMEOUT
+        while len(self._get_tickets()) < count:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_lock_excludes(self):
+        with RepositoryLock(self.git_directory) as lock:
+            self.assertTrue(lock.locked)
+            other = RepositoryLock(self.git_directory)
+            self.assertRaises(RepositoryLockTimeoutException, other.acquire, timeout=0.1)
+            self.assertFalse(other.locked)
+            self.assertEqual(1, len(self._get_tickets()))
+        self.assertEqual(0, len(self._get_tickets()))
+        with RepositoryLock(self.git_directory):
+            pass
+
+    def test_lock_granted_in_order(self):
+        acquired = []
+
+        def acquire(name: str):
+            with RepositoryLock(self.git_directory):
+                acquired.append(name)
+
+        with RepositoryLock(self.git_directory):
+            waiters = []
+            for index, name in enumerate(("first", "second", "third")):
+                waiter = Thread(target=acquire, args=(name, ))
+                waiter.start()
+                self._wait_for_tickets(index + 2)
+                waiters.append(waiter)
+        for waiter in waiters:
+            waiter.join(_WAIT_TIMEOUT)
+        self.assertEqual(["first", "second", "third"], acquired)
+
+    def test_lock_of_dead_process_skipped(self):
+        process = subprocess.Popen(
+            [sys.executable, "-c", "import sys; from gitsubrepo._repository_lock import RepositoryLock; "
+                                   "RepositoryLock(sys.argv[1]).acquire(); print('locked', flush=True); "
+                                   "sys.stdin.read()", self.git_directory],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+        try:
+            self.assertEqual("locked", process.stdout.readline().strip())
+            self.assertRaises(RepositoryLockTimeoutException, RepositoryLock(self.git_directory).acquire, timeout=0.1)
+        finally:
+            process.kill()
+            process.wait()
+        # The process's ticket is left behind
+        self.assertEqual(1, len(self._get_tickets()))
+        with RepositoryLock(self.git_directory):
+            self.assertEqual(1, len(self._get_tickets()))
+
+    def test_wait_recorded(self):
+        records = []
+        add_lock_wait_hook(records.append)
+        try:
+            with RepositoryLock(self.git_directory):
+                self.assertRaises(RepositoryLockTimeoutException, RepositoryLock(self.git_directory).acquire,
+                                  timeout=0.1)
+        finally:
+            remove_lock_wait_hook(records.append)
+        self.assertEqual([True, False], [record.acquired for record in records])
+        self.assertGreaterEqual(records[1].duration, 0.1)
+        self.assertEqual(os.path.realpath(self.git_directory), records[0].git_root)
+
+
+class TestLockRepository(_TestWithSubrepo):
+    """
+    Tests for `lock_repository` and the lock being held by `clone` and `pull`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.git_repository_client.index.commit("Initial commit")
+
+    def tearDown(self):
+        set_repository_lock_timeout(None)
+        super().tearDown()
+
+    def test_lock_can_be_taken_again_in_context(self):
+        with lock_repository(self.git_directory):
+            with lock_repository(self.git_directory, timeout=0):
+                clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        self.assertEqual(TEST_BRANCH, status(self.subrepo_directory).branch)
+
+    def test_clone_waits_for_lock(self):
+        set_repository_lock_timeout(0.1)
+        with RepositoryLock(os.path.realpath(self.git_directory)):
+            self.assertRaises(RepositoryLockTimeoutException, clone, self.external_git_repository,
+                              self.subrepo_directory, branch=TEST_BRANCH)
+        self.assertFalse(os.path.exists(self.subrepo_directory))
+
+    def test_clone_times_out_waiting_for_lock(self):
+        with RepositoryLock(os.path.realpath(self.git_directory)):
+            self.assertRaises(RunTimeoutException, clone, self.external_git_repository, self.subrepo_directory,
+                              branch=TEST_BRANCH, timeout=0.5)
+        self.assertFalse(os.path.exists(self.subrepo_directory))
+
+    def test_pull_waits_for_lock(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        set_repository_lock_timeout(0.1)
+        with RepositoryLock(os.path.realpath(self.git_directory)):
+            self.assertRaises(RepositoryLockTimeoutException, pull, self.subrepo_directory, native=True)
+            self.assertRaises(RepositoryLockTimeoutException, pull, self.subrepo_directory, native=False)
+        pull(self.subrepo_directory, native=True)
+
+    def test_concurrent_clones(self):
+        directories = [os.path.join(self.git_directory, f"subrepo-{index}") for index in range(6)]
+        with ThreadPoolExecutor(max_workers=len(directories)) as executor:
+            clones = [executor.submit(clone, self.external_git_repository, directory, tag=TEST_TAG,
+                                      native=index % 2 == 0)
+                      for index, directory in enumerate(directories)]
+        for future in clones:
+            future.result()
+        self.assertEqual(len(directories) + 1, len(list(Repo(self.git_directory).iter_commits())))
+        self.assertFalse(Repo(self.git_directory).is_dirty())
+
+
+if __name__ == "__main__":
+    unittest.main()
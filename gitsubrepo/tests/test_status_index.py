@@ -0,0 +1,162 @@
+import json
+import os
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from git import Repo
+
+from gitsubrepo import _status_index, subrepo
+from gitsubrepo._gitrepo import update_gitrepo
+from gitsubrepo._status_index import set_status_index_enabled, STATUS_INDEX_DIRECTORY_NAME, STATUS_INDEX_FILE_NAME
+from gitsubrepo.subrepo import clone, pull, status, status_all
+from gitsubrepo.tests import test_subrepo
+from gitsubrepo.tests.test_subrepo import TEST_DIRECTORY_NAME
+from gitsubrepo.tests._resources.information import TEST_BRANCH, TEST_BRANCH_COMMIT, TEST_TAG, TEST_TAG_COMMIT
+
+
+class _StatusIndexEnabled:
+    """
+    Mixin that runs the tests of a `test_subrepo` test case with the status index enabled.
+    """
+    def setUp(self):
+        set_status_index_enabled(True)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        set_status_index_enabled(False)
+        _status_index._status_indexes.clear()
+
+
+class TestStatusWithStatusIndex(_StatusIndexEnabled, test_subrepo.TestStatus):
+    """
+    Tests for `status` with the status index enabled.
+    """
+
+
+class TestStatusAllWithStatusIndex(_StatusIndexEnabled, test_subrepo.TestStatusAll):
+    """
+    Tests for `status_all` with the status index enabled.
+    """
+
+
+class TestStatusIndex(_StatusIndexEnabled, test_subrepo._TestWithSubrepo):
+    """
+    Tests for the status index.
+    """
+    def setUp(self):
+        super().setUp()
+        self.index_path = os.path.join(
+            self.git_directory, ".git", STATUS_INDEX_DIRECTORY_NAME, STATUS_INDEX_FILE_NAME)
+        # Files changed by the tests are indexed straight away, as if they were changed long ago
+        racy_interval = patch.object(_status_index, "_RACY_INTERVAL_NS", 0)
+        racy_interval.start()
+        self.addCleanup(racy_interval.stop)
+
+    def test_status_is_indexed(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        expected_status = status(self.subrepo_directory)
+        self.assertTrue(os.path.exists(self.index_path))
+        with patch.object(_status_index, "read_gitrepo") as read_gitrepo:
+            self.assertEqual(expected_status, status(self.subrepo_directory))
+            read_gitrepo.assert_not_called()
+
+    def test_status_is_indexed_across_processes(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        expected_status = status(self.subrepo_directory)
+        _status_index._status_indexes.clear()
+        with patch.object(_status_index, "read_gitrepo") as read_gitrepo:
+            self.assertEqual(expected_status, status(self.subrepo_directory))
+            read_gitrepo.assert_not_called()
+
+    def test_status_all_is_indexed(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        expected_statuses = status_all(self.git_directory)
+        with patch.object(subrepo, "_list_gitrepo_paths") as list_gitrepo_paths:
+            self.assertEqual(expected_statuses, status_all(self.git_directory))
+            list_gitrepo_paths.assert_not_called()
+
+    def test_status_all_within_subdirectory(self):
+        other_subrepo_directory = os.path.join(self.git_directory, "other", TEST_DIRECTORY_NAME)
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        clone(self.external_git_repository, other_subrepo_directory, tag=TEST_TAG)
+        status_all(self.git_directory)
+        self.assertEqual({other_subrepo_directory},
+                         set(status_all(os.path.join(self.git_directory, "other")).keys()))
+
+    def test_status_after_gitrepo_changed(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        status(self.subrepo_directory)
+        gitrepo_path = os.path.join(self.subrepo_directory, ".gitrepo")
+        Path(gitrepo_path).write_text(update_gitrepo(Path(gitrepo_path).read_text(), branch="other"))
+        self.assertEqual("other", status(self.subrepo_directory).branch)
+
+    def test_status_after_pull(self):
+        mutable_remote = os.path.join(self.temp_directory, "mutable-remote")
+        remote_repository = Repo(self.external_git_repository).clone(mutable_remote)
+        self.git_repository_client.git.commit("--allow-empty", "-m", "Initial commit")
+        clone(mutable_remote, self.subrepo_directory, branch=remote_repository.active_branch.name)
+        status(self.subrepo_directory)
+        Path(os.path.join(mutable_remote, "example-file")).touch()
+        remote_repository.index.add(["example-file"])
+        remote_repository.index.commit("New commit")
+        pull(self.subrepo_directory)
+        self.assertEqual(remote_repository.head.commit.hexsha, status(self.subrepo_directory).full_commit)
+
+    def test_status_all_after_reset(self):
+        other_subrepo_directory = os.path.join(self.git_directory, "other")
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        clone(self.external_git_repository, other_subrepo_directory, tag=TEST_TAG)
+        self.assertEqual(TEST_TAG_COMMIT, status_all(self.git_directory)[other_subrepo_directory].commit)
+        self.git_repository_client.git.reset("--hard", "HEAD~1")
+        statuses = status_all(self.git_directory)
+        self.assertEqual([self.subrepo_directory], list(statuses.keys()))
+        self.assertEqual(TEST_BRANCH_COMMIT, statuses[self.subrepo_directory].commit)
+
+    def test_status_all_writes_index_once(self):
+        other_subrepo_directory = os.path.join(self.git_directory, "other")
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        clone(self.external_git_repository, other_subrepo_directory, tag=TEST_TAG)
+        os.remove(self.index_path)
+        _status_index._status_indexes.clear()
+        with patch.object(_status_index.StatusIndex, "_save", autospec=True,
+                          side_effect=_status_index.StatusIndex._save) as save:
+            expected_statuses = status_all(self.git_directory)
+        self.assertEqual(1, save.call_count)
+        _status_index._status_indexes.clear()
+        with patch.object(_status_index, "read_gitrepo") as read_gitrepo:
+            self.assertEqual(expected_statuses, status_all(self.git_directory))
+            read_gitrepo.assert_not_called()
+
+    def test_status_after_gitrepo_rewritten_within_timestamp_tick(self):
+        get_signature = _status_index._get_signature
+
+        def get_signature_to_the_second(path: str):
+            # As on a file system with coarse timestamps
+            signature = get_signature(path)
+            return (*(time // 10 ** 9 * 10 ** 9 for time in signature[0:2]), *signature[2:]) if signature else None
+
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        gitrepo_path = os.path.join(self.subrepo_directory, ".gitrepo")
+        with patch.object(_status_index, "_RACY_INTERVAL_NS", 2 * 10 ** 9), \
+                patch.object(_status_index, "_get_signature", side_effect=get_signature_to_the_second):
+            os.utime(gitrepo_path)
+            self.assertEqual(TEST_BRANCH, status(self.subrepo_directory).branch)
+            # Rewritten in place, keeping the inode and size
+            with open(gitrepo_path, "r+") as file:
+                contents = file.read().replace(TEST_BRANCH, TEST_BRANCH[::-1])
+                file.seek(0)
+                file.write(contents)
+            self.assertEqual(TEST_BRANCH[::-1], status(self.subrepo_directory).branch)
+
+    def test_corrupt_index_is_ignored(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        expected_status = status(self.subrepo_directory)
+        Path(self.index_path).write_text("{")
+        self.assertEqual(expected_status, status(self.subrepo_directory))
+        self.assertEqual(TEST_DIRECTORY_NAME, next(iter(json.loads(Path(self.index_path).read_text())["gitrepos"])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,12 +4,19 @@ import tarfile
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
-from git import Repo
+from git import Repo, GitCommandError
 
+from gitsubrepo._cache import set_default_cache_directory, set_cache_max_size
+from gitsubrepo._lock import FileLock
+from gitsubrepo._object_reader import ObjectReader
 from gitsubrepo.exceptions import NotAGitRepositoryException, NotAGitReferenceException, UnstagedChangeException, \
     NotAGitSubrepoException
-from gitsubrepo.subrepo import clone, status, pull
+from gitsubrepo import _remote, subrepo
+from gitsubrepo._remote import clear_remote_references_cache, DEFAULT_REMOTE_REFERENCES_MAX_AGE
+from gitsubrepo.subrepo import clone, status, pull, status_all, pull_many, check_for_updates, is_modified, \
+    is_modified_many, get_modified_paths, changed_subrepos
 from gitsubrepo.tests._resources.information import TEST_TAG, TEST_TAG_COMMIT, TEST_TAG_FILE, TEST_BRANCH, \
     TEST_BRANCH_COMMIT, \
     TEST_BRANCH_FILE, TEST_COMMIT, TEST_COMMIT_BRANCH, TEST_COMMIT_FILE, TEST_COMMIT_2, TEST_COMMIT_2_BRANCH, \
@@ -93,6 +100,56 @@ class TestClone(_TestWithSubrepo):
         self.assertEqual(TEST_COMMIT[0:7], commit)
         self.assertTrue(os.path.exists(os.path.join(self.subrepo_directory, TEST_COMMIT_FILE)))
 
+    def test_clone_commit_fetches_once(self):
+        trace_file = os.path.join(self.temp_directory, "trace")
+        with patch.dict(os.environ, {"GIT_TRACE2_EVENT": trace_file}):
+            clone(self.external_git_repository, self.subrepo_directory, commit=TEST_COMMIT, branch=TEST_COMMIT_BRANCH)
+        with open(trace_file) as file:
+            fetches = [line for line in file if "\"child_start\"" in line and "upload-pack" in line
+                       and TEST_REPOSITORY_NAME in line]
+        self.assertEqual(1, len(fetches))
+        self.assertEqual("", self.git_repository_client.git.for_each_ref("refs/gitsubrepo"))
+
+    def test_clone_with_depth(self):
+        self.git_repository_client.index.commit("Initial commit")
+        commit = clone(self.external_git_repository, self.subrepo_directory, branch=TEST_COMMIT_2_BRANCH, depth=1)
+        self.assertEqual(TEST_COMMIT_2[0:7], commit)
+        self.assertTrue(os.path.exists(os.path.join(self.subrepo_directory, TEST_COMMIT_2_FILE)))
+        self.assertEqual("true", self.git_repository_client.git.rev_parse("--is-shallow-repository"))
+        self.assertRaises(GitCommandError, self.git_repository_client.git.cat_file, "-e", f"{TEST_COMMIT_2}^")
+
+    def test_clone_commit_with_depth(self):
+        self.assertRaisesRegex(NotAGitReferenceException, "within 1 commits", clone, self.external_git_repository,
+                               self.subrepo_directory, commit=TEST_TAG_COMMIT, branch=TEST_COMMIT_2_BRANCH, depth=1)
+        commit = clone(self.external_git_repository, self.subrepo_directory, commit=TEST_COMMIT,
+                       branch=TEST_COMMIT_BRANCH, depth=1)
+        self.assertEqual(TEST_COMMIT[0:7], commit)
+
+    def test_clone_with_filter(self):
+        Repo(self.external_git_repository).git.config("uploadpack.allowFilter", "true")
+        commit = clone(self.external_git_repository, self.subrepo_directory, tag=TEST_TAG, filter="blob:none")
+        self.assertEqual(TEST_TAG_COMMIT, commit)
+        self.assertTrue(os.path.exists(os.path.join(self.subrepo_directory, TEST_TAG_FILE)))
+        promisor_remote = Path(self.external_git_repository).as_uri()
+        self.assertEqual("true", self.git_repository_client.git.config(f"remote.{promisor_remote}.promisor"))
+
+    def test_clone_with_filter_when_unsupported(self):
+        commit = clone(self.external_git_repository, self.subrepo_directory, tag=TEST_TAG, filter="blob:none")
+        self.assertEqual(TEST_TAG_COMMIT, commit)
+        self.assertTrue(os.path.exists(os.path.join(self.subrepo_directory, TEST_TAG_FILE)))
+
+    def test_clone_with_invalid_depth(self):
+        self.assertRaises(ValueError, clone, self.external_git_repository, self.subrepo_directory, depth=0)
+
+    def test_clone_commit_with_invalid_branch(self):
+        self.assertRaises(NotAGitReferenceException, clone, self.external_git_repository, self.subrepo_directory,
+                          commit=TEST_COMMIT, branch="non-existent")
+
+    def test_clone_commit_not_on_tag(self):
+        self.assertRaises(NotAGitReferenceException, clone, self.external_git_repository, self.subrepo_directory,
+                          commit=TEST_COMMIT_2, tag=TEST_TAG)
+        self.assertFalse(os.path.exists(self.subrepo_directory))
+
     def test_clone_invalid_url(self):
         self.assertRaises(NotAGitRepositoryException, clone, "http://www.example.com/", self.subrepo_directory)
 
@@ -109,6 +166,11 @@ class TestClone(_TestWithSubrepo):
         self.git_repository_client.git.add("--all")
         self.assertRaises(UnstagedChangeException, clone, self.external_git_repository, self.subrepo_directory)
 
+    def test_clone_with_output_callback(self):
+        lines = []
+        clone(self.external_git_repository, self.subrepo_directory, output_callback=lambda _, line: lines.append(line))
+        self.assertTrue(any(self.external_git_repository in line for line in lines))
+
     def test_clone_with_specific_author(self):
         clone(self.external_git_repository, self.subrepo_directory, author_name=TEST_NAME, author_email=TEST_EMAIL)
         latest_commit = self.git_repository_client.commit()
@@ -121,6 +183,75 @@ class TestClone(_TestWithSubrepo):
         self.assertNotEqual(TEST_EMAIL, latest_commit.author.email)
 
 
+class TestCloneWithCache(_TestWithSubrepo):
+    """
+    Tests for `clone` using a mirror cache.
+    """
+    def setUp(self):
+        super().setUp()
+        self.git_repository_client.index.commit("Initial commit")
+        self.cache_directory = os.path.join(self.temp_directory, "cache")
+        self.other_subrepo_directory = os.path.join(self.git_directory, "other")
+
+    def tearDown(self):
+        set_default_cache_directory(None)
+        set_cache_max_size(None)
+        super().tearDown()
+
+    def _get_mirrors(self):
+        return [name for name in os.listdir(self.cache_directory) if name.endswith(".git")]
+
+    def test_clone_with_cache(self):
+        clone(self.external_git_repository, self.subrepo_directory, tag=TEST_TAG, cache_directory=self.cache_directory)
+        commit = clone(self.external_git_repository, self.other_subrepo_directory, branch=TEST_BRANCH,
+                       cache_directory=self.cache_directory)
+        self.assertEqual(TEST_BRANCH_COMMIT[0:7], commit)
+        self.assertTrue(os.path.exists(os.path.join(self.subrepo_directory, TEST_TAG_FILE)))
+        self.assertTrue(os.path.exists(os.path.join(self.other_subrepo_directory, TEST_BRANCH_FILE)))
+        self.assertEqual(1, len(self._get_mirrors()))
+        self.assertEqual(self.external_git_repository, status(self.other_subrepo_directory).remote)
+
+    def test_clone_with_cache_and_limits(self):
+        commit = clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH, depth=1,
+                       filter="blob:none", cache_directory=self.cache_directory)
+        self.assertEqual(TEST_BRANCH_COMMIT[0:7], commit)
+        self.assertEqual("true", self.git_repository_client.git.rev_parse("--is-shallow-repository"))
+        self.assertEqual("", self.git_repository_client.git.config("--get-regexp", "promisor", with_exceptions=False))
+        mirror = Repo(os.path.join(self.cache_directory, self._get_mirrors()[0]))
+        self.assertEqual("false", mirror.git.rev_parse("--is-shallow-repository"))
+
+    def test_clone_with_default_cache(self):
+        set_default_cache_directory(self.cache_directory)
+        clone(self.external_git_repository, self.subrepo_directory, tag=TEST_TAG)
+        self.assertEqual(1, len(self._get_mirrors()))
+
+    def test_clone_with_cache_evicts(self):
+        set_cache_max_size(1)
+        clone(self.external_git_repository, self.subrepo_directory, tag=TEST_TAG, cache_directory=self.cache_directory)
+        self.assertTrue(os.path.exists(os.path.join(self.subrepo_directory, TEST_TAG_FILE)))
+        self.assertEqual(0, len(self._get_mirrors()))
+
+    def test_clone_with_cache_evicted_whilst_lock_made_shared(self):
+        acquire = FileLock.acquire
+        evictions = []
+
+        def acquire_after_eviction(lock: FileLock, *, shared: bool=False, blocking: bool=True) -> bool:
+            if shared and len(evictions) == 0:
+                evictions.extend(self._get_mirrors())
+                shutil.rmtree(os.path.join(self.cache_directory, evictions[0]))
+            return acquire(lock, shared=shared, blocking=blocking)
+
+        with patch.object(FileLock, "acquire", autospec=True, side_effect=acquire_after_eviction):
+            commit = clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH,
+                           cache_directory=self.cache_directory)
+        self.assertEqual(TEST_BRANCH_COMMIT[0:7], commit)
+        self.assertEqual(evictions, self._get_mirrors())
+
+    def test_clone_non_existent_branch_with_cache(self):
+        self.assertRaises(NotAGitReferenceException, clone, self.external_git_repository, self.subrepo_directory,
+                          branch="non-existent", cache_directory=self.cache_directory)
+
+
 class TestStatus(_TestWithSubrepo):
     """
     Tests for `status`.
@@ -145,6 +276,216 @@ class TestStatus(_TestWithSubrepo):
         self.assertEqual(branch, TEST_BRANCH)
         self.assertEqual(commit, TEST_BRANCH_COMMIT)
 
+    def test_status_details(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        subrepo_status = status(self.subrepo_directory)
+        self.assertEqual(self.external_git_repository, subrepo_status.remote)
+        self.assertEqual(TEST_BRANCH, subrepo_status.branch)
+        self.assertEqual(TEST_BRANCH_COMMIT, subrepo_status.commit)
+        self.assertEqual(TEST_COMMIT, subrepo_status.full_commit)
+        self.assertIsNotNone(subrepo_status.cmdver)
+
+    def test_status_native_matches_subrepo_command(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        self.assertEqual(status(self.subrepo_directory, native=False), status(self.subrepo_directory))
+
+    def test_status_of_git_directory_with_invalid_gitrepo_file(self):
+        Path(os.path.join(self.git_directory, ".gitrepo")).write_text("[subrepo]\n")
+        self.assertRaises(NotAGitSubrepoException, status, self.git_directory)
+
+
+class TestStatusAtRevision(_TestWithSubrepo):
+    """
+    Tests for `status` at a revision of the parent repository.
+    """
+    def setUp(self):
+        super().setUp()
+        self.git_repository_client.index.commit("Initial commit")
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        self.cloned_commit = self.git_repository_client.head.commit.hexsha
+
+    def test_status_at_revision(self):
+        expected_status = status(self.subrepo_directory)
+        Path(os.path.join(self.subrepo_directory, ".gitrepo")).write_text("[subrepo]\n")
+        self.assertEqual(expected_status, status(self.subrepo_directory, revision="HEAD"))
+
+    def test_status_at_revision_before_clone(self):
+        self.assertRaises(NotAGitSubrepoException, status, self.subrepo_directory, revision="HEAD~1")
+
+    def test_status_at_unknown_revision(self):
+        self.assertRaises(NotAGitReferenceException, status, self.subrepo_directory, revision="unknown-revision")
+
+    def test_status_at_revision_of_removed_subrepo(self):
+        expected_status = status(self.subrepo_directory)
+        self.git_repository_client.git.rm("-r", "--quiet", self.subrepo_directory)
+        self.git_repository_client.index.commit("Remove subrepo")
+        self.assertEqual(expected_status, status(self.subrepo_directory, revision=self.cloned_commit))
+
+    def test_status_at_revisions_with_object_reader(self):
+        other_subrepo_directory = os.path.join(self.git_directory, "other")
+        clone(self.external_git_repository, other_subrepo_directory, tag=TEST_TAG)
+        with ObjectReader(self.git_directory) as object_reader:
+            self.assertEqual(TEST_BRANCH_COMMIT, status(
+                self.subrepo_directory, revision="HEAD", object_reader=object_reader).commit)
+            self.assertEqual(TEST_TAG_COMMIT, status(
+                other_subrepo_directory, revision="HEAD", object_reader=object_reader).commit)
+            self.assertRaises(NotAGitSubrepoException, status, other_subrepo_directory, revision=self.cloned_commit,
+                              object_reader=object_reader)
+
+    def test_status_at_revision_with_object_reader_of_other_repository(self):
+        other_git_directory = os.path.join(self.temp_directory, "other-git-directory")
+        Repo.init(other_git_directory)
+        with ObjectReader(other_git_directory) as object_reader:
+            self.assertRaises(ValueError, status, self.subrepo_directory, revision="HEAD", object_reader=object_reader)
+
+
+class TestStatusAll(_TestWithSubrepo):
+    """
+    Tests for `status_all`.
+    """
+    def test_status_all_in_non_git_repository(self):
+        self.assertRaises(NotAGitRepositoryException, status_all, self.temp_directory)
+
+    def test_status_all_when_no_subrepos(self):
+        self.assertEqual({}, status_all(self.git_directory))
+
+    def test_status_all(self):
+        other_subrepo_directory = os.path.join(self.git_directory, "other", TEST_DIRECTORY_NAME)
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        clone(self.external_git_repository, other_subrepo_directory, tag=TEST_TAG)
+        statuses = status_all(self.git_directory)
+        self.assertEqual({self.subrepo_directory, other_subrepo_directory}, set(statuses.keys()))
+        self.assertEqual(status(self.subrepo_directory), statuses[self.subrepo_directory])
+        self.assertEqual(TEST_TAG_COMMIT, statuses[other_subrepo_directory].commit)
+
+    def test_status_all_with_filter(self):
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+        clone(self.external_git_repository, os.path.join(self.git_directory, "other"), tag=TEST_TAG)
+        self.assertEqual([self.subrepo_directory], list(status_all(self.git_directory, branch=TEST_BRANCH).keys()))
+        self.assertEqual({}, status_all(self.git_directory, remote="http://www.example.com/"))
+
+
+class TestIsModified(_TestWithSubrepo):
+    """
+    Tests for `is_modified`, `is_modified_many` and `get_modified_paths`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.git_repository_client.index.commit("Initial commit")
+        clone(self.external_git_repository, self.subrepo_directory, branch=TEST_BRANCH)
+
+    def test_is_modified_when_not_modified(self):
+        self.assertFalse(is_modified(self.subrepo_directory))
+        self.assertEqual([], get_modified_paths(self.subrepo_directory))
+
+    def test_is_modified_when_committed(self):
+        os.remove(os.path.join(self.subrepo_directory, TEST_BRANCH_FILE))
+        Path(os.path.join(self.subrepo_directory, "example-file")).touch()
+        self.git_repository_client.git.add("--all")
+        self.git_repository_client.index.commit("Change subrepo")
+        self.assertTrue(is_modified(self.subrepo_directory))
+        self.assertEqual(sorted([TEST_BRANCH_FILE, "example-file"]), get_modified_paths(self.subrepo_directory))
+
+    def test_is_modified_when_uncommitted(self):
+        Path(os.path.join(self.subrepo_directory, TEST_BRANCH_FILE)).write_text("changed")
+        Path(os.path.join(self.subrepo_directory, "untracked-file")).touch()
+        self.assertEqual([TEST_BRANCH_FILE, "untracked-file"], get_modified_paths(self.subrepo_directory))
+
+    def test_is_modified_ignores_changes_outside_subrepo(self):
+        Path(os.path.join(self.git_directory, "example-file")).touch()
+        Path(os.path.join(self.subrepo_directory, ".gitrepo")).write_text(
+            Path(os.path.join(self.subrepo_directory, ".gitrepo")).read_text() + "\n")
+        self.assertFalse(is_modified(self.subrepo_directory))
+
+    def test_is_modified_when_pulled_commit_not_fetched(self):
+        self.git_repository_client.git.update_ref("-d", f"refs/subrepo/{TEST_DIRECTORY_NAME}/fetch")
+        self.git_repository_client.git.update_ref("-d", f"refs/subrepo/{TEST_DIRECTORY_NAME}/commit")
+        self.git_repository_client.git.reflog("expire", "--expire=now", "--all")
+        self.git_repository_client.git.gc("--prune=now", "--quiet")
+        self.assertFalse(is_modified(self.subrepo_directory))
+        Path(os.path.join(self.subrepo_directory, TEST_BRANCH_FILE)).write_text("changed")
+        self.assertTrue(is_modified(self.subrepo_directory))
+
+    def test_is_modified_many(self):
+        other_subrepo_directory = os.path.join(self.git_directory, "other")
+        non_existent_directory = os.path.join(self.git_directory, "non-existent")
+        clone(self.external_git_repository, other_subrepo_directory, tag=TEST_TAG)
+        Path(os.path.join(other_subrepo_directory, "example-file")).touch()
+        results = is_modified_many([self.subrepo_directory, other_subrepo_directory, non_existent_directory])
+        self.assertEqual([self.subrepo_directory, other_subrepo_directory, non_existent_directory], list(results))
+        self.assertFalse(results[self.subrepo_directory])
+        self.assertTrue(results[other_subrepo_directory])
+        self.assertIsInstance(results[non_existent_directory], ValueError)
+
+
+class TestChangedSubrepos(_TestWithSubrepo):
+    """
+    Tests for `changed_subrepos`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.git_repository_client.index.commit("Initial commit")
+        self.initial_commit = self.git_repository_client.head.commit.hexsha
+        self.mutable_remote = os.path.join(self.temp_directory, "mutable-remote")
+        Repo(self.external_git_repository).clone(self.mutable_remote)
+        self.other_subrepo_directory = os.path.join(self.git_directory, "other", TEST_DIRECTORY_NAME)
+        clone(self.mutable_remote, self.subrepo_directory, branch=Repo(self.mutable_remote).active_branch.name)
+        clone(self.external_git_repository, self.other_subrepo_directory, tag=TEST_TAG)
+
+    def test_changed_subrepos_in_non_git_repository(self):
+        self.assertRaises(NotAGitRepositoryException, changed_subrepos, self.temp_directory, "HEAD~1")
+
+    def test_changed_subrepos_with_unknown_revision(self):
+        self.assertRaises(NotAGitReferenceException, changed_subrepos, self.git_directory, "unknown-revision")
+
+    def test_changed_subrepos_when_unchanged(self):
+        self.assertEqual({}, changed_subrepos(self.git_directory, "HEAD", "HEAD"))
+
+    def test_changed_subrepos_when_cloned(self):
+        changes = changed_subrepos(self.git_directory, self.initial_commit)
+        self.assertEqual({self.subrepo_directory, self.other_subrepo_directory}, set(changes.keys()))
+        self.assertIsNone(changes[self.other_subrepo_directory].old)
+        self.assertEqual(status(self.other_subrepo_directory), changes[self.other_subrepo_directory].new)
+        self.assertEqual(TEST_COMMIT_2, changes[self.subrepo_directory].new_commit)
+
+    def test_changed_subrepos_when_pulled(self):
+        before_pull = self.git_repository_client.head.commit.hexsha
+        Path(os.path.join(self.mutable_remote, "example-file")).touch()
+        index = Repo(self.mutable_remote).index
+        index.add(["example-file"])
+        new_commit = index.commit("New commit").hexsha
+        pull(self.subrepo_directory)
+        changes = changed_subrepos(self.git_directory, before_pull)
+        self.assertEqual([self.subrepo_directory], list(changes.keys()))
+        self.assertEqual(TEST_COMMIT_2, changes[self.subrepo_directory].old_commit)
+        self.assertEqual(new_commit, changes[self.subrepo_directory].new_commit)
+
+    def test_changed_subrepos_when_removed(self):
+        before_removal = self.git_repository_client.head.commit.hexsha
+        self.git_repository_client.git.rm("-r", "--quiet", self.subrepo_directory)
+        self.git_repository_client.index.commit("Remove subrepo")
+        changes = changed_subrepos(self.git_directory, before_removal)
+        self.assertEqual([self.subrepo_directory], list(changes.keys()))
+        self.assertEqual(TEST_COMMIT_2, changes[self.subrepo_directory].old_commit)
+        self.assertIsNone(changes[self.subrepo_directory].new)
+
+    def test_changed_subrepos_with_object_reader(self):
+        with ObjectReader(self.git_directory) as object_reader:
+            changes = changed_subrepos(self.git_directory, self.initial_commit, object_reader=object_reader)
+            self.assertEqual(changes, changed_subrepos(self.git_directory, self.initial_commit))
+            self.assertIsNotNone(object_reader._process)
+
+    def test_changed_subrepos_when_gitrepo_file_unreadable(self):
+        with ObjectReader(self.git_directory) as object_reader, \
+                patch.object(object_reader, "read", return_value=None):
+            changes = changed_subrepos(self.git_directory, self.initial_commit, object_reader=object_reader)
+        self.assertEqual({self.subrepo_directory, self.other_subrepo_directory}, set(changes.keys()))
+        self.assertIsNone(changes[self.subrepo_directory].new)
+
+    def test_changed_subrepos_within_subdirectory(self):
+        self.assertEqual([self.other_subrepo_directory],
+                         list(changed_subrepos(os.path.join(self.git_directory, "other"), self.initial_commit)))
+
 
 class TestPull(_TestWithSubrepo):
     """
@@ -177,5 +518,168 @@ class TestPull(_TestWithSubrepo):
         self.assertEqual(new_commit[0:7], pull(self.subrepo_directory))
 
 
+    def test_pull_with_depth_when_not_up_to_date(self):
+        self.git_repository_client.index.commit("Initial commit")
+        mutable_remote = os.path.join(self.temp_directory, "mutable-remote")
+        Repo(self.external_git_repository).clone(mutable_remote)
+        clone(mutable_remote, self.subrepo_directory, branch=Repo(mutable_remote).active_branch.name, depth=1)
+
+        for name in ("example-file", "other-example-file"):
+            Path(os.path.join(mutable_remote, name)).touch()
+            index = Repo(mutable_remote).index
+            index.add([name])
+            new_commit = index.commit("New commit").hexsha
+
+        self.assertEqual(new_commit[0:7], pull(self.subrepo_directory, depth=1))
+        self.assertTrue(os.path.exists(os.path.join(self.subrepo_directory, "other-example-file")))
+
+
+class TestPullMany(_TestWithSubrepo):
+    """
+    Tests for `pull_many`.
+    """
+    def setUp(self):
+        super().setUp()
+        self.git_repository_client.index.commit("Initial commit")
+        self.mutable_remote = os.path.join(self.temp_directory, "mutable-remote")
+        Repo(self.external_git_repository).clone(self.mutable_remote)
+        self.other_subrepo_directory = os.path.join(self.git_directory, "other")
+        branch = Repo(self.mutable_remote).active_branch.name
+        clone(self.mutable_remote, self.subrepo_directory, branch=branch)
+        clone(self.mutable_remote, self.other_subrepo_directory, branch=branch)
+
+    def test_pull_many_when_up_to_date(self):
+        self.assertEqual({self.subrepo_directory: TEST_COMMIT_2[0:7], self.other_subrepo_directory: TEST_COMMIT_2[0:7]},
+                         pull_many([self.subrepo_directory, self.other_subrepo_directory], max_workers=2))
+
+    def test_pull_many_when_not_up_to_date(self):
+        Path(os.path.join(self.mutable_remote, "example-file")).touch()
+        index = Repo(self.mutable_remote).index
+        index.add(["example-file"])
+        new_commit = index.commit("New commit").hexsha
+
+        results = pull_many([self.subrepo_directory, self.other_subrepo_directory], max_workers=2)
+        self.assertEqual({self.subrepo_directory: new_commit[0:7], self.other_subrepo_directory: new_commit[0:7]},
+                         results)
+        self.assertTrue(os.path.exists(os.path.join(self.other_subrepo_directory, "example-file")))
+        self.assertEqual("", self.git_repository_client.git.for_each_ref("refs/gitsubrepo"))
+
+    def test_pull_many_with_depth_and_filter(self):
+        Repo(self.mutable_remote).git.config("uploadpack.allowFilter", "true")
+        Path(os.path.join(self.mutable_remote, "example-file")).touch()
+        index = Repo(self.mutable_remote).index
+        index.add(["example-file"])
+        new_commit = index.commit("New commit").hexsha
+
+        results = pull_many([self.subrepo_directory, self.other_subrepo_directory], max_workers=2, depth=1,
+                            filter="blob:none")
+        self.assertEqual({self.subrepo_directory: new_commit[0:7], self.other_subrepo_directory: new_commit[0:7]},
+                         results)
+        self.assertEqual("", self.git_repository_client.git.for_each_ref("refs/gitsubrepo"))
+
+    def test_pull_many_with_depth_fetches_once(self):
+        Path(os.path.join(self.mutable_remote, "example-file")).touch()
+        index = Repo(self.mutable_remote).index
+        index.add(["example-file"])
+        index.commit("New commit")
+        for native, directory in ((True, self.subrepo_directory), (False, self.other_subrepo_directory)):
+            trace_file = os.path.join(self.temp_directory, f"trace-{native}")
+            with patch.dict(os.environ, {"GIT_TRACE2_EVENT": trace_file}):
+                pull_many([directory], native=native, depth=2)
+            with open(trace_file) as file:
+                fetches = [line for line in file if "\"child_start\"" in line and "upload-pack" in line
+                           and "mutable-remote" in line]
+            # `git subrepo` still connects to find its branch, but has nothing left to fetch
+            self.assertEqual(1 if native else 2, len(fetches))
+            self.assertTrue(os.path.exists(os.path.join(directory, "example-file")))
+        self.assertEqual("", self.git_repository_client.git.for_each_ref("refs/gitsubrepo"))
+
+    def test_pull_many_with_result_callback(self):
+        results = []
+        returned = pull_many([self.subrepo_directory, self.other_subrepo_directory],
+                             result_callback=lambda directory, result: results.append((directory, result)))
+        self.assertEqual(list(returned.items()), results)
+
+    def test_pull_many_with_failure(self):
+        non_existent_directory = os.path.join(self.git_directory, "non-existent")
+        results = pull_many([non_existent_directory, self.subrepo_directory])
+        self.assertIsInstance(results[non_existent_directory], ValueError)
+        self.assertEqual(TEST_COMMIT_2[0:7], results[self.subrepo_directory])
+
+
+class TestCheckForUpdates(_TestWithSubrepo):
+    """
+    Tests for `check_for_updates`.
+    """
+    def setUp(self):
+        super().setUp()
+        clear_remote_references_cache()
+        self.git_repository_client.index.commit("Initial commit")
+        self.mutable_remote = os.path.join(self.temp_directory, "mutable-remote")
+        Repo(self.external_git_repository).clone(self.mutable_remote)
+        self.other_subrepo_directory = os.path.join(self.git_directory, "other")
+        branch = Repo(self.mutable_remote).active_branch.name
+        clone(self.mutable_remote, self.subrepo_directory, branch=branch)
+        clone(self.mutable_remote, self.other_subrepo_directory, branch=branch)
+        self.directories = [self.subrepo_directory, self.other_subrepo_directory]
+
+    def tearDown(self):
+        clear_remote_references_cache()
+        super().tearDown()
+
+    def _commit_to_remote(self) -> str:
+        Path(os.path.join(self.mutable_remote, "example-file")).touch()
+        index = Repo(self.mutable_remote).index
+        index.add(["example-file"])
+        return index.commit("New commit").hexsha
+
+    def test_check_for_updates_when_up_to_date(self):
+        self.assertEqual({self.subrepo_directory: None, self.other_subrepo_directory: None},
+                         check_for_updates(self.directories))
+
+    def test_check_for_updates_when_not_up_to_date(self):
+        new_commit = self._commit_to_remote()
+        with patch.object(_remote, "run_steps", wraps=_remote.run_steps) as run_steps:
+            results = check_for_updates(self.directories)
+        self.assertEqual({self.subrepo_directory: new_commit[0:7], self.other_subrepo_directory: new_commit[0:7]},
+                         results)
+        self.assertEqual(1, run_steps.call_count)
+        self.assertTrue(os.path.exists(self.subrepo_directory))
+        self.assertFalse(os.path.exists(os.path.join(self.subrepo_directory, "example-file")))
+
+    def test_check_for_updates_from_parent_repository(self):
+        with patch.object(subrepo, "get_remote_references", wraps=subrepo.get_remote_references) as mock:
+            check_for_updates(self.directories)
+        mock.assert_called_once_with(self.mutable_remote, os.path.realpath(self.git_directory),
+                                     max_age=DEFAULT_REMOTE_REFERENCES_MAX_AGE, timeout=None)
+
+    def test_check_for_updates_with_result_callback(self):
+        new_commit = self._commit_to_remote()
+        non_existent_directory = os.path.join(self.git_directory, "non-existent")
+        results = {}
+        returned = check_for_updates(self.directories + [non_existent_directory],
+                                     result_callback=lambda directory, result: results.update({directory: result}))
+        self.assertEqual(returned, results)
+        self.assertEqual(new_commit[0:7], results[self.subrepo_directory])
+        self.assertIsInstance(results[non_existent_directory], ValueError)
+
+    def test_check_for_updates_reuses_remote_references(self):
+        check_for_updates(self.directories)
+        new_commit = self._commit_to_remote()
+        self.assertIsNone(check_for_updates(self.directories)[self.subrepo_directory])
+        self.assertEqual(new_commit[0:7], check_for_updates(self.directories, max_age=0)[self.subrepo_directory])
+
+    def test_check_for_updates_when_pinned_to_commit(self):
+        pinned_subrepo_directory = os.path.join(self.git_directory, "pinned")
+        clone(self.external_git_repository, pinned_subrepo_directory, commit=TEST_COMMIT, branch=TEST_COMMIT_BRANCH)
+        self.assertIsNone(check_for_updates([pinned_subrepo_directory])[pinned_subrepo_directory])
+
+    def test_check_for_updates_with_failure(self):
+        non_existent_directory = os.path.join(self.git_directory, "non-existent")
+        results = check_for_updates([non_existent_directory, self.subrepo_directory])
+        self.assertIsInstance(results[non_existent_directory], ValueError)
+        self.assertIsNone(results[self.subrepo_directory])
+
+
 if __name__ == "__main__":
     unittest.main()
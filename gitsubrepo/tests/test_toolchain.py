@@ -0,0 +1,79 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from gitsubrepo import _toolchain
+from gitsubrepo._common import run
+from gitsubrepo._toolchain import get_git_version, get_git_subrepo_version, clear_toolchain_cache, parse_version, \
+    MINIMUM_GIT_VERSION, MINIMUM_GIT_SUBREPO_VERSION
+
+
+class TestParseVersion(unittest.TestCase):
+    """
+    Tests for `parse_version`.
+    """
+    def test_parse_git_version(self):
+        self.assertEqual((2, 10, 1), parse_version("git version 2.10.1"))
+
+    def test_parse_vendor_git_version(self):
+        self.assertEqual((2, 24, 3), parse_version("git version 2.24.3 (Apple Git-128)"))
+
+    def test_parse_git_subrepo_version(self):
+        self.assertEqual((0, 3, 1), parse_version("0.3.1\n"))
+
+    def test_parse_invalid_version(self):
+        self.assertRaises(ValueError, parse_version, "unknown")
+
+
+class TestToolchainVersions(unittest.TestCase):
+    """
+    Tests for `get_git_version` and `get_git_subrepo_version`.
+    """
+    def setUp(self):
+        clear_toolchain_cache()
+        self.temp_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        clear_toolchain_cache()
+        shutil.rmtree(self.temp_directory)
+
+    def _create_fake_git(self, version: str):
+        fake_git = os.path.join(self.temp_directory, "git")
+        with open(fake_git, "w") as file:
+            file.write(f"#!/bin/sh\necho 'git version {version}'\n")
+        os.chmod(fake_git, os.stat(fake_git).st_mode | stat.S_IEXEC)
+
+    def test_get_versions(self):
+        self.assertGreaterEqual(get_git_version(), MINIMUM_GIT_VERSION)
+        self.assertGreaterEqual(get_git_subrepo_version(), MINIMUM_GIT_SUBREPO_VERSION)
+
+    def test_versions_are_cached(self):
+        with patch.object(_toolchain, "run", wraps=run) as mock_run:
+            get_git_version()
+            get_git_subrepo_version()
+            get_git_version()
+            get_git_subrepo_version()
+            self.assertEqual(2, mock_run.call_count)
+
+    def test_cache_invalidated_when_path_changes(self):
+        get_git_version()
+        self._create_fake_git("2.99.0")
+        with patch.dict(os.environ, {"PATH": f"{self.temp_directory}{os.pathsep}{os.environ['PATH']}"}):
+            self.assertEqual((2, 99, 0), get_git_version())
+        self.assertNotEqual((2, 99, 0), get_git_version())
+
+    def test_old_git(self):
+        self._create_fake_git("1.9.0")
+        with patch.dict(os.environ, {"PATH": f"{self.temp_directory}{os.pathsep}{os.environ['PATH']}"}):
+            self.assertRaises(RuntimeError, get_git_version)
+
+    def test_missing_git(self):
+        with patch.dict(os.environ, {"PATH": self.temp_directory}):
+            self.assertRaises(RuntimeError, get_git_version)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,8 +11,12 @@ except ImportError:
 setup(
     name="gitsubrepo",
     version="1.1.0",
-    packages=find_packages(exclude=["tests"]),
+    packages=find_packages(exclude=["tests", "benchmarks", "benchmarks.*"]),
+    python_requires=">=3.7",
     install_requires=open("requirements.txt", "r").readlines(),
+    entry_points={
+        "console_scripts": ["gitsubrepo=gitsubrepo.__main__:main"]
+    },
     url="https://github.com/wtsi-hgi/python-git-subrepo",
     license="MIT",
     description="Provides access to `git subrepo` in Python",